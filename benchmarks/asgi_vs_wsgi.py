@@ -0,0 +1,153 @@
+"""
+Load-test comparison of the sync (WSGI) and async (ASGI) endpoints.
+
+Drives the same mixed workload (mostly authenticated profile reads plus a
+share of PBKDF2 logins) through Django's WSGI handler from a thread pool
+sized like one threaded WSGI worker, and through the ASGI handler at the
+requested concurrency on a single event loop. Latencies are measured
+from the moment a request is queued, so both include time spent waiting
+for a free thread or task slot.
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 500 --requests 5000
+"""
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import (
+    Timer,
+    format_summary,
+    setup_django,
+    summarize,
+    test_database,
+    without_throttling,
+)
+
+setup_django()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+
+from users.models import AuthToken, Profile, User  # noqa: E402
+
+PASSWORD = "rtsgbdkue"
+
+
+def seed(users):
+    encoded = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        User(
+            email=f"bench{i}@example.com",
+            first_name=f"bench{i}",
+            password=encoded,
+            is_active=True,
+        )
+        for i in range(users)
+    )
+    Profile.objects.bulk_create(
+        Profile(
+            user=user,
+            middle_name="m",
+            last_name="l",
+            dob="1990-01-01",
+            nationality="kenya",
+            phone_number=f"+2547{i:08d}",
+        )
+        for i, user in enumerate(created)
+    )
+    return [
+        (user.email, AuthToken.objects.create(user=user).key)
+        for user in created
+    ]
+
+
+def plan(accounts, requests, login_ratio, prefix):
+    rng = random.Random(0)
+    for _ in range(requests):
+        email, key = rng.choice(accounts)
+        if rng.random() < login_ratio:
+            yield (
+                "post",
+                f"{prefix}login",
+                {"email": email, "password": PASSWORD},
+                {},
+            )
+        else:
+            yield ("get", f"{prefix}profile", None, {"key": key})
+
+
+def run_wsgi(jobs, threads):
+    def call(job, start):
+        method, path, data, auth = job
+        client = Client()
+        extra = {}
+        if auth:
+            extra["HTTP_AUTHORIZATION"] = f"Token {auth['key']}"
+        if method == "post":
+            client.post(path, data, content_type="application/json")
+        else:
+            client.get(path, **extra)
+        return time.perf_counter() - start
+
+    with Timer() as timer, ThreadPoolExecutor(max_workers=threads) as pool:
+        queued = time.perf_counter()
+        futures = [pool.submit(call, job, queued) for job in jobs]
+        latencies = [future.result() for future in futures]
+    return summarize(latencies, timer.elapsed)
+
+
+async def run_asgi(jobs, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    client = AsyncClient()
+
+    async def call(job):
+        method, path, data, auth = job
+        start = time.perf_counter()
+        async with semaphore:
+            if method == "post":
+                await client.post(path, data, content_type="application/json")
+            else:
+                await client.get(path, AUTHORIZATION=f"Token {auth['key']}")
+            return time.perf_counter() - start
+
+    with Timer() as timer:
+        latencies = await asyncio.gather(*(call(job) for job in jobs))
+    return summarize(latencies, timer.elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument(
+        "--wsgi-threads",
+        type=int,
+        default=16,
+        help="Request threads of the simulated WSGI worker.",
+    )
+    parser.add_argument("--login-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with test_database(), without_throttling():
+        accounts = seed(args.users)
+        wsgi = run_wsgi(
+            list(plan(accounts, args.requests, args.login_ratio, "/")),
+            args.wsgi_threads,
+        )
+        asgi = asyncio.run(
+            run_asgi(
+                list(
+                    plan(accounts, args.requests, args.login_ratio, "/async/")
+                ),
+                args.concurrency,
+            )
+        )
+    print(format_summary(f"wsgi ({args.wsgi_threads} threads)", wsgi))
+    print(format_summary(f"asgi ({args.concurrency} tasks)", asgi))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold-start cost of a fresh WSGI worker.
+
+For each settings profile, with and without ``WARMUP_ON_STARTUP``, starts
+``--runs`` fresh interpreters that each time ``import
+user_management.wsgi`` and then two authenticated ``GET /user`` requests
+through the WSGI application, the first of which pays for whatever was
+left lazy. The workers share a throwaway test database created here (a
+file for SQLite), seeded with one user and token.
+
+    python -m benchmarks.cold_start --runs 5 \\
+        --profiles user_management.settings,user_management.settings_api
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import setup_django, test_database
+
+PHASES = ("import", "first", "second")
+
+
+def child():
+    """Runs in the fresh interpreter, prints one JSON line of timings."""
+    from wsgiref.util import setup_testing_defaults
+
+    database = json.loads(os.environ["COLD_START_DATABASE"])
+    start = time.perf_counter()
+    from django.conf import settings
+
+    # Point at the shared test database before Django opens anything.
+    settings.DATABASES["default"].update(database)
+    import user_management.wsgi
+
+    timings = {"import": time.perf_counter() - start}
+    for phase in PHASES[1:]:
+        environ = {
+            "PATH_INFO": "/user",
+            "HTTP_AUTHORIZATION": f"Token {os.environ['COLD_START_TOKEN']}",
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        start = time.perf_counter()
+        body = b"".join(
+            user_management.wsgi.application(
+                environ, lambda status, headers: statuses.append(status)
+            )
+        )
+        timings[phase] = time.perf_counter() - start
+        assert statuses == ["200 OK"], (statuses, body)
+    print(json.dumps(timings))
+
+
+def run(profile, warmup, runs, env):
+    env = dict(
+        env,
+        DJANGO_SETTINGS_MODULE=profile,
+        WARMUP_ON_STARTUP="1" if warmup else "0",
+    )
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    return {
+        phase: statistics.median(sample[phase] for sample in samples) * 1000
+        for phase in PHASES
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--profiles",
+        default="user_management.settings,user_management.settings_api",
+    )
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    setup_django()
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+
+    from users.models import AuthToken, User
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                directory, "cold_start.sqlite3"
+            )
+        with test_database():
+            user = User.objects.create(
+                email="cold@example.com",
+                first_name="cold",
+                password=make_password("Bench-pass-42"),
+                is_active=True,
+            )
+            env = dict(
+                os.environ,
+                COLD_START_TOKEN=AuthToken.objects.create(user=user).key,
+                COLD_START_DATABASE=json.dumps(
+                    {
+                        key: connection.settings_dict[key]
+                        for key in ("ENGINE", "NAME", "USER", "PASSWORD")
+                        + ("HOST", "PORT")
+                    }
+                ),
+            )
+            print(
+                f"{'profile':<32} {'warmup':<6} {'import':>10} "
+                f"{'first req':>10} {'second req':>10}  (median ms)"
+            )
+            for profile in args.profiles.split(","):
+                for warmup in (False, True):
+                    timings = run(profile, warmup, args.runs, env)
+                    print(
+                        f"{profile:<32} {'on' if warmup else 'off':<6} "
+                        + " ".join(
+                            f"{timings[phase]:>10.1f}" for phase in PHASES
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
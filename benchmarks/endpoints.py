@@ -0,0 +1,127 @@
+"""
+Latency, throughput and query-count budgets for every endpoint.
+
+Seeds ``--users`` users with profiles and addresses into a throwaway test
+database, then runs each scenario from ``benchmarks.scenarios``
+``--iterations`` times through the test client. Exits non-zero when any
+request runs more queries than its budget.
+
+    python -m benchmarks.endpoints --users 10000 --iterations 200
+    python -m benchmarks.endpoints --only login,profile
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.utils import (
+    format_summary,
+    setup_django,
+    summarize,
+    test_database,
+    without_throttling,
+)
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks.scenarios import (  # noqa: E402
+    QUERY_BUDGETS,
+    SCENARIOS,
+    Context,
+    build,
+    count_queries,
+    send,
+)
+from users.models import Profile, ResidentialAddress, User  # noqa: E402
+
+
+def seed(users, password_hash, batch_size=1000):
+    for start in range(0, users, batch_size):
+        batch = User.objects.bulk_create(
+            User(
+                email=f"seed{i}@example.com",
+                email_domain="example.com",
+                first_name=f"seed{i}",
+                password=password_hash,
+                is_active=True,
+            )
+            for i in range(start, min(users, start + batch_size))
+        )
+        Profile.objects.bulk_create(
+            Profile(
+                user=user,
+                middle_name="m",
+                last_name="l",
+                dob="1990-01-01",
+                nationality="kenya",
+                phone_number=f"+2547{start + n:08d}",
+            )
+            for n, user in enumerate(batch)
+        )
+        ResidentialAddress.objects.bulk_create(
+            ResidentialAddress(
+                user=user,
+                country="kenya",
+                city="nairobi",
+                state="nairobi",
+                zip="00100",
+            )
+            for user in batch
+        )
+
+
+def run(name, ctx, iterations):
+    client = APIClient()
+    # Warm caches outside the measurement.
+    send(client, build(ctx, name, -1))
+    latencies = []
+    worst = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        request = build(ctx, name, i)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = send(client, request)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise SystemExit(
+                f"{name}: unexpected {response.status_code} response"
+            )
+        worst = max(worst, count_queries(queries))
+    return summarize(latencies, time.perf_counter() - started), worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--only", help="Comma separated scenario names, default all."
+    )
+    args = parser.parse_args()
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+
+    failed = []
+    with test_database(), without_throttling():
+        ctx = Context()
+        seed(args.users, ctx.password_hash)
+        for name in names:
+            summary, queries = run(name, ctx, args.iterations)
+            budget = QUERY_BUDGETS[name]
+            marker = "ok" if queries <= budget else "OVER BUDGET"
+            print(
+                f"{format_summary(name, summary)} "
+                f"queries {queries}/{budget} {marker}"
+            )
+            if queries > budget:
+                failed.append(name)
+    if failed:
+        print(f"query budget exceeded: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Throughput and peak memory of the streaming user export.
+
+Seeds users with profiles and addresses into a throwaway test database and
+streams the export at each ``--users`` size, discarding the output. Peak
+Python memory (tracemalloc) should stay roughly the same as the table
+grows.
+
+    python -m benchmarks.export --users 10000,100000 --format csv --gzip
+"""
+import argparse
+import tracemalloc
+
+from benchmarks.utils import Timer, setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+
+from benchmarks.endpoints import seed  # noqa: E402
+from users.export import FORMATS, export_users  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="10000,100000")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    password_hash = make_password("Bench-pass-42")
+    with test_database():
+        for users in map(int, args.users.split(",")):
+            User.objects.all().delete()
+            seed(users, password_hash)
+            tracemalloc.start()
+            size = 0
+            with Timer() as timer:
+                for chunk in export_users(
+                    args.format, gzip=args.gzip, chunk_size=args.chunk_size
+                ):
+                    size += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{users:>9} users {size / 2**20:>9.1f} MiB "
+                f"{users / timer.elapsed:>9.0f} users/s "
+                f"peak {peak / 2**20:>6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Login hashing throughput of a single threaded worker, inline vs pooled.
+
+Simulates one WSGI worker running ``--threads`` request threads that each
+verify a PBKDF2 password the way ``PooledModelBackend`` does, first with
+hashing inline (``PASSWORD_HASHING_WORKERS = 0``) and then through the
+process pool.
+
+    python -m benchmarks.login_throughput --threads 8 --pool-size 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup_django
+
+setup_django()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from users import hashing  # noqa: E402
+
+
+def run(threads, duration, encoded):
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        done = 0
+        while time.perf_counter() < deadline:
+            hashing.check_password("rtsgbdkue", encoded)
+            done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(worker) for _ in range(threads)]
+        return sum(f.result() for f in futures) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=os.cpu_count())
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    encoded = make_password("rtsgbdkue")
+    with override_settings(PASSWORD_HASHING_WORKERS=0):
+        inline = run(args.threads, args.duration, encoded)
+    with override_settings(PASSWORD_HASHING_WORKERS=args.pool_size):
+        # Warm the pool so process start-up is not counted.
+        hashing.check_password("rtsgbdkue", encoded)
+        pooled = run(args.threads, args.duration, encoded)
+
+    print(f"threads per worker: {args.threads}")
+    print(f"inline: {inline:8.1f} logins/s")
+    print(f"pooled: {pooled:8.1f} logins/s (pool size {args.pool_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+One scenario per route in ``users/urls.py`` plus its query budget.
+
+Each scenario builds a request against a ``Context`` (a seeded user with a
+token, profile and address); any setup it needs happens before the request
+and is not counted. Budgets are the number of queries the request itself
+may run once the token cache is warm, not counting transaction control
+statements (which only some backends log) or the audit log's batched
+INSERT, which is shared by many requests. The benchmark runner and
+``users.tests.QueryBudgetTests`` both fail when one is exceeded.
+"""
+from django.contrib.auth.hashers import make_password
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import (
+    AuditEvent,
+    AuthToken,
+    Profile,
+    ResidentialAddress,
+    User,
+)
+from users.utils import account_activation_token, password_reset_token
+
+PASSWORD = "Bench-pass-42"
+TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK")
+AUDIT_FLUSH = f'INSERT INTO "{AuditEvent._meta.db_table}"'
+
+QUERY_BUDGETS = {
+    "signup": 3,
+    "activate": 2,
+    "login": 2,
+    "forgot-password": 2,
+    "reset-password": 3,
+    "change-password": 4,
+    "user": 0,
+    "profile": 1,
+    "address": 1,
+    "me": 2,
+    "profile-put": 1,
+    "address-put": 1,
+    "profile-replace": 1,
+    "addresses": 1,
+    "addresses-replace": 5,
+}
+
+
+class Context:
+    def __init__(self):
+        self.password_hash = make_password(PASSWORD)
+        self.user = User.objects.create(
+            email="bench@example.com",
+            first_name="bench",
+            password=self.password_hash,
+            is_active=True,
+        )
+        self.token = AuthToken.objects.create(user=self.user).key
+        Profile.objects.create(
+            user=self.user,
+            middle_name="m",
+            last_name="l",
+            dob="1990-01-01",
+            nationality="kenya",
+            phone_number="+255700000000",
+        )
+        self.address = ResidentialAddress.objects.create(
+            user=self.user,
+            country="kenya",
+            city="nairobi",
+            state="nairobi",
+            zip="00100",
+        )
+
+    def fresh_token(self):
+        """The context's token, reissued if a request revoked it."""
+        if not AuthToken.objects.filter(key=self.token).exists():
+            self.token = AuthToken.objects.create(user=self.user).key
+        return self.token
+
+    @property
+    def auth(self):
+        return {"HTTP_AUTHORIZATION": f"Token {self.token}"}
+
+
+def signup(ctx, i):
+    data = {
+        "email": f"signup{i}@example.com",
+        "first_name": "bench",
+        "password": PASSWORD,
+    }
+    return "post", reverse("signup"), data, {}
+
+
+def activate(ctx, i):
+    user = User.objects.create(
+        email=f"activate{i}@example.com",
+        first_name="bench",
+        password=ctx.password_hash,
+    )
+    path = reverse(
+        "activate-user",
+        args=[
+            urlsafe_base64_encode(force_bytes(user.id)),
+            account_activation_token.make_token(user),
+        ],
+    )
+    return "get", path, None, {}
+
+
+def login(ctx, i):
+    data = {"email": ctx.user.email, "password": PASSWORD}
+    return "post", reverse("login"), data, {}
+
+
+def forgot_password(ctx, i):
+    return "post", reverse("forgot-password"), {"email": ctx.user.email}, {}
+
+
+def reset_password(ctx, i):
+    # Links are bound to the password hash, which the last reset changed.
+    ctx.user.refresh_from_db(fields=["password", "last_login"])
+    path = reverse(
+        "reset-password",
+        args=[
+            urlsafe_base64_encode(force_bytes(ctx.user.id)),
+            password_reset_token.make_token(ctx.user),
+        ],
+    )
+    data = {"password1": PASSWORD, "password2": PASSWORD}
+    return "post", path, data, {}
+
+
+def change_password(ctx, i):
+    # change-password revokes the token, hand out a fresh one each time.
+    ctx.fresh_token()
+    data = {"password1": PASSWORD, "password2": PASSWORD}
+    return "post", reverse("change-password"), data, ctx.auth
+
+
+def authenticated_get(name):
+    def build(ctx, i):
+        ctx.fresh_token()
+        return "get", reverse(name), None, ctx.auth
+
+    return build
+
+
+def authenticated_put(name, data):
+    def build(ctx, i):
+        ctx.fresh_token()
+        return "put", reverse(name), data, ctx.auth
+
+    return build
+
+
+def replace_addresses(ctx, i):
+    # Keep the seeded address (changed on the first run) and swap the
+    # second one: a locked SELECT, the delete-diff, an UPDATE and an INSERT.
+    ctx.fresh_token()
+    address = {"country": "kenya", "state": "nairobi", "zip": "00100"}
+    data = [
+        dict(address, id=str(ctx.address.id), city=f"nairobi{i}"),
+        dict(address, city="thika"),
+    ]
+    return "put", reverse("address-list"), data, ctx.auth
+
+
+SCENARIOS = {
+    "signup": signup,
+    "activate": activate,
+    "login": login,
+    "forgot-password": forgot_password,
+    "reset-password": reset_password,
+    "change-password": change_password,
+    "user": authenticated_get("user"),
+    "profile": authenticated_get("profile"),
+    "address": authenticated_get("address"),
+    "me": authenticated_get("me"),
+    "profile-put": authenticated_put("profile", {"middle_name": "n"}),
+    "address-put": authenticated_put("address", {"city": "mombasa"}),
+    "profile-replace": authenticated_put(
+        "profile",
+        {
+            "middle_name": "m",
+            "last_name": "l",
+            "dob": "1990-01-01",
+            "nationality": "kenya",
+            "phone_number": "+255700000000",
+        },
+    ),
+    "addresses": authenticated_get("address-list"),
+    "addresses-replace": replace_addresses,
+}
+
+
+def build(ctx, name, i):
+    return SCENARIOS[name](ctx, i)
+
+
+def send(client, request):
+    method, path, data, extra = request
+    if method in ("post", "put"):
+        return getattr(client, method)(path, data, format="json", **extra)
+    return client.get(path, **extra)
+
+
+def count_queries(captured):
+    return sum(
+        1
+        for query in captured
+        if not query["sql"].upper().startswith(TRANSACTION_STATEMENTS)
+        and not query["sql"].startswith(AUDIT_FLUSH)
+    )
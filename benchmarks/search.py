@@ -0,0 +1,148 @@
+"""
+Latency of the admin user search over synthetic users.
+
+Seeds ``--users`` users with profiles, built from a fixed-seed random mix
+of names, into a throwaway test database and times each kind of query
+through the test client. On Postgres the queries run against the trigram
+and unique indexes; on SQLite against the in-process trigram index, whose
+build time is reported separately. Exits non-zero when a p95 is above
+``--target-ms``.
+
+    python -m benchmarks.search --users 100000 --iterations 200
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.utils import (
+    Timer,
+    format_summary,
+    setup_django,
+    summarize,
+    test_database,
+)
+
+setup_django()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from users.models import AuthToken, Profile, User  # noqa: E402
+from users.search import trigram_index  # noqa: E402
+
+NAMES = [
+    "achieng",
+    "baraka",
+    "chebet",
+    "daniel",
+    "njeri",
+    "kamau",
+    "otieno",
+    "wanjiru",
+    "mwangi",
+    "akinyi",
+    "kiprono",
+    "nyambura",
+    "omondi",
+    "wambui",
+    "mutua",
+    "kakai",
+]
+DOMAINS = ["gmail.com", "yahoo.com", "corp.co.ke", "mail.com"]
+
+
+def seed(users, rng, batch_size=5000):
+    password = make_password("Bench-pass-42")
+    for start in range(0, users, batch_size):
+        rows = []
+        for i in range(start, min(users, start + batch_size)):
+            first, last = rng.choice(NAMES), rng.choice(NAMES)
+            domain = rng.choice(DOMAINS)
+            rows.append(
+                (
+                    User(
+                        email=f"{first}.{last}{i}@{domain}",
+                        email_domain=domain,
+                        first_name=first.title(),
+                        password=password,
+                        is_active=True,
+                    ),
+                    last.title(),
+                    f"+2547{i:08d}",
+                )
+            )
+        User.objects.bulk_create(user for user, _, _ in rows)
+        Profile.objects.bulk_create(
+            Profile(
+                user=user,
+                middle_name="m",
+                last_name=last_name,
+                dob="1990-01-01",
+                nationality="kenya",
+                phone_number=phone_number,
+            )
+            for user, last_name, phone_number in rows
+        )
+
+
+def queries(kind, users, rng):
+    if kind == "email":
+        return f"{rng.choice(NAMES)}.{rng.choice(NAMES)}{rng.randrange(users)}"
+    if kind == "name":
+        return rng.choice(NAMES)[1:5]
+    return f"07{rng.randrange(users):08d}"
+
+
+def run(client, kind, users, iterations, rng):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        q = queries(kind, users, rng)
+        t0 = time.perf_counter()
+        response = client.get("/users/search", {"q": q})
+        latencies.append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.content
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with test_database():
+        with Timer() as timer:
+            seed(args.users, rng)
+        print(f"seeded {args.users} users in {timer.elapsed:.1f}s")
+
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {AuthToken.objects.create(user=admin)}"
+        )
+        if connection.vendor != "postgresql":
+            with Timer() as timer:
+                trigram_index.build()
+            trigram_index.stale = False
+            print(f"built in-process index in {timer.elapsed:.1f}s")
+
+        failed = False
+        for kind in ("email", "name", "phone"):
+            summary = run(client, kind, args.users, args.iterations, rng)
+            ok = summary["p95_ms"] <= args.target_ms
+            failed |= not ok
+            print(
+                format_summary(f"search-{kind}", summary),
+                "ok" if ok else f"OVER {args.target_ms:.0f}ms",
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
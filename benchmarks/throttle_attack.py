@@ -0,0 +1,148 @@
+"""
+Legitimate login latency during a credential-stuffing burst.
+
+Attacker threads hammer ``login`` with wrong passwords for random victim
+accounts from a handful of IPs while one client performs legitimate
+logins, each for a different account and IP. The run is repeated without
+an attack, with the attack and throttling on, and with the attack and
+throttling off, reporting the legitimate logins' latency each time.
+
+    python -m benchmarks.throttle_attack --attackers 16 --duration 10
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.utils import (
+    format_summary,
+    setup_django,
+    summarize,
+    test_database,
+    without_throttling,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from users.models import User  # noqa: E402
+from users.throttling import local_counters  # noqa: E402
+
+PASSWORD = "rtsgbdkue"
+
+
+def seed(accounts):
+    encoded = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(
+            email=f"user{i}@example.com",
+            email_domain="example.com",
+            first_name=f"user{i}",
+            password=encoded,
+            is_active=True,
+        )
+        for i in range(accounts)
+    )
+
+
+def attacker(stop, accounts, ips, counts):
+    client = Client()
+    rng = random.Random()
+    while not stop.is_set():
+        client.post(
+            "/login",
+            {
+                "email": f"user{rng.randrange(accounts)}@example.com",
+                "password": "guess",
+            },
+            content_type="application/json",
+            REMOTE_ADDR=rng.choice(ips),
+        )
+        counts.append(1)
+
+
+def run(args, attackers):
+    local_counters.clear()
+    stop = threading.Event()
+    attempts = []
+    ips = [f"10.0.0.{i}" for i in range(args.attacker_ips)]
+    threads = [
+        threading.Thread(
+            target=attacker, args=(stop, args.accounts, ips, attempts)
+        )
+        for _ in range(attackers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    client = Client()
+    latencies = []
+    started = time.perf_counter()
+    i = 0
+    while time.perf_counter() - started < args.duration:
+        start = time.perf_counter()
+        response = client.post(
+            "/login",
+            {"email": f"user{i}@example.com", "password": PASSWORD},
+            content_type="application/json",
+            REMOTE_ADDR=f"192.168.{i // 256 % 256}.{i % 256}",
+        )
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        i = (i + 1) % args.accounts
+        time.sleep(args.interval)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, elapsed), len(attempts) / elapsed
+
+
+def login_ip_rate(rate):
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rates = dict(rest_framework["DEFAULT_THROTTLE_RATES"])
+    if rate:
+        rates["login_ip"] = rate
+    rest_framework["DEFAULT_THROTTLE_RATES"] = rates
+    return override_settings(REST_FRAMEWORK=rest_framework)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--attackers", type=int, default=8)
+    parser.add_argument("--attacker-ips", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--ip-rate",
+        help="Override the login_ip rate, e.g. 5/min, to exhaust the "
+        "attackers' allowance within a short run.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.05,
+        help="Pause between legitimate logins.",
+    )
+    args = parser.parse_args()
+
+    with test_database():
+        seed(args.accounts)
+        results = [("no attack", *run(args, 0))]
+        with login_ip_rate(args.ip_rate):
+            results.append(("attack, throttled", *run(args, args.attackers)))
+        with without_throttling():
+            results.append(("attack, unthrottled", *run(args, args.attackers)))
+    for name, summary, attack_rate in results:
+        print(
+            f"{format_summary(name, summary)} "
+            f"attacker attempts {attack_rate:.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
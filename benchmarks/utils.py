@@ -0,0 +1,82 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Create a throwaway test database (SQLite or local Postgres, whatever
+    the active settings point at) for the duration of the block.
+    """
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "rps": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+    }
+
+
+def format_summary(name, summary):
+    return (
+        f"{name:<24} {summary['requests']:>7} req "
+        f"{summary['rps']:>9.1f} req/s "
+        f"p50 {summary['p50_ms']:>8.2f}ms "
+        f"p95 {summary['p95_ms']:>8.2f}ms "
+        f"p99 {summary['p99_ms']:>8.2f}ms"
+    )
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def without_throttling():
+    """Settings override that lifts every throttle rate."""
+    from django.conf import settings
+    from django.test import override_settings
+
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework["DEFAULT_THROTTLE_RATES"] = dict.fromkeys(
+        rest_framework.get("DEFAULT_THROTTLE_RATES", {})
+    )
+    return override_settings(REST_FRAMEWORK=rest_framework)
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -13,6 +14,9 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-j3ce+k=025v_nb70*ok%m6l877
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# running under `manage.py test`
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = ['*']
 
 # Application definition
@@ -30,11 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'users.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.routers.ReplicaPinMiddleware',
+    'users.sharding.ShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -59,6 +66,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'user_management.wsgi.application'
 
+# preload lazily built state before the first request, see `users.warmup`
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0") == "1"
+
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
@@ -73,6 +83,33 @@ DATABASES = {
     }
 }
 
+# read replicas, see `users.routers`
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{index}"] = dict(
+        DATABASES["default"], HOST=host, TEST={"MIRROR": "default"}
+    )
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+# user data sharded over these aliases, see `users.sharding`; empty keeps
+# everything on default
+DATABASE_SHARDS = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_SHARD_HOSTS", "").split(","))
+):
+    DATABASES[f"shard_{index}"] = dict(DATABASES["default"], HOST=host)
+    DATABASE_SHARDS.append(f"shard_{index}")
+SHARD_RING_VNODES = int(os.getenv("SHARD_RING_VNODES", "128"))
+
+DATABASE_ROUTERS = [
+    "users.sharding.ShardRouter",
+    "users.routers.PrimaryReplicaRouter",
+]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_PIN_CACHE = os.getenv("REPLICA_PIN_CACHE", "default")
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -92,6 +129,13 @@ AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
     },
+    {
+        "NAME": "users.password_validation.BreachedPasswordValidator",
+        "OPTIONS": {
+            # built with `manage.py build_breached_password_index`
+            "index_path": os.getenv("BREACHED_PASSWORDS_INDEX"),
+        },
+    },
 ]
 
 # Internationalization
@@ -117,6 +161,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "users.User"
 
+AUTHENTICATION_BACKENDS = ["users.backends.PooledModelBackend"]
+
+# Size of the process pool used for password hashing, 0 hashes inline.
+# See `users.hashing`. Each web worker process gets its own pool, so keep it
+# small; the test suite hashes inline.
+PASSWORD_HASHING_WORKERS = (
+    0 if TESTING else int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+)
+
 # email settings
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.mailtrap.io')
 EMAIL_HOST_USER = os.getenv('EMAIL_USER', '379e38bb8bc32c')
@@ -126,9 +179,84 @@ EMAIL_PORT = os.getenv('EMAIL_PORT', '2525')
 # auth settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication"
+        "users.authentication.CachedTokenAuthentication"
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # brute-force protection, see `users.throttling`
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": os.getenv("THROTTLE_LOGIN_IP", "30/min"),
+        "login_email": os.getenv("THROTTLE_LOGIN_EMAIL", "10/min"),
+        "forgot_password_ip": os.getenv("THROTTLE_FORGOT_PASSWORD_IP", "10/min"),
+        "forgot_password_email": os.getenv(
+            "THROTTLE_FORGOT_PASSWORD_EMAIL", "5/hour"
+        ),
+    },
+    # reverse proxies in front of the app; X-Forwarded-For is only trusted
+    # for that many hops, with 0 the throttles key on REMOTE_ADDR
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
 }
+
+# cache alias shared by all workers for throttle counters, in-process if unset
+THROTTLE_CACHE = os.getenv("THROTTLE_CACHE")
+
+# outbox worker settings, see `manage.py send_queued_mail`
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '100'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', '30'))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', '300'))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))
+
+# token authentication cache, see `users.authentication.TokenCache`
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": int(os.getenv("TOKEN_AUTH_CACHE_SIZE", "10000")),
+    "TTL": int(os.getenv("TOKEN_AUTH_CACHE_TTL", "30")),
+    "SHARED_CACHE": os.getenv("TOKEN_AUTH_SHARED_CACHE"),
+    "SHARED_TTL": int(os.getenv("TOKEN_AUTH_SHARED_TTL", "300")),
+}
+
+# read-through cache of user/profile/address payloads, see
+# `users.payload_cache`; a TTL of 0 disables it
+PAYLOAD_CACHE = {
+    "ALIAS": os.getenv("PAYLOAD_CACHE", "default"),
+    "TTL": int(os.getenv("PAYLOAD_CACHE_TTL", "0")),
+    "LEASE_TTL": int(os.getenv("PAYLOAD_CACHE_LEASE_TTL", "10")),
+    "WAIT_TIMEOUT": float(os.getenv("PAYLOAD_CACHE_WAIT_TIMEOUT", "1")),
+}
+
+# change feed for downstream sync, see `users.changes`
+CHANGE_FEED = {
+    "LAG": float(os.getenv("CHANGE_FEED_LAG", "5")),
+    "MAX_LIMIT": int(os.getenv("CHANGE_FEED_MAX_LIMIT", "1000")),
+    "TOMBSTONE_DAYS": int(os.getenv("CHANGE_FEED_TOMBSTONE_DAYS", "30")),
+}
+
+# buffered audit log, see `users.audit`
+AUDIT_LOG = {
+    "FLUSH_SIZE": int(os.getenv("AUDIT_LOG_FLUSH_SIZE", "200")),
+    "FLUSH_INTERVAL": float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "5")),
+    "MAX_BUFFER": int(os.getenv("AUDIT_LOG_MAX_BUFFER", "10000")),
+    # flush from a timer thread too, so a quiet worker's events still get
+    # written; off in tests, which flush explicitly
+    "FLUSH_TIMER": not TESTING,
+}
+
+# national phone numbers (leading 0) are stored with this country code
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "254")
+
+# lifetime of password reset links, see `users.views.reset_password`
+PASSWORD_RESET_TIMEOUT = int(os.getenv("PASSWORD_RESET_TIMEOUT", "3600"))
+
+# API tokens, see `users.models.AuthToken`
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(30 * 24 * 3600)))
+AUTH_TOKEN_LAST_USED_INTERVAL = int(
+    os.getenv("AUTH_TOKEN_LAST_USED_INTERVAL", "300")
+)
+AUTH_TOKEN_SWEEP_BATCH_SIZE = int(
+    os.getenv("AUTH_TOKEN_SWEEP_BATCH_SIZE", "1000")
+)
+
+# request instrumentation, see `users.instrumentation`
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv("SERVER_TIMING_SAMPLE_RATE", "0"))
+INTERNAL_IPS = os.getenv("INTERNAL_IPS", "127.0.0.1").split(",")
@@ -0,0 +1,40 @@
+"""
+API-only settings for autoscaled workers.
+
+The token-authenticated API in ``users.urls`` doesn't use the admin,
+sessions, messages, static files, CSRF or clickjacking protection, so this
+profile leaves them out of ``INSTALLED_APPS`` and ``MIDDLEWARE`` and
+renders JSON only. ``user_management.urls`` only imports and mounts the
+admin when it is installed, so a worker started with
+
+    DJANGO_SETTINGS_MODULE=user_management.settings_api
+
+never loads it. Run the admin from a separate deployment using the full
+``user_management.settings``.
+"""
+from user_management.settings import *  # noqa: F401,F403
+from user_management.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+BROWSER_APPS = {
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+}
+BROWSER_MIDDLEWARE = {
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    # DRF authenticates every API request itself.
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in BROWSER_APPS]
+MIDDLEWARE = [name for name in MIDDLEWARE if name not in BROWSER_MIDDLEWARE]
+TEMPLATES = []
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_RENDERER_CLASSES=["rest_framework.renderers.JSONRenderer"],
+)
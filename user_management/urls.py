@@ -1,8 +1,13 @@
-
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('async/', include("users.async_urls")),
     path('', include("users.urls"))
 ]
+
+# The admin is left out of the API-only settings, see `settings_api`.
+if apps.is_installed("django.contrib.admin"):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from users.async_views import (
+    UserView,
+    login,
+    signup,
+    ProfileView,
+    ResidentialAddressView,
+)
+
+urlpatterns = [
+    path("user", UserView.as_view(), name="async-user"),
+    path("profile", ProfileView.as_view(), name="async-profile"),
+    path("address", ResidentialAddressView.as_view(), name="async-address"),
+    path("signup", signup, name="async-signup"),
+    path("login", login, name="async-login"),
+]
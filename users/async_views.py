@@ -0,0 +1,372 @@
+"""
+Native async versions of the auth and profile endpoints for the ASGI
+deployment, mounted under ``async/``.
+
+Django 4.0 has no async ORM API yet, so queries are awaited through
+``sync_to_async`` (which is what the 4.1 ``a*`` queryset methods do under
+the hood). Password hashing is awaited on the ``users.hashing`` process
+pool, so the event loop keeps serving other requests while PBKDF2 runs.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_201_CREATED,
+    HTTP_200_OK,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_404_NOT_FOUND,
+    HTTP_412_PRECONDITION_FAILED,
+    HTTP_429_TOO_MANY_REQUESTS,
+)
+
+from users import hashing, sharding
+from users.audit import audit_log
+from users.conditional import ANY, ConditionalMixin, PreconditionFailed
+from users.backends import PooledModelBackend
+from users.models import (
+    AuditEvent,
+    AuthToken,
+    User,
+    Profile,
+    ResidentialAddress,
+)
+from users.payload_cache import payload_cache
+from users.serializers import (
+    SignUpSerializer,
+    UserSerializer,
+    ProfileSerializer,
+    ResidentialAddressSerializer,
+    required_fields,
+)
+from users.throttling import LOGIN_THROTTLES
+from users.utils import queue_activation_mail
+
+
+def csrf_exempt(view):
+    # django.views.decorators.csrf.csrf_exempt wraps the view in a sync
+    # function on Django 4.0, which hides coroutine views from the handler.
+    view.csrf_exempt = True
+    return view
+
+
+def parse_body(request):
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def authenticate(request):
+    """
+    Run the configured DRF authentication classes against ``request``.
+    Returns the user, or ``None`` when no credentials were supplied.
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = await sync_to_async(authentication_class().authenticate)(
+            request
+        )
+        if result is not None:
+            return result[0]
+    return None
+
+
+@csrf_exempt
+async def login(request):
+    """
+    Sample request
+    {
+        "email":"daniel2@gmail.com",
+        "password":"mylena"
+    }
+    """
+    if request.method != "POST":
+        return JsonResponse(
+            {"detail": f'Method "{request.method}" not allowed.'}, status=405
+        )
+    # Read the body before DRF consumes the stream.
+    data = parse_body(request) or {}
+    drf_request = Request(request, parsers=[JSONParser()])
+    for throttle_class in LOGIN_THROTTLES:
+        throttle = throttle_class()
+        if not await sync_to_async(throttle.allow_request)(drf_request, None):
+            return JsonResponse(
+                {"detail": "Request was throttled."},
+                status=HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(int(throttle.wait()) + 1)},
+            )
+    email = data.get("email")
+    password = data.get("password")
+    if email is None or password is None:
+        return JsonResponse(
+            {"error": "Please provide both email and password"},
+            status=HTTP_400_BAD_REQUEST,
+        )
+    user = await PooledModelBackend().aauthenticate(
+        request, email=email, password=password
+    )
+    if not user:
+        return JsonResponse(
+            {"error": "Invalid Credentials or Inactive"},
+            status=HTTP_404_NOT_FOUND,
+        )
+    token = await sync_to_async(AuthToken.objects.create)(user=user)
+    # A due flush writes to the database, so emit off the event loop.
+    await sync_to_async(audit_log.emit)(AuditEvent.LOGIN, user.pk, request)
+    return JsonResponse(
+        {"token": token.key, "expires_at": token.expires_at},
+        status=HTTP_200_OK,
+    )
+
+
+def _create_user(request, user):
+    with sharding.atomic(user.pk):
+        user.save()
+        queue_activation_mail(request, user)
+
+
+@csrf_exempt
+async def signup(request):
+    """
+    Sample request
+    {
+      "email": "danielkakai@gmail.com",
+      "first_name": "dan akai",
+      "password": "hhhh"
+    }
+    """
+    if request.method != "POST":
+        return JsonResponse(
+            {"detail": f'Method "{request.method}" not allowed.'}, status=405
+        )
+    serializer = SignUpSerializer(data=parse_body(request) or {})
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    user = User(**data)
+    await hashing.aset_password(user, data["password"])
+    try:
+        await sync_to_async(_create_user)(request, user)
+    except IntegrityError:
+        return JsonResponse(
+            serializer.conflict_errors, status=HTTP_400_BAD_REQUEST
+        )
+    await sync_to_async(audit_log.emit)(AuditEvent.SIGNUP, user.pk, request)
+    return JsonResponse(
+        {
+            "user": UserSerializer(user).data,
+            "message": "Activation link sent to your email",
+        },
+        status=HTTP_201_CREATED,
+    )
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of ``APIView``: authenticates with the DRF
+    authentication classes, requires a user and parses JSON bodies.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        async_view.view_class = cls
+        async_view.view_initkwargs = initkwargs
+        async_view.__doc__ = cls.__doc__
+        return csrf_exempt(async_view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None)
+        if method not in self.http_method_names or handler is None:
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        try:
+            user = await authenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse(
+                {"detail": str(e.detail)}, status=HTTP_401_UNAUTHORIZED
+            )
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=HTTP_401_UNAUTHORIZED,
+            )
+        request.user = user
+        self.data = parse_body(request) if method in ("post", "put") else {}
+        if self.data is None:
+            return JsonResponse(
+                {"detail": "JSON parse error"}, status=HTTP_400_BAD_REQUEST
+            )
+        return await handler(request, *args, **kwargs)
+
+
+class UserView(AsyncAPIView):
+    """
+    API endpoint that allows users to be viewed.
+    """
+
+    async def get(self, request):
+        return JsonResponse(
+            UserSerializer(request.user).data, status=HTTP_200_OK
+        )
+
+
+class UserOwnedView(ConditionalMixin, AsyncAPIView):
+    """
+    Shared get/post/put/delete for the per-user rows, with the same
+    single-statement writes, ETags and ``If-Match`` handling as
+    ``users.views.UserOwnedView``.
+    """
+
+    model = None
+    serializer_class = None
+    audit_name = None
+
+    def get_object(self, user):
+        return self.model.objects.for_user(user.id).first()
+
+    def not_found(self):
+        return JsonResponse(
+            {"detail": "Not found."}, status=HTTP_404_NOT_FOUND
+        )
+
+    def audit(self, action, **data):
+        audit_log.emit(
+            f"{self.audit_name}_{action}",
+            self.request.user.id,
+            self.request,
+            **data,
+        )
+
+    def precondition_failed(self):
+        etag = self.current_etag(self.request.user)
+        return JsonResponse(
+            self.precondition_failed_data,
+            status=HTTP_412_PRECONDITION_FAILED,
+            headers={"ETag": etag} if etag else {},
+        )
+
+    def respond(self, instance):
+        return JsonResponse(
+            self.serializer_class(instance).data,
+            status=HTTP_200_OK,
+            headers=self.etag_headers(instance),
+        )
+
+    def write(self, method, *args, action=None, missing=None, **data):
+        try:
+            instance = method(*args)
+        except IntegrityError:
+            return JsonResponse(
+                self.serializer_class.conflict_errors,
+                status=HTTP_400_BAD_REQUEST,
+            )
+        if instance is None:
+            return (missing or self.not_found)()
+        if action:
+            self.audit(action, **data)
+        return self.respond(instance)
+
+    def save(self, partial):
+        serializer = self.serializer_class(data=self.data, partial=partial)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=HTTP_400_BAD_REQUEST)
+        values = dict(serializer.validated_data)
+        user_id = self.request.user.id
+        manager = self.model.objects
+        if not partial:
+            return self.write(
+                manager.insert_for_user, user_id, values, action="create"
+            )
+        fields = sorted(values)
+        try:
+            expected = self.expected_version(self.request)
+        except PreconditionFailed:
+            return self.precondition_failed()
+        if expected is not None:
+            return self.write(
+                manager.update_for_user,
+                user_id,
+                values,
+                None if expected is ANY else expected,
+                action="update" if values else None,
+                missing=self.precondition_failed,
+                fields=fields,
+            )
+        if required_fields(serializer) <= set(values):
+            return self.write(
+                manager.upsert_for_user,
+                user_id,
+                values,
+                action="update",
+                fields=fields,
+            )
+        if values:
+            return self.write(
+                manager.update_for_user,
+                user_id,
+                values,
+                action="update",
+                fields=fields,
+            )
+        return self.write(self.get_object, self.request.user)
+
+    def load(self, request):
+        etag = self.unmodified_etag(request)
+        if etag is not None:
+            return HttpResponseNotModified(headers={"ETag": etag})
+        instance = self.get_object(request.user)
+        if instance is None:
+            return self.not_found()
+        return self.respond(instance)
+
+    async def get(self, request):
+        return await sync_to_async(self.load)(request)
+
+    async def post(self, request):
+        return await sync_to_async(self.save)(partial=False)
+
+    async def put(self, request):
+        return await sync_to_async(self.save)(partial=True)
+
+    async def delete(self, request):
+        deleted = await sync_to_async(self.model.objects.delete_for_user)(
+            request.user.id
+        )
+        if deleted is None:
+            return self.not_found()
+        await sync_to_async(payload_cache.invalidate)(
+            request.user.id, self.model._meta.model_name
+        )
+        await sync_to_async(self.audit)("delete")
+        return JsonResponse(
+            {"message": f"{self.model.__name__} ID deleted"},
+            status=HTTP_200_OK,
+        )
+
+
+class ProfileView(UserOwnedView):
+    model = Profile
+    serializer_class = ProfileSerializer
+    audit_name = "profile"
+
+
+class ResidentialAddressView(UserOwnedView):
+    model = ResidentialAddress
+    serializer_class = ResidentialAddressSerializer
+    audit_name = "address"
@@ -0,0 +1,175 @@
+"""
+Audit trail of account lifecycle events (``users.models.AuditEvent``).
+
+Views call ``audit_log.emit(...)``, which only appends to an in-memory
+buffer, so hot paths like ``login`` don't get an extra write. The buffer
+is written with one ``bulk_create`` once it holds ``AUDIT_LOG["FLUSH_SIZE"]``
+events, by the request that fills it, or once its oldest event is
+``FLUSH_INTERVAL`` seconds old, by a timer thread (``FLUSH_TIMER``) or
+whichever request emits first, and at interpreter exit. It never holds more than
+``MAX_BUFFER`` events: when flushes keep failing the oldest are dropped,
+and counted as ``users_audit_events_total{result="dropped"}``.
+
+Emit after the request's own writes have committed, not inside an atomic
+block, or the flush becomes part of that transaction.
+"""
+import atexit
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from users.instrumentation import registry
+from users.models import AuditEvent
+
+
+class AuditLog:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.oldest = None
+        self.timer = None
+
+    @property
+    def config(self):
+        return settings.AUDIT_LOG
+
+    def emit(self, event, user_id, request=None, **data):
+        record = AuditEvent(
+            event=event,
+            user_id=user_id,
+            ip=request.META.get("REMOTE_ADDR") if request else None,
+            data=data,
+        )
+        with self.lock:
+            if not self.buffer:
+                self.oldest = time.monotonic()
+                self.schedule()
+            self.buffer.append(record)
+            self.trim()
+            due = (
+                len(self.buffer) >= self.config["FLUSH_SIZE"]
+                or time.monotonic() - self.oldest
+                >= self.config["FLUSH_INTERVAL"]
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered event, returning how many were written."""
+        with self.lock:
+            records, self.buffer = self.buffer, []
+            oldest, self.oldest = self.oldest, None
+        if not records:
+            return 0
+        try:
+            AuditEvent.objects.bulk_create(records)
+        except DatabaseError:
+            # Put them back for the next flush, in front of newer events.
+            with self.lock:
+                self.buffer[:0] = records
+                self.oldest = oldest
+                self.trim()
+            registry.increment("audit_events", result="failed")
+            return 0
+        registry.increment("audit_events", len(records), result="written")
+        return len(records)
+
+    def schedule(self):
+        # Called with the lock held. One pending timer at a time.
+        if self.timer is None and self.config.get("FLUSH_TIMER"):
+            self.timer = threading.Timer(
+                self.config["FLUSH_INTERVAL"], self.flush_on_timer
+            )
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer's thread is gone after this, and its connection
+            # with it.
+            connections.close_all()
+        with self.lock:
+            # Events that failed to write, or came in meanwhile.
+            if self.buffer:
+                self.schedule()
+
+    def trim(self):
+        excess = len(self.buffer) - self.config["MAX_BUFFER"]
+        if excess > 0:
+            del self.buffer[:excess]
+            registry.increment("audit_events", excess, result="dropped")
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.flush)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return month_start(month_start(day) + timedelta(days=32))
+
+
+def partition_name(start):
+    return f"{AuditEvent._meta.db_table}_{start:y%Ym%m}"
+
+
+def create_partitions(connection, months_ahead):
+    """
+    Create the monthly partitions from this month to ``months_ahead``
+    months ahead that don't exist yet, returning their names.
+    """
+    table = AuditEvent._meta.db_table
+    start = month_start(timezone.now().date())
+    created = []
+    with connection.cursor() as cursor:
+        for _ in range(months_ahead + 1):
+            end = next_month(start)
+            name = partition_name(start)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                )
+                created.append(name)
+            start = end
+    return created
+
+
+def drop_partitions(connection, retain_months):
+    """
+    Drop the monthly partitions that end before the last
+    ``retain_months`` months, returning their names.
+    """
+    table = AuditEvent._meta.db_table
+    cutoff = month_start(timezone.now().date())
+    for _ in range(retain_months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [table],
+        )
+        names = sorted(row[0] for row in cursor.fetchall())
+        for name in names:
+            # Monthly names sort by date, and this skips the DEFAULT one.
+            monthly = name.startswith(f"{table}_y")
+            if monthly and name < partition_name(cutoff):
+                cursor.execute(f"DROP TABLE {name}")
+                dropped.append(name)
+    return dropped
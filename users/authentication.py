@@ -0,0 +1,175 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from users import routers, sharding
+from users.models import AuthToken, User
+
+
+class TokenCache:
+    """
+    Two-tier cache of ``token key -> (user, token)``.
+
+    The first tier is an in-process LRU with a TTL, the second an optional
+    shared Django cache (``TOKEN_AUTH_CACHE["SHARED_CACHE"]``). Entries are
+    dropped from both tiers by ``invalidate``/``invalidate_user``. A local
+    hit is served without asking the shared tier, so other worker
+    processes keep using their local copy of a revoked token for at most
+    ``TTL`` seconds, after which they miss the deleted shared entry.
+    """
+
+    key_prefix = "auth-token:"
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return settings.TOKEN_AUTH_CACHE
+
+    @property
+    def shared(self):
+        alias = self.config.get("SHARED_CACHE")
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        value = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                else:
+                    value = None
+                    self._pop(key)
+        if value is not None:
+            return value
+        shared = self.shared
+        if shared is not None:
+            value = shared.get(self.key_prefix + key)
+            if value is not None:
+                self._store_local(key, value)
+                return value
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        shared = self.shared
+        if shared is not None:
+            shared.set(
+                self.key_prefix + key, value, self.config.get("SHARED_TTL")
+            )
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+        shared = self.shared
+        if shared is not None and keys:
+            shared.delete_many([self.key_prefix + key for key in keys])
+
+    def invalidate_user(self, user_id, keys=()):
+        with self._lock:
+            keys = set(keys) | self._user_keys.get(user_id, set())
+        self.invalidate(*keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _store_local(self, key, value):
+        user, _ = value
+        expires = time.monotonic() + self.config["TTL"]
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.config["MAX_SIZE"]:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1][0].pk
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` against the expiring ``AuthToken`` that serves
+    repeat lookups of the same key from ``token_cache`` instead of running
+    the token/user join on every request.
+
+    ``last_used`` is written at most once per
+    ``AUTH_TOKEN_LAST_USED_INTERVAL`` per token: the cached token remembers
+    the last write, and the UPDATE itself only matches a stale row, so
+    other workers don't repeat it either.
+    """
+
+    model = AuthToken
+    cache = token_cache
+
+    def authenticate_credentials(self, key):
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self.load(key)
+            self.cache.set(key, cached)
+        user, token = cached
+        now = timezone.now()
+        if token.expires_at <= now:
+            self.cache.invalidate(key)
+            raise exceptions.AuthenticationFailed(_("Token has expired."))
+        self.touch(token, now)
+        sharding.bind(user)
+        routers.identify(user)
+        # Views may mutate request.user, keep the cached copy pristine.
+        return copy.copy(user), token
+
+    def load(self, key):
+        if not sharding.enabled():
+            return super().authenticate_credentials(key)
+        # The user can't be joined in from another database.
+        try:
+            token = self.model.objects.get(key=key)
+            user = sharding.get_user(token.user_id)
+        except (self.model.DoesNotExist, User.DoesNotExist):
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        token.user = user
+        return user, token
+
+    def touch(self, token, now):
+        stale = now - timedelta(seconds=settings.AUTH_TOKEN_LAST_USED_INTERVAL)
+        if token.last_used is not None and token.last_used > stale:
+            return
+        self.model.objects.filter(
+            Q(last_used__isnull=True) | Q(last_used__lte=stale),
+            key=token.key,
+        ).update(last_used=now)
+        token.last_used = now
@@ -0,0 +1,58 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import identify_hasher
+
+from users import hashing, sharding
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that verifies passwords through ``users.hashing`` so the
+    PBKDF2 work happens off the request thread.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None:
+            email = kwargs.get(UserModel.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        try:
+            user = sharding.get_user_by_email(email)
+        except UserModel.DoesNotExist:
+            # Run the hasher once anyway so missing and existing accounts
+            # take the same time to reject.
+            hashing.make_password(password)
+            return None
+        if not hashing.check_password(password, user.password):
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+        if identify_hasher(user.password).must_update(user.password):
+            hashing.set_password(user, password)
+            user.save(update_fields=["password"])
+        return user
+
+    async def aauthenticate(
+        self, request, email=None, password=None, **kwargs
+    ):
+        """Async ``authenticate`` that awaits the pool instead of blocking."""
+        if email is None:
+            email = kwargs.get(UserModel.USERNAME_FIELD)
+        if email is None or password is None:
+            return None
+        try:
+            user = await sync_to_async(sharding.get_user_by_email)(email)
+        except UserModel.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        if not await hashing.acheck_password(password, user.password):
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+        if identify_hasher(user.password).must_update(user.password):
+            await hashing.aset_password(user, password)
+            await sync_to_async(user.save)(update_fields=["password"])
+        return user
@@ -0,0 +1,83 @@
+"""
+Strong ETags for the per-user ``Profile``/``ResidentialAddress`` rows,
+built from the row id and its ``version`` column, shared by the views in
+``users.views`` and ``users.async_views``.
+
+``If-None-Match`` on GET is answered from ``(id, version)`` alone, so a 304
+never loads or serializes the full row. ``If-Match`` on PUT gives
+optimistic concurrency: a stale version gets 412.
+"""
+import uuid
+
+from django.utils.http import parse_etags, quote_etag
+
+# ``expected_version`` for ``If-Match: *``: any current row will do.
+ANY = "*"
+
+
+class PreconditionFailed(Exception):
+    pass
+
+
+class ConditionalMixin:
+    model = None
+    precondition_failed_data = {
+        "error": "Resource was modified, fetch it again"
+    }
+
+    @staticmethod
+    def make_etag(obj_id, version):
+        return quote_etag(f"{obj_id.hex}-{version}")
+
+    @staticmethod
+    def parse_etag(etag):
+        """The ``(id, version)`` pair of one of our ETags, or ``None``."""
+        try:
+            obj_id, version = etag.strip('"').split("-")
+            return uuid.UUID(obj_id), int(version)
+        except ValueError:
+            return None
+
+    def etag_headers(self, instance):
+        return {"ETag": self.make_etag(instance.id, instance.version)}
+
+    def current_etag(self, user):
+        current = (
+            self.model.objects.for_user(user.id)
+            .values_list("id", "version")
+            .first()
+        )
+        return self.make_etag(*current) if current else None
+
+    @staticmethod
+    def etag_matches(header, etag):
+        etags = parse_etags(header)
+        return etag is not None and ("*" in etags or etag in etags)
+
+    def unmodified_etag(self, request):
+        """
+        The current ETag when ``If-None-Match`` matches it, i.e. when the
+        response is a 304, else ``None``.
+        """
+        header = request.META.get("HTTP_IF_NONE_MATCH")
+        if not header:
+            return None
+        etag = self.current_etag(request.user)
+        return etag if self.etag_matches(header, etag) else None
+
+    def expected_version(self, request):
+        """
+        The row a write must find according to ``If-Match``: ``None``
+        without the header, ``ANY`` for ``*`` and the ``(id, version)`` of
+        one of our ETags. Raises ``PreconditionFailed`` for anything else.
+        """
+        header = request.META.get("HTTP_IF_MATCH")
+        if not header:
+            return None
+        etags = parse_etags(header)
+        if "*" in etags:
+            return ANY
+        expected = self.parse_etag(etags[0]) if len(etags) == 1 else None
+        if expected is None:
+            raise PreconditionFailed
+        return expected
@@ -0,0 +1,139 @@
+"""
+Streaming export of every user with their profile and addresses, for
+compliance exports and warehouse loads.
+
+Users and their profile are read in one joined query through a server-side
+cursor (``.iterator(chunk_size=...)``). Addresses are fetched with one query
+per chunk of users, so memory is bounded by ``chunk_size`` whatever the
+table size. Output is NDJSON (one nested object per user) or CSV (one row
+per user and address), optionally gzip-compressed on the fly. Password
+hashes are never exported.
+"""
+import csv
+import io
+import json
+import zlib
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users import sharding
+from users.models import ResidentialAddress, User
+
+FORMATS = ("ndjson", "csv")
+USER_FIELDS = ("id", "email", "first_name", "is_active", "is_admin")
+PROFILE_FIELDS = (
+    "middle_name",
+    "last_name",
+    "dob",
+    "nationality",
+    "phone_number",
+)
+ADDRESS_FIELDS = ("id", "country", "city", "state", "zip")
+CSV_HEADER = (
+    USER_FIELDS
+    + tuple(f"profile_{name}" for name in PROFILE_FIELDS)
+    + tuple(f"address_{name}" for name in ADDRESS_FIELDS)
+)
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def iter_chunks(chunk_size, using=None):
+    """Yield lists of ``(user, profile or None)`` dicts."""
+    rows = (
+        User.objects.using(using)
+        .order_by("id")
+        .values_list(
+            *USER_FIELDS, *(f"profile__{name}" for name in PROFILE_FIELDS)
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    chunk = []
+    for row in rows:
+        user = dict(zip(USER_FIELDS, row))
+        profile = dict(zip(PROFILE_FIELDS, row[len(USER_FIELDS) :]))
+        # Every profile column is NOT NULL, so all None means no profile.
+        has_profile = any(value is not None for value in profile.values())
+        chunk.append((user, profile if has_profile else None))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_records(chunk_size=2000):
+    """
+    Yield one dict per user with ``profile`` and ``addresses``, shard by
+    shard when sharded.
+    """
+    for using in sharding.aliases():
+        for chunk in iter_chunks(chunk_size, using):
+            yield from chunk_records(chunk, using)
+
+
+def chunk_records(chunk, using):
+    addresses = (
+        ResidentialAddress.objects.using(using)
+        .filter(user_id__in=[user["id"] for user, _ in chunk])
+        .order_by("user_id", "id")
+        .values_list("user_id", *ADDRESS_FIELDS)
+    )
+    by_user = {
+        user_id: [dict(zip(ADDRESS_FIELDS, row[1:])) for row in rows]
+        for user_id, rows in groupby(addresses, key=lambda row: row[0])
+    }
+    for user, profile in chunk:
+        yield dict(
+            user,
+            profile=profile,
+            addresses=by_user.get(user["id"], []),
+        )
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder).encode() + b"\n"
+
+
+def iter_csv(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_HEADER)
+    yield flush()
+    empty_profile = dict.fromkeys(PROFILE_FIELDS)
+    empty_address = [dict.fromkeys(ADDRESS_FIELDS)]
+    for record in records:
+        profile = record["profile"] or empty_profile
+        for address in record["addresses"] or empty_address:
+            writer.writerow(
+                [record[name] for name in USER_FIELDS]
+                + [profile[name] for name in PROFILE_FIELDS]
+                + [address[name] for name in ADDRESS_FIELDS]
+            )
+        yield flush()
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_users(fmt="ndjson", gzip=False, chunk_size=2000):
+    """Return an iterator of the encoded export as ``bytes`` chunks."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    records = iter_records(chunk_size)
+    chunks = iter_ndjson(records) if fmt == "ndjson" else iter_csv(records)
+    return iter_gzip(chunks) if gzip else chunks
@@ -0,0 +1,86 @@
+"""
+Password hashing offloaded to a bounded process pool.
+
+PBKDF2 is deliberately slow; running it in ``PASSWORD_HASHING_WORKERS``
+separate processes keeps request threads free and caps how many hashes a
+worker can run at once. With ``PASSWORD_HASHING_WORKERS = 0`` everything
+runs inline, which is what the test suite uses.
+
+The pool starts its processes from a fork server rather than by forking
+the web worker, which may hold threads, locks and open connections.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from users.instrumentation import timed
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+            )
+    return _executor
+
+
+def _run(func, *args):
+    executor = get_executor()
+    with timed("hash"):
+        if executor is None:
+            return func(*args)
+        return executor.submit(func, *args).result()
+
+
+async def _arun(func, *args):
+    executor = get_executor()
+    with timed("hash"):
+        if executor is None:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+        return await asyncio.wrap_future(executor.submit(func, *args))
+
+
+def make_password(password):
+    return _run(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+    return _run(hashers.check_password, password, encoded)
+
+
+async def amake_password(password):
+    return await _arun(hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    return await _arun(hashers.check_password, password, encoded)
+
+
+def set_password(user, raw_password):
+    """Pool-backed equivalent of ``AbstractBaseUser.set_password``."""
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+async def aset_password(user, raw_password):
+    user.password = await amake_password(raw_password)
+    user._password = raw_password
@@ -0,0 +1,252 @@
+"""
+Per-request timing of the expensive phases of a request.
+
+``ServerTimingMiddleware`` samples requests (``SERVER_TIMING_SAMPLE_RATE``)
+and, for sampled ones, records the query count and the time spent in the
+database, password hashing, serializers and mail. The totals go out as a
+``Server-Timing`` header and into per-view histograms that ``metrics``
+renders in the Prometheus text format.
+
+Code elsewhere marks a phase with ``timed("hash")`` etc. Outside a sampled
+request that is a single context variable lookup. Events such as cache hits
+are counted, for every request, with ``registry.increment``.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+PHASES = ("db", "hash", "serialize", "mail")
+DURATION_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.active = set()
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to ``phase`` of the current sampled
+    request. Nested blocks of the same phase are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or phase in metrics.active:
+        yield
+        return
+    metrics.active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[phase] += time.perf_counter() - start
+        metrics.active.discard(phase)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+def install_db_wrapper():
+    """
+    Count the queries of this thread's connections from now on. The wrapper
+    stays installed, as queries of an async request run on whichever thread
+    ``sync_to_async`` picks, and does nothing outside a sampled request.
+    """
+    for connection in connections.all():
+        if _db_wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_db_wrapper)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.durations = {}
+        self.queries = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def record(self, view, total, metrics):
+        with self.lock:
+            for phase, value in (("total", total), *metrics.durations.items()):
+                key = (view, phase)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.durations[key].observe(value)
+            if view not in self.queries:
+                self.queries[view] = Histogram(QUERY_BUCKETS)
+            self.queries[view].observe(metrics.queries)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.durations.clear()
+            self.queries.clear()
+            self.counters.clear()
+
+    def render(self):
+        lines = [
+            "# HELP users_request_phase_seconds Time spent per request phase.",
+            "# TYPE users_request_phase_seconds histogram",
+        ]
+        with self.lock:
+            for (view, phase), histogram in sorted(self.durations.items()):
+                labels = f'view="{view}",phase="{phase}"'
+                lines.extend(
+                    _render_histogram(
+                        "users_request_phase_seconds", labels, histogram
+                    )
+                )
+            lines.extend(
+                [
+                    "# HELP users_request_queries Database queries per request.",
+                    "# TYPE users_request_queries histogram",
+                ]
+            )
+            for view, histogram in sorted(self.queries.items()):
+                lines.extend(
+                    _render_histogram(
+                        "users_request_queries", f'view="{view}"', histogram
+                    )
+                )
+            names = set()
+            for (name, labels), count in sorted(self.counters.items()):
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE users_{name}_total counter")
+                labels = ",".join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f"users_{name}_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(name, labels, histogram):
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+    yield f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}'
+    yield f"{name}_sum{{{labels}}} {histogram.sum}"
+    yield f"{name}_count{{{labels}}} {histogram.total}"
+
+
+registry = Registry()
+
+
+def server_timing_header(total, metrics):
+    entries = [
+        f"{phase};dur={metrics.durations[phase] * 1000:.2f}"
+        for phase in PHASES
+    ]
+    entries.append(f'queries;desc="{metrics.queries}"')
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, like
+            # ``MiddlewareMixin._async_check``.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def sampled(self):
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        return rate and random.random() < rate
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        install_db_wrapper()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, start, metrics)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        await sync_to_async(install_db_wrapper)()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, start, metrics)
+
+    def finish(self, request, response, start, metrics):
+        total = time.perf_counter() - start
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        registry.record(view, total, metrics)
+        response["Server-Timing"] = server_timing_header(total, metrics)
+        return response
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, only served to ``INTERNAL_IPS``."""
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
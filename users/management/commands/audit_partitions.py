@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from users.audit import create_partitions, drop_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly audit log partitions ahead of time and drop the "
+        "ones past retention. Postgres only; run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            help="Drop partitions older than this many months, default keep "
+            "everything.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            self.stdout.write("The audit log is only partitioned on Postgres")
+            return
+        for name in create_partitions(connection, options["months_ahead"]):
+            self.stdout.write(f"Created {name}")
+        if options["retain_months"] is not None:
+            for name in drop_partitions(connection, options["retain_months"]):
+                self.stdout.write(f"Dropped {name}")
@@ -0,0 +1,91 @@
+import heapq
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.password_validation import RECORD_SIZE
+
+READ_SIZE = RECORD_SIZE * 8192
+
+
+def read_records(path):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_SIZE)
+            if not block:
+                return
+            for offset in range(0, len(block), RECORD_SIZE):
+                yield block[offset : offset + RECORD_SIZE]
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the memory-mapped breached password index used by "
+        "BreachedPasswordValidator from a SHA-1 hash dump (one "
+        "'HASH' or 'HASH:COUNT' per line, as published by Have I Been "
+        "Pwned)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source")
+        parser.add_argument("output")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10_000_000,
+            help="Hashes sorted in memory at a time before merging.",
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as workdir:
+            runs = self.write_sorted_runs(
+                options["source"], workdir, options["chunk_size"]
+            )
+            total = self.merge(runs, options["output"])
+        self.stdout.write(f"Wrote {total} hashes to {options['output']}")
+
+    def parse(self, line, number):
+        digest = line.split(b":", 1)[0].strip()
+        try:
+            record = bytes.fromhex(digest.decode("ascii"))
+        except ValueError:
+            raise CommandError(f"Line {number} is not a SHA-1 hash: {line!r}")
+        if len(record) != 20:
+            raise CommandError(f"Line {number} is not a SHA-1 hash: {line!r}")
+        return record[:RECORD_SIZE]
+
+    def write_sorted_runs(self, source, workdir, chunk_size):
+        runs = []
+        chunk = []
+        with open(source, "rb") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                chunk.append(self.parse(line, number))
+                if len(chunk) >= chunk_size:
+                    runs.append(self.write_run(chunk, workdir, len(runs)))
+                    chunk = []
+        if chunk or not runs:
+            runs.append(self.write_run(chunk, workdir, len(runs)))
+        return runs
+
+    def write_run(self, chunk, workdir, number):
+        chunk.sort()
+        path = os.path.join(workdir, f"run-{number}")
+        with open(path, "wb") as f:
+            f.write(b"".join(chunk))
+        return path
+
+    def merge(self, runs, output):
+        total = 0
+        previous = None
+        tmp_output = f"{output}.tmp"
+        with open(tmp_output, "wb") as f:
+            for record in heapq.merge(*(read_records(run) for run in runs)):
+                if record != previous:
+                    f.write(record)
+                    total += 1
+                    previous = record
+        os.replace(tmp_output, output)
+        return total
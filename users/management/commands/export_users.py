@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users.export import FORMATS, export_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every user with their profile and addresses as NDJSON or "
+        "CSV, optionally gzip-compressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--output",
+            help="File to write to, default stdout.",
+        )
+
+    def handle(self, *args, **options):
+        chunks = export_users(
+            options["format"],
+            gzip=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                self.write(chunks, output)
+        else:
+            self.write(chunks, sys.stdout.buffer)
+
+    def write(self, chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
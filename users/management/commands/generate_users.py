@@ -0,0 +1,106 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from users.synthetic import generate, load, load_range
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users with profiles and addresses for load and "
+        "scale testing. Output is deterministic for a given --seed, --start "
+        "and --batch-size, and every user has the password --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("users", type=int)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--start",
+            type=int,
+            default=0,
+            help="Number of the first user, to add to an earlier run.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--password", default="Synthetic-pass-42")
+        parser.add_argument(
+            "--method",
+            choices=("auto", "copy", "bulk"),
+            default="auto",
+            help="COPY (Postgres only) or bulk_create; auto picks COPY on "
+            "Postgres.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes loading separate ranges in parallel (Postgres "
+            "only). The data is the same for any number of workers.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        copy = {"auto": None, "copy": True, "bulk": False}[options["method"]]
+        postgres = connections[using].vendor == "postgresql"
+        if copy and not postgres:
+            raise CommandError("--method copy needs a Postgres database.")
+        if options["workers"] > 1 and not postgres:
+            raise CommandError("--workers needs a Postgres database.")
+
+        # One PBKDF2 hash for everyone instead of one per user.
+        password_hash = make_password(options["password"])
+        start = time.perf_counter()
+        if options["workers"] > 1:
+            written = self.load_parallel(password_hash, copy, options)
+        else:
+            written = 0
+            batches = generate(
+                options["users"],
+                password_hash,
+                seed=options["seed"],
+                start=options["start"],
+                batch_size=options["batch_size"],
+            )
+            for written in load(batches, using, copy=copy):
+                if options["verbosity"] > 1:
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{written} users ({written / elapsed:.0f} users/s)"
+                    )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Generated {written} user(s) in {elapsed:.1f}s")
+
+    def load_parallel(self, password_hash, copy, options):
+        # Split on batch boundaries so every batch keeps its own seed.
+        batch_size = options["batch_size"]
+        batches = -(-options["users"] // batch_size)
+        per_worker = -(-batches // options["workers"]) * batch_size
+        end = options["start"] + options["users"]
+        ranges = [
+            (first, min(per_worker, end - first))
+            for first in range(options["start"], end, per_worker)
+        ]
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=len(ranges),
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    load_range,
+                    count,
+                    password_hash,
+                    options["seed"],
+                    first,
+                    batch_size,
+                    options["database"],
+                    copy,
+                )
+                for first, count in ranges
+            ]
+            return sum(future.result() for future in futures)
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from users import sharding
+from users.authentication import token_cache
+from users.models import (
+    AuthToken,
+    Profile,
+    ResidentialAddress,
+    ShardDirectory,
+    User,
+)
+from users.payload_cache import payload_cache
+
+# Parents first when copying, children first when deleting.
+MODELS = (User, Profile, ResidentialAddress)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users, with their profiles and addresses, to the shard the "
+        "hash ring puts them on, e.g. after adding a shard to "
+        "DATABASE_SHARDS. Each batch is copied, switched over in the shard "
+        "directory and then deleted from its old shard. Writes a moving "
+        "user makes in between are lost, so run it at a quiet time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--source",
+            action="append",
+            default=[],
+            help="Also move users off this alias, e.g. default when "
+            "sharding an existing database. Can be repeated.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the users that would move.",
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError("DATABASE_SHARDS is empty.")
+        sources = list(
+            dict.fromkeys(settings.DATABASE_SHARDS + options["source"])
+        )
+        moved = 0
+        for source in sources:
+            for batch in self.batches(source, options["batch_size"]):
+                targets = {}
+                for user in batch:
+                    target = sharding.placement(user.pk)
+                    if target != source:
+                        targets.setdefault(target, []).append(user.pk)
+                if not options["dry_run"]:
+                    self.register(batch, source, targets)
+                    for target, ids in targets.items():
+                        self.move(ids, source, target)
+                moved += sum(len(ids) for ids in targets.values())
+        verb = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(f"{verb} {moved} user(s)")
+
+    def batches(self, using, batch_size):
+        # Keyset pagination, unaffected by the rows moved off behind it.
+        last = None
+        while True:
+            queryset = User.objects.using(using).order_by("pk")
+            if last is not None:
+                queryset = queryset.filter(pk__gt=last)
+            batch = list(queryset.only("pk", "email")[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1].pk
+
+    def register(self, batch, source, targets):
+        """Add directory entries missing for users staying on ``source``."""
+        moving = {pk for ids in targets.values() for pk in ids}
+        known = set(
+            ShardDirectory.objects.filter(
+                user_id__in=[user.pk for user in batch]
+            ).values_list("user_id", flat=True)
+        )
+        ShardDirectory.objects.bulk_create(
+            ShardDirectory(user_id=user.pk, email=user.email, shard=source)
+            for user in batch
+            if user.pk not in known and user.pk not in moving
+        )
+
+    def move(self, ids, source, target):
+        with transaction.atomic(using=target):
+            for model in MODELS:
+                rows = list(
+                    model.objects.using(source).filter(
+                        **{"pk__in" if model is User else "user_id__in": ids}
+                    )
+                )
+                model.objects.using(target).bulk_create(rows)
+                if model is User:
+                    users = rows
+        known = set(
+            ShardDirectory.objects.filter(user_id__in=ids).values_list(
+                "user_id", flat=True
+            )
+        )
+        ShardDirectory.objects.filter(user_id__in=known).update(shard=target)
+        ShardDirectory.objects.bulk_create(
+            ShardDirectory(user_id=user.pk, email=user.email, shard=target)
+            for user in users
+            if user.pk not in known
+        )
+        with transaction.atomic(using=source):
+            for model in reversed(MODELS):
+                self.delete_rows(model, source, ids)
+        # Cached users still point at the old shard.
+        keys = {}
+        tokens = AuthToken.objects.filter(user_id__in=ids)
+        for key, user_id in tokens.values_list("key", "user_id"):
+            keys.setdefault(user_id, []).append(key)
+        for user_id in ids:
+            token_cache.invalidate_user(user_id, keys.get(user_id, ()))
+            payload_cache.invalidate(user_id)
+
+    def delete_rows(self, model, using, user_ids):
+        # Raw, so no delete signals fire: the users aren't gone, and must
+        # not leave tombstones or lose their directory entries and tokens.
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        column = "id" if model is User else "user_id"
+        params = [
+            User._meta.pk.get_db_prep_value(user_id, connection)
+            for user_id in user_ids
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {qn(model._meta.db_table)} "
+                f"WHERE {qn(column)} IN ({', '.join(['%s'] * len(params))})",
+                params,
+            )
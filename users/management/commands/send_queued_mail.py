@@ -0,0 +1,128 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import EmailOutbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting once drained.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help="Seconds to sleep between polls when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        max_attempts = options["max_attempts"]
+        while True:
+            sent = self.drain(batch_size, max_attempts)
+            if sent:
+                self.stdout.write(f"Delivered {sent} email(s)")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def drain(self, batch_size, max_attempts):
+        delivered = 0
+        while True:
+            batch = self.claim_batch(batch_size)
+            if not batch:
+                return delivered
+            delivered += self.send_batch(batch, max_attempts)
+
+    def claim_batch(self, batch_size):
+        """
+        Lease due rows by pushing ``next_attempt_at`` forward so concurrent
+        workers skip them, without holding row locks while we talk to SMTP.
+        """
+        now = timezone.now()
+        lease = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        with transaction.atomic():
+            batch = list(
+                EmailOutbox.objects.select_for_update(skip_locked=True)
+                .filter(status=EmailOutbox.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            EmailOutbox.objects.filter(
+                id__in=[item.id for item in batch]
+            ).update(next_attempt_at=lease)
+        return batch
+
+    def send_batch(self, batch, max_attempts):
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            for item in batch:
+                self.mark_failed(item, e, max_attempts)
+            return 0
+        delivered = 0
+        try:
+            for item in batch:
+                message = EmailMessage(
+                    item.subject,
+                    item.body,
+                    item.sender,
+                    item.recipients,
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    self.mark_failed(item, e, max_attempts)
+                else:
+                    self.mark_sent(item)
+                    delivered += 1
+        finally:
+            connection.close()
+        return delivered
+
+    def mark_sent(self, item):
+        item.status = EmailOutbox.SENT
+        item.sent_at = timezone.now()
+        item.attempts += 1
+        EmailOutbox.objects.filter(id=item.id).update(
+            status=item.status, sent_at=item.sent_at, attempts=item.attempts
+        )
+
+    def mark_failed(self, item, error, max_attempts):
+        item.attempts += 1
+        backoff = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** (
+            item.attempts - 1
+        )
+        item.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+        if item.attempts >= max_attempts:
+            item.status = EmailOutbox.FAILED
+        item.last_error = str(error)
+        EmailOutbox.objects.filter(id=item.id).update(
+            status=item.status,
+            attempts=item.attempts,
+            next_attempt_at=item.next_attempt_at,
+            last_error=item.last_error,
+        )
+        self.stderr.write(f"Failed to send {item.id}: {error}")
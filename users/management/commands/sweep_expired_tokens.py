@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired API tokens in small batches, each in its own short "
+        "transaction, so the table is never locked for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.AUTH_TOKEN_SWEEP_BATCH_SIZE,
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches to spread the load.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Keys first, then a DELETE by primary key: each batch only
+            # touches batch-size rows found through the expires_at index.
+            keys = list(
+                AuthToken.objects.filter(expires_at__lte=now).values_list(
+                    "key", flat=True
+                )[: options["batch_size"]]
+            )
+            if not keys:
+                break
+            AuthToken.objects.filter(key__in=keys).delete()
+            deleted += len(keys)
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(f"Deleted {deleted} expired token(s)")
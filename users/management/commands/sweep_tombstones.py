@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change feed tombstones older than --days in small batches. "
+        "A consumer whose cursor is older than that has to resync in full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CHANGE_FEED["TOMBSTONE_DAYS"],
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches to spread the load.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted = 0
+        while True:
+            ids = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff).values_list(
+                    "id", flat=True
+                )[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            Tombstone.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(f"Deleted {deleted} tombstone(s)")
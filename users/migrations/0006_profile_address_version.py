@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_emailoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="residentialaddress",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
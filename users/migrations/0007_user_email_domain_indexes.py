@@ -0,0 +1,48 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:15
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Lower, StrIndex, Substr
+
+
+def populate_email_domain(apps, schema_editor):
+    # One set-based UPDATE of everything after the "@".
+    User = apps.get_model("users", "User")
+    User.objects.update(
+        email_domain=Lower(Substr("email", StrIndex("email", Value("@")) + 1))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_profile_address_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="email_domain",
+            field=models.CharField(default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_email_domain, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["email_domain", "id"], name="user_email_domain_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["is_active", "id"], name="user_active_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["is_admin", "id"], name="user_admin_idx"
+            ),
+        ),
+    ]
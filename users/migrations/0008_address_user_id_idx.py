@@ -0,0 +1,19 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_user_email_domain_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="residentialaddress",
+            index=models.Index(
+                fields=["user", "id"], name="address_user_id_idx"
+            ),
+        ),
+    ]
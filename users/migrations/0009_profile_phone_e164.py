@@ -0,0 +1,73 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:41
+
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+E164 = re.compile(r"^\+[1-9]\d{6,14}$")
+PHONE_PUNCTUATION = re.compile(r"[\s().\-/]")
+
+
+def normalize_phone(value, country_code):
+    # Frozen copy of users.utils.normalize_phone, so later changes to it
+    # don't change what this migration does.
+    number = PHONE_PUNCTUATION.sub("", value or "")
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    elif number.startswith("0"):
+        number = f"+{country_code}{number[1:]}"
+    elif not number.startswith("+"):
+        if not number.startswith(country_code):
+            return None
+        number = "+" + number
+    return number if E164.match(number) else None
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    Profile = apps.get_model("users", "Profile")
+    country_code = settings.PHONE_DEFAULT_COUNTRY_CODE
+    profiles = Profile.objects.only("id", "phone_number").iterator(
+        chunk_size=BATCH_SIZE
+    )
+    while True:
+        batch = list(islice(profiles, BATCH_SIZE))
+        if not batch:
+            break
+        changed = {}
+        for profile in batch:
+            phone_number = normalize_phone(profile.phone_number, country_code)
+            if phone_number not in (None, profile.phone_number):
+                changed.setdefault(phone_number, profile)
+        # Leave numbers that don't parse, or would collide, as they are.
+        taken = set(
+            Profile.objects.filter(phone_number__in=changed).values_list(
+                "phone_number", flat=True
+            )
+        )
+        updates = []
+        for phone_number, profile in changed.items():
+            if phone_number not in taken:
+                profile.phone_number = phone_number
+                updates.append(profile)
+        Profile.objects.bulk_update(updates, ["phone_number"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_address_user_id_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="phone_number",
+            field=models.CharField(max_length=16, unique=True),
+        ),
+        migrations.RunPython(
+            normalize_phone_numbers, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:43
+
+from django.db import migrations
+
+# Expressions match the SQL Django emits for ``icontains`` on Postgres,
+# ``UPPER("column"::text) LIKE UPPER('%q%')``.
+TRIGRAM_INDEXES = [
+    ("user_email_trgm_idx", "users_user", "email"),
+    ("user_first_name_trgm_idx", "users_user", "first_name"),
+    ("profile_last_name_trgm_idx", "users_profile", "last_name"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+            f"USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction, and keeps
+    # the tables writable while the indexes build.
+    atomic = False
+
+    dependencies = [
+        ("users", "0009_profile_phone_e164"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
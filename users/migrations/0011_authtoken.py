@@ -0,0 +1,76 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import users.models
+
+
+def copy_drf_tokens(apps, schema_editor):
+    # Keep existing clients logged in; their tokens now expire like new ones.
+    Token = apps.get_model("authtoken", "Token")
+    AuthToken = apps.get_model("users", "AuthToken")
+    tokens = Token.objects.values_list("key", "user_id")
+    batch = []
+    for key, user_id in tokens.iterator(chunk_size=2000):
+        batch.append(
+            AuthToken(
+                key=key,
+                user_id=user_id,
+                expires_at=users.models.default_token_expiry(),
+                last_used=None,
+            )
+        )
+        if len(batch) == 2000:
+            AuthToken.objects.bulk_create(batch)
+            batch = []
+    AuthToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_search_trigram_indexes"),
+        ("authtoken", "0003_tokenproxy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthToken",
+            fields=[
+                (
+                    "key",
+                    models.CharField(
+                        default=users.models.generate_token_key,
+                        max_length=40,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=users.models.default_token_expiry,
+                    ),
+                ),
+                (
+                    "last_used",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, null=True
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="auth_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_drf_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 4.0.5 on 2026-10-18 17:59
+
+import datetime
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Same columns as the model, but range-partitioned by month. Postgres needs
+# the partition key in the primary key.
+PARTITIONED_TABLE = """
+CREATE TABLE users_auditevent (
+    id bigserial NOT NULL,
+    created_at timestamp with time zone NOT NULL,
+    user_id uuid NOT NULL,
+    event varchar(32) NOT NULL,
+    ip inet NULL,
+    data jsonb NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+
+def next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def create_audit_table(apps, schema_editor):
+    AuditEvent = apps.get_model("users", "AuditEvent")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(AuditEvent)
+        return
+    schema_editor.execute(PARTITIONED_TABLE)
+    schema_editor.execute(
+        "CREATE TABLE users_auditevent_default "
+        "PARTITION OF users_auditevent DEFAULT"
+    )
+    # This month and the next two, `manage.py audit_partitions` keeps
+    # creating them ahead of time.
+    start = django.utils.timezone.now().date().replace(day=1)
+    for _ in range(3):
+        end = next_month(start)
+        schema_editor.execute(
+            f"CREATE TABLE users_auditevent_{start:y%Ym%m} "
+            "PARTITION OF users_auditevent "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        start = end
+    schema_editor.execute(
+        "CREATE INDEX audit_user_created_idx "
+        "ON users_auditevent (user_id, created_at)"
+    )
+
+
+def drop_audit_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model("users", "AuditEvent"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_authtoken"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="AuditEvent",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "created_at",
+                            models.DateTimeField(
+                                default=django.utils.timezone.now
+                            ),
+                        ),
+                        ("user_id", models.UUIDField()),
+                        (
+                            "event",
+                            models.CharField(
+                                choices=[
+                                    ("signup", "Signup"),
+                                    ("activate", "Activate"),
+                                    ("login", "Login"),
+                                    (
+                                        "password_reset_request",
+                                        "Password reset request",
+                                    ),
+                                    ("password_reset", "Password reset"),
+                                    ("password_change", "Password change"),
+                                    ("profile_create", "Profile create"),
+                                    ("profile_update", "Profile update"),
+                                    ("profile_delete", "Profile delete"),
+                                    ("address_create", "Address create"),
+                                    ("address_update", "Address update"),
+                                    ("address_delete", "Address delete"),
+                                    (
+                                        "address_book_replace",
+                                        "Address book replace",
+                                    ),
+                                ],
+                                max_length=32,
+                            ),
+                        ),
+                        (
+                            "ip",
+                            models.GenericIPAddressField(
+                                blank=True, null=True
+                            ),
+                        ),
+                        ("data", models.JSONField(blank=True, default=dict)),
+                    ],
+                ),
+                migrations.AddIndex(
+                    model_name="auditevent",
+                    index=models.Index(
+                        fields=["user_id", "created_at"],
+                        name="audit_user_created_idx",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_audit_table, drop_audit_table),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0013_change_feed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShardDirectory",
+            fields=[
+                (
+                    "user_id",
+                    models.UUIDField(primary_key=True, serialize=False),
+                ),
+                ("email", models.EmailField(max_length=255, unique=True)),
+                ("shard", models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="authtoken",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="auth_tokens",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
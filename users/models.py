@@ -1,8 +1,20 @@
-from django.db import models
+import binascii
+import os
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
 import uuid
 
 
+def get_email_domain(email):
+    return email.rpartition("@")[2].lower()
+
+
 class MyUserManager(BaseUserManager):
     def create_user(self, first_name, email, password):
         if not email:
@@ -32,14 +44,40 @@ class User(AbstractBaseUser):
         unique=True,
     )
     first_name = models.CharField(max_length=256)
+    email_domain = models.CharField(max_length=255, editable=False)
     is_active = models.BooleanField(default=False)
     is_admin = models.BooleanField(default=False)
+    # Change feed position, see ``users.changes``.
+    updated_at = models.DateTimeField(default=timezone.now)
     objects = MyUserManager()
     USERNAME_FIELD = "email"
+    # Saves of only these fields (password rehashes, session logins) aren't
+    # changes downstream consumers care about.
+    UNTRACKED_FIELDS = {"password", "last_login"}
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["email_domain", "id"], name="user_email_domain_idx"
+            ),
+            models.Index(fields=["is_active", "id"], name="user_active_idx"),
+            models.Index(fields=["is_admin", "id"], name="user_admin_idx"),
+            models.Index(fields=["updated_at", "id"], name="user_updated_idx"),
+        ]
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        self.email_domain = get_email_domain(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            self.updated_at = timezone.now()
+        elif not set(update_fields) <= self.UNTRACKED_FIELDS:
+            self.updated_at = timezone.now()
+            kwargs["update_fields"] = {*update_fields, "updated_at"}
+        super().save(*args, **kwargs)
+
     def has_perm(self, perm, obj=None):
         # Simplest possible answer: Yes, always
         return True
@@ -56,6 +94,233 @@ class User(AbstractBaseUser):
         return self.is_admin
 
 
+def generate_token_key():
+    return binascii.hexlify(os.urandom(20)).decode()
+
+
+def default_token_expiry():
+    return timezone.now() + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+class AuthToken(models.Model):
+    """
+    API token that expires ``AUTH_TOKEN_TTL`` seconds after it is issued.
+    ``last_used`` is only written once per
+    ``AUTH_TOKEN_LAST_USED_INTERVAL``, see ``CachedTokenAuthentication``.
+    """
+
+    key = models.CharField(
+        max_length=40, primary_key=True, default=generate_token_key
+    )
+    # No constraint: tokens stay on default while users may be on a shard,
+    # see ``users.sharding``.
+    user = models.ForeignKey(
+        User,
+        related_name="auth_tokens",
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(
+        default=default_token_expiry, db_index=True
+    )
+    # Issuing a token counts as using it, so a login followed straight away
+    # by requests doesn't write last_used again.
+    last_used = models.DateTimeField(default=timezone.now, null=True)
+
+    def __str__(self):
+        return self.key
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+class UserOwnedManager(models.Manager):
+    """
+    Single-statement writes for the per-user ``Profile`` and
+    ``ResidentialAddress`` rows. Each statement bumps ``version`` and
+    ``updated_at`` and returns the written row with ``RETURNING``, so no
+    SELECT is needed before or after it. They skip ``save()`` but still
+    send ``post_save`` for the written row.
+    """
+
+    def for_user(self, user_id):
+        """The user's row: the first by id when a user has several."""
+        queryset = self.filter(user_id=user_id).order_by("pk")
+        if self.model._meta.get_field("user").unique:
+            return queryset
+        return self.filter(pk__in=queryset.values("pk")[:1])
+
+    @property
+    def _write_db(self):
+        return router.db_for_write(self.model)
+
+    def _where_user(self, user_id):
+        """WHERE clause and params matching the row ``for_user`` returns."""
+        qn = connections[self._write_db].ops.quote_name
+        table = qn(self.model._meta.db_table)
+        [(_, user_param)] = self._prepare({"user_id": user_id})
+        if self.model._meta.get_field("user").unique:
+            return f"{qn('user_id')} = %s", [user_param]
+        where = (
+            f"{qn('id')} = (SELECT {qn('id')} FROM {table} "
+            f"WHERE {qn('user_id')} = %s ORDER BY {qn('id')} LIMIT 1)"
+        )
+        return where, [user_param]
+
+    def _prepare(self, values):
+        """Map field names to ``(quoted column, db value)`` pairs."""
+        connection = connections[self._write_db]
+        pairs = []
+        for name, value in values.items():
+            field = self.model._meta.get_field(name)
+            pairs.append(
+                (
+                    connection.ops.quote_name(field.column),
+                    field.get_db_prep_save(value, connection),
+                )
+            )
+        return pairs
+
+    def _execute(self, sql, params):
+        db = self._write_db
+        connection = connections[db]
+        qn = connection.ops.quote_name
+        table = self.model._meta.db_table
+        fields = self.model._meta.concrete_fields
+        sql += " RETURNING " + ", ".join(
+            f"{qn(table)}.{qn(field.column)}" for field in fields
+        )
+        # Inside a transaction, keep a constraint error from aborting it.
+        context = (
+            transaction.atomic(using=db)
+            if connection.in_atomic_block
+            else nullcontext()
+        )
+        with context, connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        values = []
+        for field, value in zip(fields, row):
+            col = field.get_col(table)
+            converters = connection.ops.get_db_converters(col)
+            converters += col.get_db_converters(connection)
+            for converter in converters:
+                value = converter(value, col, connection)
+            values.append(value)
+        return self.model.from_db(db, [f.attname for f in fields], values)
+
+    def _saved(self, instance, created, update_fields=None):
+        if instance is not None:
+            post_save.send(
+                sender=self.model,
+                instance=instance,
+                created=created,
+                update_fields=update_fields,
+                raw=False,
+                using=instance._state.db,
+            )
+        return instance
+
+    def insert_for_user(self, user_id, values):
+        """
+        INSERT a row for ``user_id``. When ``user`` is unique (``Profile``)
+        an existing row is replaced instead, through ``ON CONFLICT``.
+        """
+        values = dict(values, updated_at=timezone.now())
+        row = {
+            field.attname: field.get_default()
+            for field in self.model._meta.concrete_fields
+        }
+        row.update(values, user_id=user_id)
+        pairs = self._prepare(row)
+        qn = connections[self._write_db].ops.quote_name
+        table = qn(self.model._meta.db_table)
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            table,
+            ", ".join(column for column, _ in pairs),
+            ", ".join(["%s"] * len(pairs)),
+        )
+        if self.model._meta.get_field("user").unique:
+            replaced = [column for column, _ in self._prepare(values)]
+            sql += " ON CONFLICT ({}) DO UPDATE SET {}".format(
+                qn("user_id"),
+                ", ".join(
+                    [f"{column} = EXCLUDED.{column}" for column in replaced]
+                    + [f"{qn('version')} = {table}.{qn('version')} + 1"]
+                ),
+            )
+        instance = self._execute(sql, [value for _, value in pairs])
+        # A replaced profile comes back with its version bumped.
+        return self._saved(instance, created=instance.version == 1)
+
+    def update_for_user(self, user_id, values, expected=None):
+        """
+        UPDATE only the ``values`` columns of the user's row (the first by
+        id when a user has several). ``expected`` is an ``(id, version)``
+        pair the row must still have. Returns ``None`` when no row matched.
+        """
+        qn = connections[self._write_db].ops.quote_name
+        table = qn(self.model._meta.db_table)
+        pairs = self._prepare(dict(values, updated_at=timezone.now()))
+        assignments = [f"{column} = %s" for column, _ in pairs]
+        assignments.append(f"{qn('version')} = {qn('version')} + 1")
+        params = [value for _, value in pairs]
+
+        where, user_params = self._where_user(user_id)
+        params += user_params
+        if expected is not None:
+            where += f" AND {qn('id')} = %s AND {qn('version')} = %s"
+            params += [
+                value
+                for _, value in self._prepare(
+                    {"id": expected[0], "version": expected[1]}
+                )
+            ]
+        sql = "UPDATE {} SET {} WHERE {}".format(
+            table, ", ".join(assignments), where
+        )
+        return self._saved(
+            self._execute(sql, params),
+            created=False,
+            update_fields=frozenset(values),
+        )
+
+    def delete_for_user(self, user_id):
+        """
+        DELETE the user's row (the first by id when a user has several) and
+        leave a ``Tombstone`` for the change feed. Returns the deleted row,
+        or ``None`` when there was none.
+        """
+        table = connections[self._write_db].ops.quote_name(
+            self.model._meta.db_table
+        )
+        where, params = self._where_user(user_id)
+        with transaction.atomic(using=self._write_db):
+            instance = self._execute(
+                f"DELETE FROM {table} WHERE {where}", params
+            )
+            if instance is not None:
+                Tombstone.objects.record(self.model, user_id, [instance.pk])
+        return instance
+
+    def upsert_for_user(self, user_id, values):
+        """
+        Create or fully replace the user's row: one ``INSERT ... ON
+        CONFLICT`` for ``Profile``. Addresses have no unique key to
+        conflict on, so the user's first address is updated and a new one
+        inserted only when there is none.
+        """
+        if self.model._meta.get_field("user").unique:
+            return self.insert_for_user(user_id, values)
+        return self.update_for_user(user_id, values) or self.insert_for_user(
+            user_id, values
+        )
+
+
 class Profile(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -63,7 +328,25 @@ class Profile(models.Model):
     last_name = models.CharField(max_length=256)
     dob = models.DateField()
     nationality = models.CharField(max_length=256)
-    phone_number = models.CharField(max_length=13, unique=True)
+    # E.164, see ``users.utils.normalize_phone``.
+    phone_number = models.CharField(max_length=16, unique=True)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = UserOwnedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["updated_at", "id"], name="profile_updated_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            self.updated_at = timezone.now()
+        super().save(*args, **kwargs)
 
 
 class ResidentialAddress(models.Model):
@@ -73,3 +356,158 @@ class ResidentialAddress(models.Model):
     city = models.CharField(max_length=256)
     state = models.CharField(max_length=256)
     zip = models.CharField(max_length=5)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = UserOwnedManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's addresses.
+            models.Index(fields=["user", "id"], name="address_user_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="address_updated_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            self.updated_at = timezone.now()
+        super().save(*args, **kwargs)
+
+
+class EmailOutbox(models.Model):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    sender = models.CharField(max_length=256)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="outbox_status_next_idx",
+            ),
+        ]
+
+
+class AuditEvent(models.Model):
+    """
+    Account lifecycle event, written in batches by ``users.audit``.
+
+    ``user_id`` is a plain column rather than a foreign key so the trail
+    outlives the user. On Postgres the table is range-partitioned by month
+    on ``created_at`` (migration 0012, ``manage.py audit_partitions``), with
+    the primary key ``(id, created_at)``.
+    """
+
+    SIGNUP = "signup"
+    ACTIVATE = "activate"
+    LOGIN = "login"
+    PASSWORD_RESET_REQUEST = "password_reset_request"
+    PASSWORD_RESET = "password_reset"
+    PASSWORD_CHANGE = "password_change"
+    PROFILE_CREATE = "profile_create"
+    PROFILE_UPDATE = "profile_update"
+    PROFILE_DELETE = "profile_delete"
+    ADDRESS_CREATE = "address_create"
+    ADDRESS_UPDATE = "address_update"
+    ADDRESS_DELETE = "address_delete"
+    ADDRESS_BOOK_REPLACE = "address_book_replace"
+    EVENT_CHOICES = [
+        (event, event.replace("_", " ").capitalize())
+        for event in (
+            SIGNUP,
+            ACTIVATE,
+            LOGIN,
+            PASSWORD_RESET_REQUEST,
+            PASSWORD_RESET,
+            PASSWORD_CHANGE,
+            PROFILE_CREATE,
+            PROFILE_UPDATE,
+            PROFILE_DELETE,
+            ADDRESS_CREATE,
+            ADDRESS_UPDATE,
+            ADDRESS_DELETE,
+            ADDRESS_BOOK_REPLACE,
+        )
+    ]
+
+    created_at = models.DateTimeField(default=timezone.now)
+    user_id = models.UUIDField()
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user_id", "created_at"],
+                name="audit_user_created_idx",
+            ),
+        ]
+
+
+class TombstoneManager(models.Manager):
+    def record(self, model, user_id, ids):
+        return self.bulk_create(
+            self.model(
+                kind=model._meta.model_name, object_id=pk, user_id=user_id
+            )
+            for pk in ids
+        )
+
+
+class Tombstone(models.Model):
+    """
+    A deleted ``User``, ``Profile`` or ``ResidentialAddress``, kept for
+    the change feed (``users.changes``) until ``sweep_tombstones`` removes
+    it. ``kind`` is the model name and ``object_id`` the deleted row's id.
+    """
+
+    kind = models.CharField(max_length=32)
+    object_id = models.UUIDField()
+    user_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["kind", "deleted_at", "object_id"],
+                name="tombstone_feed_idx",
+            ),
+        ]
+
+
+class ShardDirectory(models.Model):
+    """
+    Which shard each user lives on when user data is sharded, see
+    ``users.sharding``. Kept on ``default``: login looks users up by email
+    and token authentication by id. Unique emails across shards rest on
+    this table.
+    """
+
+    user_id = models.UUIDField(primary_key=True)
+    email = models.EmailField(max_length=255, unique=True)
+    shard = models.CharField(max_length=64)
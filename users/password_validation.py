@@ -0,0 +1,89 @@
+import hashlib
+import mmap
+import os
+import threading
+
+from django.core.exceptions import ValidationError
+
+RECORD_SIZE = 8
+
+
+def password_record(password):
+    """The first 64 bits of the password's SHA-1, as stored in the index."""
+    return hashlib.sha1(password.encode("utf-8")).digest()[:RECORD_SIZE]
+
+
+class BreachedPasswordIndex:
+    """
+    Read-only view over a file of sorted, fixed-size SHA-1 prefixes built by
+    ``manage.py build_breached_password_index``.
+
+    The file is memory-mapped on first lookup and searched in place, so a
+    few hundred million entries cost no heap and a lookup is ~30 slice
+    comparisons.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Opened once; only the first lookups race for the lock.
+        data = self._mmap
+        if data is not None:
+            return data
+        with self._lock:
+            if self._mmap is None:
+                with open(self.path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size % RECORD_SIZE:
+                        raise ValueError(
+                            f"{self.path} is not a breached password index"
+                        )
+                    self._mmap = (
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        if size
+                        else b""
+                    )
+        return self._mmap
+
+    def __len__(self):
+        return len(self._open()) // RECORD_SIZE
+
+    def __contains__(self, record):
+        data = self._open()
+        low, high = 0, len(data) // RECORD_SIZE
+        while low < high:
+            mid = (low + high) // 2
+            offset = mid * RECORD_SIZE
+            current = data[offset : offset + RECORD_SIZE]
+            if current < record:
+                low = mid + 1
+            elif current > record:
+                high = mid
+            else:
+                return True
+        return False
+
+
+class BreachedPasswordValidator:
+    """
+    Validate that the password does not appear in the breached password
+    index at ``index_path``. Without an index the validator is a no-op.
+    """
+
+    def __init__(self, index_path=None):
+        self.index = BreachedPasswordIndex(index_path) if index_path else None
+
+    def validate(self, password, user=None):
+        if self.index is None:
+            return
+        if password_record(password) in self.index:
+            raise ValidationError(
+                "This password has appeared in a data breach.",
+                code="password_breached",
+            )
+
+    def get_help_text(self):
+        return "Your password can't be one that appeared in a data breach."
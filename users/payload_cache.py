@@ -0,0 +1,102 @@
+"""
+Read-through cache of the serialized ``user``, ``profile`` and ``address``
+payloads, which are read on every app session but rarely change.
+
+Entries live in the ``PAYLOAD_CACHE["ALIAS"]`` cache for ``TTL`` seconds
+and are dropped whenever the rows behind them change: by the views' write
+handlers and by the model receivers in ``users.signals``. Those only reach
+the cache of the worker that made the write, so the cache is off
+(``TTL = 0``) by default and must only be turned on with an alias that all
+workers share, not the per-process ``LocMemCache``. Misses are loaded from
+the primary, as a lagging replica could put the old row back. A miss first takes a lease with ``cache.add``, so
+concurrent misses for the same payload, in any worker, wait for that one
+load instead of all going to the database. Invalidation drops the lease
+too, and a loader only stores its result while it still holds the lease,
+so a load racing with a write can't put the old row back.
+
+Hits, misses (database loads) and coalesced waits are counted as
+``users_payload_cache_total`` in ``users.instrumentation.registry``.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from users.instrumentation import registry
+
+KINDS = ("user", "profile", "residentialaddress")
+
+
+class PayloadCache:
+    key_prefix = "payload:"
+    poll_interval = 0.01
+
+    @property
+    def config(self):
+        return settings.PAYLOAD_CACHE
+
+    @property
+    def enabled(self):
+        return self.config["TTL"] > 0
+
+    @property
+    def cache(self):
+        return caches[self.config["ALIAS"]]
+
+    def key(self, kind, user_id):
+        return f"{self.key_prefix}{kind}:{user_id}"
+
+    def get_or_load(self, kind, user_id, load):
+        """
+        The cached payload for ``kind`` of the user, or ``load()``'s result
+        (which must not be ``None``), cached on the way out.
+        """
+        if not self.enabled:
+            return load()
+        cache = self.cache
+        key = self.key(kind, user_id)
+        value = cache.get(key)
+        if value is not None:
+            registry.increment("payload_cache", kind=kind, result="hit")
+            return value
+
+        lease_key = key + ":lease"
+        lease = uuid.uuid4().hex
+        if not cache.add(lease_key, lease, self.config["LEASE_TTL"]):
+            value = self.wait(cache, key)
+            if value is not None:
+                registry.increment(
+                    "payload_cache", kind=kind, result="coalesced"
+                )
+                return value
+            # The loader is stuck or failed, load without caching.
+            lease = None
+        registry.increment("payload_cache", kind=kind, result="miss")
+        try:
+            value = load()
+            if lease is not None and cache.get(lease_key) == lease:
+                cache.set(key, value, self.config["TTL"])
+        finally:
+            if lease is not None:
+                cache.delete(lease_key)
+        return value
+
+    def wait(self, cache, key):
+        deadline = time.monotonic() + self.config["WAIT_TIMEOUT"]
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        return None
+
+    def invalidate(self, user_id, *kinds):
+        """Drop the user's payloads of ``kinds``, default all of them."""
+        if not self.enabled:
+            return
+        keys = [self.key(kind, user_id) for kind in kinds or KINDS]
+        self.cache.delete_many(keys + [key + ":lease" for key in keys])
+
+
+payload_cache = PayloadCache()
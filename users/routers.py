@@ -0,0 +1,133 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Writes always go to ``default``. Reads go to one of the
+``DATABASE_REPLICAS`` aliases unless the request has already written, is
+inside a transaction on the primary, or comes from a user who wrote
+within the last ``REPLICA_STICKY_SECONDS``. The authentication layer
+tells ``identify`` who the user is, so the pin follows the user across
+tokens and sessions, and ``ReplicaPinMiddleware`` remembers recent writers
+in the ``REPLICA_PIN_CACHE`` cache, which has to be shared between workers
+for the stickiness to hold across them.
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = ContextVar("replica_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.user_id = None
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def identify(user):
+    """
+    Record that this request is ``user``'s, pinning its reads to the
+    primary if they wrote within ``REPLICA_STICKY_SECONDS``.
+    """
+    state = _state.get()
+    if state is None or state.user_id == user.pk:
+        return
+    state.user_id = user.pk
+    if caches[settings.REPLICA_PIN_CACHE].get(pin_key(user.pk)):
+        state.pinned = True
+
+
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # See ``MiddlewareMixin._async_check``.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and state.user_id is not None:
+            caches[settings.REPLICA_PIN_CACHE].set(
+                pin_key(state.user_id), True, settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and state.user_id is not None:
+            await caches[settings.REPLICA_PIN_CACHE].aset(
+                pin_key(state.user_id), True, settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+
+class PrimaryReplicaRouter:
+    # A token is used straight after login creates it, and token lookups are
+    # cached by CachedTokenAuthentication, so they always use the primary.
+    # So is a new user's shard directory entry.
+    primary_models = {"users.authtoken", "users.sharddirectory"}
+    # Audit events are flushed in batches by whichever request comes next,
+    # and authenticating a GET updates its token's ``last_used``, so
+    # neither write says anything about that client's reads.
+    unpinned_models = {"users.auditevent", "users.authtoken"}
+
+    def choose_replica(self, replicas):
+        return random.choice(replicas)
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or model._meta.label_lower in self.primary_models
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        return self.choose_replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None
+            and model._meta.label_lower not in self.unpinned_models
+        ):
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
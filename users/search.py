@@ -0,0 +1,138 @@
+"""
+User search for support tooling: partial email, first/last name, or a phone
+number.
+
+Phone numbers are normalized to E.164 and looked up through the unique
+index on ``Profile.phone_number``. Text searches need three characters and
+on Postgres run one ``icontains`` query per column, UNIONed, so each uses
+its own trigram GIN index (migration 0010). Other backends, i.e. SQLite
+test and dev runs, use ``TrigramIndex``, an in-process equivalent rebuilt
+after any user or profile write. With sharding, every shard is searched
+and the matches merged by id.
+"""
+import heapq
+import threading
+from collections import defaultdict
+
+from django.db import connection
+
+from users import sharding
+from users.models import User
+from users.utils import normalize_phone
+
+MIN_QUERY_LENGTH = 3
+PHONE_CHARACTERS = set("+0123456789 ()-./")
+
+
+def trigrams(text):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Maps every trigram of a user's email, first name and last name to the
+    users containing it. Users are numbered in id order, so a query
+    intersects the integer sets of its trigrams, then walks the candidates
+    in order and checks them for the full substring until it has enough.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stale = True
+        self.ids = []
+        self.texts = []
+        self.postings = defaultdict(set)
+
+    def invalidate(self):
+        self.stale = True
+
+    def build(self):
+        ids, texts = [], []
+        postings = defaultdict(set)
+        rows = User.objects.order_by("id").values_list(
+            "id", "email", "first_name", "profile__last_name"
+        )
+        rows = heapq.merge(
+            *(
+                rows.using(using).iterator(chunk_size=5000)
+                for using in sharding.aliases()
+            ),
+            key=lambda row: row[0],
+        )
+        for position, (user_id, *values) in enumerate(rows):
+            values = tuple(v.lower() for v in values if v)
+            ids.append(user_id)
+            texts.append(values)
+            for value in values:
+                for gram in trigrams(value):
+                    postings[gram].add(position)
+        self.ids, self.texts, self.postings = ids, texts, postings
+
+    def search(self, query, limit):
+        query = query.lower()
+        with self.lock:
+            if self.stale:
+                self.stale = False
+                self.build()
+            ids, texts, postings = self.ids, self.texts, self.postings
+        sets = sorted(
+            (postings.get(gram, set()) for gram in trigrams(query)), key=len
+        )
+        candidates = set.intersection(*sets) if sets else set()
+        matches = []
+        for position in sorted(candidates):
+            if any(query in value for value in texts[position]):
+                matches.append(ids[position])
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+trigram_index = TrigramIndex()
+
+
+def looks_like_phone(query):
+    return any(c.isdigit() for c in query) and set(query) <= PHONE_CHARACTERS
+
+
+def search_users(query, limit):
+    """
+    Return up to ``limit`` matching users, profiles joined, ordered by id.
+    Raises ``ValueError`` for a text query that is too short.
+    """
+    query = query.strip()
+    users = User.objects.select_related("profile").order_by("id")
+    if looks_like_phone(query):
+        phone_number = normalize_phone(query)
+        if phone_number is not None:
+            return list(
+                sharding.fan_out(
+                    users.filter(profile__phone_number=phone_number)
+                )
+            )
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValueError(
+            f"Search needs at least {MIN_QUERY_LENGTH} characters."
+        )
+
+    if connection.vendor == "postgresql":
+        ids = []
+        for using in sharding.aliases():
+            # No ORDER BY inside the parts: any ``limit`` matches will do,
+            # and sorting every match of a common trigram would defeat the
+            # index.
+            email, first_name, last_name = (
+                User.objects.using(using)
+                .filter(**{lookup: query})
+                .order_by()
+                .values_list("id", flat=True)[:limit]
+                for lookup in (
+                    "email__icontains",
+                    "first_name__icontains",
+                    "profile__last_name__icontains",
+                )
+            )
+            ids += email.union(first_name, last_name)
+    else:
+        ids = trigram_index.search(query, limit)
+    return list(sharding.fan_out(users.filter(id__in=ids))[:limit])
@@ -1,20 +1,76 @@
-from users.models import User, Profile, ResidentialAddress
+from users.models import User, Profile, ResidentialAddress, ShardDirectory
 from rest_framework import serializers
 import django.contrib.auth.password_validation as validators
 from django.core.exceptions import ValidationError
 
+from users import hashing, sharding
+from users.instrumentation import timed
+from users.utils import normalize_phone
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+
+class TimedMixin:
+    """
+    Reports validation and representation time to the ``serialize`` phase
+    of ``users.instrumentation``.
+    """
+
+    def run_validation(self, *args, **kwargs):
+        with timed("serialize"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        with timed("serialize"):
+            return super().to_representation(*args, **kwargs)
+
+
+class DynamicFieldsMixin(TimedMixin):
+    """
+    Takes an optional ``fields`` argument that trims the output to the
+    given subset of the declared fields.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def required_fields(serializer):
+    return {
+        name
+        for name, field in serializer.fields.items()
+        if field.required and not field.read_only
+    }
+
+
+class UserSerializer(
+    DynamicFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     class Meta:
         model = User
         fields = ("id", "first_name", "email")
 
 
-class SignUpSerializer(serializers.HyperlinkedModelSerializer):
+class SignUpSerializer(TimedMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = User
         fields = ("first_name", "email", "password")
 
+    conflict_errors = {
+        "email": ["user with this email address already exists."]
+    }
+
+    def validate_email(self, value):
+        # The model's unique check only sees one shard.
+        if sharding.enabled():
+            if ShardDirectory.objects.filter(email=value).exists():
+                raise serializers.ValidationError(
+                    self.conflict_errors["email"]
+                )
+        return value
+
     def validate(self, data):
         user = User(**data)
         password = data.get("password")
@@ -30,12 +86,14 @@ class SignUpSerializer(serializers.HyperlinkedModelSerializer):
     def create(self, validated_data):
         password = validated_data["password"]
         instance = self.Meta.model(**validated_data)
-        instance.set_password(password)
+        hashing.set_password(instance, password)
         instance.save()
         return instance
 
 
-class ProfileSerializer(serializers.HyperlinkedModelSerializer):
+class ProfileSerializer(
+    DynamicFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     class Meta:
         model = Profile
         fields = (
@@ -46,13 +104,54 @@ class ProfileSerializer(serializers.HyperlinkedModelSerializer):
             "nationality",
             "phone_number",
         )
+        # Enforced by the unique index at write time instead of a SELECT.
+        extra_kwargs = {"phone_number": {"validators": []}}
 
-    user_id = serializers.UUIDField()
+    user_id = serializers.UUIDField(read_only=True)
 
+    def validate_phone_number(self, value):
+        phone_number = normalize_phone(value)
+        if phone_number is None:
+            raise serializers.ValidationError("Enter a valid phone number.")
+        return phone_number
 
-class ResidentialAddressSerializer(serializers.HyperlinkedModelSerializer):
+    # Returned when a write trips the phone_number unique index.
+    conflict_errors = {
+        "phone_number": ["profile with this phone number already exists."]
+    }
+
+
+class ResidentialAddressSerializer(
+    DynamicFieldsMixin, serializers.HyperlinkedModelSerializer
+):
     class Meta:
         model = ResidentialAddress
         fields = ("user_id", "country", "city", "state", "zip")
 
-    user_id = serializers.UUIDField()
+    user_id = serializers.UUIDField(read_only=True)
+
+    conflict_errors = {"error": "Conflicts with an existing record"}
+
+
+class ResidentialAddressItemSerializer(ResidentialAddressSerializer):
+    """
+    An entry of the user's address book. ``id`` is optional on input: in
+    a bulk replace, entries with an id update that address and entries
+    without one are created.
+    """
+
+    class Meta(ResidentialAddressSerializer.Meta):
+        fields = ("id",) + ResidentialAddressSerializer.Meta.fields
+
+    id = serializers.UUIDField(required=False)
+
+
+class AdminUserSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + (
+            "is_active",
+            "is_admin",
+            "profile",
+        )
+
+    profile = ProfileSerializer(read_only=True)
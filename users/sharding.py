@@ -0,0 +1,303 @@
+"""
+Sharding of user data over the ``DATABASE_SHARDS`` aliases.
+
+A user, their profile and their addresses live together on one shard.
+New users are placed by a consistent-hash ring over the shard aliases, so
+adding a shard only takes over the users whose ring positions now fall to
+it (about 1/N of them), see ``manage.py rebalance_shards``. Where each
+user actually is gets recorded in ``ShardDirectory`` on ``default``,
+which login reads by email and token authentication by user id; tokens,
+the outbox, the audit log and the directory itself stay on ``default``.
+
+``ShardRouter`` sends queries about a loaded user's rows to the shard they
+came from. Queries without such a hint (``Profile.objects.for_user(...)``)
+go to the shard bound for the current request: ``ShardMiddleware`` starts
+each request unbound and ``CachedTokenAuthentication`` binds the
+authenticated user's shard, the same way ``users.routers`` pins reads.
+Unbound queries of the sharded models fall through to ``default``; the
+admin listing, search, export and change feed read every shard through
+``fan_out``.
+
+With ``DATABASE_SHARDS`` empty everything stays on ``default``.
+"""
+import asyncio
+import bisect
+import hashlib
+import heapq
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import ShardDirectory, User
+
+_state = ContextVar("user_shard", default=None)
+
+SHARDED_MODELS = {"users.user", "users.profile", "users.residentialaddress"}
+
+
+def ring_hash(value):
+    return int.from_bytes(hashlib.md5(value).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with ``vnodes`` points per shard, which evens out
+    how many users each shard gets.
+    """
+
+    def __init__(self, shards, vnodes):
+        points = sorted(
+            (ring_hash(f"{shard}:{i}".encode()), shard)
+            for shard in shards
+            for i in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard_for(self, user_id):
+        key = ring_hash(uuid.UUID(str(user_id)).bytes)
+        index = bisect.bisect(self.hashes, key)
+        return self.shards[index % len(self.shards)]
+
+
+@lru_cache(maxsize=4)
+def get_ring(shards, vnodes):
+    return HashRing(shards, vnodes)
+
+
+def enabled():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def aliases():
+    """
+    The databases holding user data: every shard, or just ``None`` (the
+    routers' choice) when unsharded.
+    """
+    return list(settings.DATABASE_SHARDS) or [None]
+
+
+def placement(user_id):
+    """The shard ``user_id`` belongs on according to the ring."""
+    ring = get_ring(
+        tuple(settings.DATABASE_SHARDS), settings.SHARD_RING_VNODES
+    )
+    return ring.shard_for(user_id)
+
+
+def get_user(user_id):
+    """The user with ``user_id`` from their shard, found in the directory."""
+    if not enabled():
+        return User.objects.get(pk=user_id)
+    entry = ShardDirectory.objects.filter(user_id=user_id).first()
+    if entry is None:
+        raise User.DoesNotExist
+    return User.objects.using(entry.shard).get(pk=user_id)
+
+
+def get_user_by_email(email):
+    if not enabled():
+        return User.objects.get_by_natural_key(email)
+    entry = ShardDirectory.objects.filter(email=email).first()
+    if entry is None:
+        raise User.DoesNotExist
+    return User.objects.using(entry.shard).get(pk=entry.user_id)
+
+
+@contextmanager
+def atomic(user_id):
+    """
+    A transaction on ``default`` and on the shard of the new user
+    ``user_id``, for creating them together with rows on ``default``. The
+    directory entry is claimed before the user's row is inserted (see
+    ``users.signals``), so a lost race for the email fails before anything
+    reaches the shard and a later failure rolls back both.
+    """
+    with transaction.atomic():
+        if not enabled():
+            yield
+            return
+        with transaction.atomic(using=placement(user_id)):
+            yield
+
+
+def by_shard(user_ids):
+    """
+    Group ``user_ids`` by the alias their users are on, with one directory
+    query. Unsharded, they are all under ``None`` (the router's choice).
+    """
+    if not enabled():
+        return {None: list(user_ids)}
+    groups = {}
+    entries = ShardDirectory.objects.filter(user_id__in=user_ids)
+    for user_id, shard in entries.values_list("user_id", "shard"):
+        groups.setdefault(shard, []).append(user_id)
+    return groups
+
+
+def current():
+    """The shard bound for the current request, if any."""
+    state = _state.get()
+    return state.shard if state is not None else None
+
+
+class ShardedQuerySet:
+    """
+    One queryset per shard behind the part of the ``QuerySet`` API that
+    keyset pagination needs: ``filter``, ``order_by``, slicing and
+    iteration. Rows of the shards are merged by the ordering, which has to
+    be on plain fields in one direction, and a slice reads up to its end
+    from every shard.
+    """
+
+    def __init__(self, querysets, ordering):
+        self.querysets = querysets
+        self.ordering = tuple(ordering)
+
+    def filter(self, *args, **kwargs):
+        return ShardedQuerySet(
+            [qs.filter(*args, **kwargs) for qs in self.querysets],
+            self.ordering,
+        )
+
+    def order_by(self, *fields):
+        return ShardedQuerySet(
+            [qs.order_by(*fields) for qs in self.querysets], fields
+        )
+
+    def merge(self, querysets):
+        names = [field.lstrip("-") for field in self.ordering]
+        descending = {field.startswith("-") for field in self.ordering}
+        if len(descending) > 1:
+            raise ValueError("Can't merge shards in a mixed ordering.")
+        return heapq.merge(
+            *querysets,
+            key=lambda row: tuple(getattr(row, name) for name in names),
+            reverse=descending == {True},
+        )
+
+    def __iter__(self):
+        return self.merge(self.querysets)
+
+    def __getitem__(self, k):
+        if not isinstance(k, slice) or k.stop is None or k.step:
+            raise TypeError("Only slices with an end are supported.")
+        querysets = [qs[: k.stop] for qs in self.querysets]
+        return list(islice(self.merge(querysets), k.start, k.stop))
+
+
+def fan_out(queryset):
+    """
+    ``queryset`` over every shard, merged in its ``order_by`` order; the
+    queryset itself when unsharded.
+    """
+    if not enabled():
+        return queryset
+    return ShardedQuerySet(
+        [queryset.using(alias) for alias in aliases()],
+        queryset.query.order_by,
+    )
+
+
+class ShardState:
+    def __init__(self, shard=None):
+        self.shard = shard
+
+
+def bind(user):
+    """Send unhinted queries of this request to ``user``'s shard."""
+    state = _state.get()
+    if state is not None and enabled():
+        state.shard = user._state.db
+
+
+@contextmanager
+def using_shard(shard):
+    """Bind ``shard`` outside a request, e.g. in a management command."""
+    token = _state.set(ShardState(shard))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ShardMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # See ``MiddlewareMixin._async_check``.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        token = _state.set(ShardState())
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        token = _state.set(ShardState())
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+
+class ShardRouter:
+    """
+    Routes ``User``, ``Profile`` and ``ResidentialAddress`` to shards and
+    leaves everything else to the next router.
+    """
+
+    def shard(self, model, instance=None):
+        if not enabled() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        if instance is not None:
+            if instance._state.db:
+                return instance._state.db
+            # A new user goes where the ring puts it; a new profile or
+            # address next to its user.
+            if isinstance(instance, User):
+                return placement(instance.pk)
+            field = model._meta.get_field("user")
+            if field.is_cached(instance):
+                user = field.get_cached_value(instance)
+                if user._state.db:
+                    return user._state.db
+        return current()
+
+    def db_for_read(self, model, **hints):
+        return self.shard(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self.shard(model, hints.get("instance"))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if not enabled() or not sharded <= SHARDED_MODELS:
+            # Rows on default may point at users on any shard.
+            return None
+        if obj1._state.db and obj2._state.db:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards get the whole schema. Only the sharded tables hold rows,
+        # but deletes cascade through the others (tokens, admin log).
+        if db in settings.DATABASE_SHARDS:
+            return True
+        return None
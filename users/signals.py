@@ -0,0 +1,104 @@
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from users import sharding
+from users.authentication import token_cache
+from users.models import (
+    AuthToken,
+    Profile,
+    ResidentialAddress,
+    ShardDirectory,
+    Tombstone,
+    User,
+)
+from users.payload_cache import payload_cache
+from users.search import trigram_index
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # Cached entries hold a copy of the user row, so any change (including
+    # deactivation) must evict them.
+    keys = ()
+    if token_cache.shared is not None:
+        keys = AuthToken.objects.filter(user_id=instance.pk).values_list(
+            "key", flat=True
+        )
+    token_cache.invalidate_user(instance.pk, keys)
+
+
+# No post_delete on Profile: a receiver would turn its single-statement
+# DELETE into SELECT + DELETE. A deleted profile's last name can match until
+# the next write; search results are still read from the database.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+def invalidate_trigram_index(sender, **kwargs):
+    trigram_index.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_payloads(sender, instance, **kwargs):
+    payload_cache.invalidate(instance.pk)
+
+
+# Deletes of profiles and addresses, which send no signal for the reason
+# above, are invalidated by the views that make them.
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=ResidentialAddress)
+def invalidate_owned_payload(sender, instance, **kwargs):
+    payload_cache.invalidate(instance.user_id, sender._meta.model_name)
+
+
+# Profiles and addresses are deleted along with the user without signals,
+# so collect their ids while they still exist.
+@receiver(pre_delete, sender=User)
+def record_user_tombstones(sender, instance, **kwargs):
+    Tombstone.objects.record(User, instance.pk, [instance.pk])
+    for model in (Profile, ResidentialAddress):
+        ids = (
+            model.objects.using(instance._state.db)
+            .filter(user_id=instance.pk)
+            .values_list("pk", flat=True)
+        )
+        Tombstone.objects.record(model, instance.pk, ids)
+
+
+# A new user's directory entry is written before their row on the shard,
+# so the unique email there is claimed first and a duplicate signup fails
+# without leaving a user behind on the shard.
+@receiver(pre_save, sender=User)
+def claim_user_shard(sender, instance, raw, using, **kwargs):
+    if sharding.enabled() and instance._state.adding:
+        ShardDirectory.objects.create(
+            user_id=instance.pk, email=instance.email, shard=using
+        )
+
+
+@receiver(post_save, sender=User)
+def record_user_email(sender, instance, created, update_fields, **kwargs):
+    if not sharding.enabled() or created:
+        return
+    if update_fields is None or "email" in update_fields:
+        ShardDirectory.objects.filter(user_id=instance.pk).update(
+            email=instance.email
+        )
+
+
+# A user on a shard takes the (empty) token table there with it, the real
+# tokens are on default.
+@receiver(post_delete, sender=User)
+def forget_sharded_user(sender, instance, **kwargs):
+    if sharding.enabled():
+        ShardDirectory.objects.filter(user_id=instance.pk).delete()
+        AuthToken.objects.filter(user_id=instance.pk).delete()
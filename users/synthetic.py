@@ -0,0 +1,219 @@
+"""
+Deterministic synthetic users, profiles and addresses for loading
+production-sized datasets, see ``manage.py generate_users``.
+
+Rows are built as plain dicts from a ``random.Random`` seeded per batch,
+so a given ``seed``, ``start`` and ``batch_size`` always give the same
+ids, names and numbers however the batches are spread over worker
+processes. Every user shares one precomputed password hash. Batches are
+written with ``COPY ... FROM STDIN`` on Postgres and ``bulk_create``
+elsewhere, one transaction per batch.
+"""
+import csv
+import io
+import random
+import uuid
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.db import connections, transaction
+
+from users.models import Profile, ResidentialAddress, User
+
+FIRST_NAMES = (
+    "Achieng",
+    "Amani",
+    "Baraka",
+    "Chebet",
+    "Daniel",
+    "Esther",
+    "Faith",
+    "Grace",
+    "Hassan",
+    "Imani",
+    "James",
+    "Kamau",
+    "Mary",
+    "Njeri",
+    "Otieno",
+    "Wanjiru",
+)
+LAST_NAMES = (
+    "Akinyi",
+    "Kakai",
+    "Kiprono",
+    "Mutua",
+    "Mwangi",
+    "Njoroge",
+    "Nyambura",
+    "Ochieng",
+    "Omondi",
+    "Onyango",
+    "Wambui",
+    "Wekesa",
+)
+# (domain, weight)
+DOMAINS = (
+    ("gmail.com", 60),
+    ("yahoo.com", 15),
+    ("outlook.com", 10),
+    ("corp.co.ke", 10),
+    ("uonbi.ac.ke", 5),
+)
+NATIONALITIES = (("kenya", 80), ("uganda", 8), ("tanzania", 8), ("rwanda", 4))
+# (country, city, state)
+CITIES = (
+    ("kenya", "nairobi", "nairobi"),
+    ("kenya", "mombasa", "mombasa"),
+    ("kenya", "kisumu", "kisumu"),
+    ("kenya", "nakuru", "nakuru"),
+    ("kenya", "thika", "kiambu"),
+    ("kenya", "eldoret", "uasin gishu"),
+    ("uganda", "kampala", "central"),
+    ("tanzania", "arusha", "arusha"),
+)
+# addresses per user, and how common each count is
+ADDRESS_COUNTS = (0, 1, 2, 3)
+ADDRESS_WEIGHTS = (15, 60, 20, 5)
+PROFILE_RATE = 0.9
+ACTIVE_RATE = 0.9
+OLDEST_DOB = date(1950, 1, 1)
+DOB_RANGE_DAYS = 55 * 365
+
+
+def make_uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def cumulative(weights):
+    return list(accumulate(weights))
+
+
+def generate(count, password_hash, seed=0, start=0, batch_size=10000):
+    """
+    Yield ``(users, profiles, addresses)`` lists of row dicts, keyed by
+    attname, for users ``start`` to ``start + count``. The user number
+    makes emails and phone numbers unique, so separate runs don't collide
+    as long as their ranges don't overlap.
+    """
+    domains, domain_weights = zip(*DOMAINS)
+    domain_weights = cumulative(domain_weights)
+    nationalities, nationality_weights = zip(*NATIONALITIES)
+    nationality_weights = cumulative(nationality_weights)
+    address_weights = cumulative(ADDRESS_WEIGHTS)
+    end = start + count
+    for batch_start in range(start, end, batch_size):
+        rng = random.Random(f"{seed}:{batch_start}")
+        users, profiles, addresses = [], [], []
+        for i in range(batch_start, min(end, batch_start + batch_size)):
+            user_id = make_uuid(rng)
+            first_name = rng.choice(FIRST_NAMES)
+            last_name = rng.choice(LAST_NAMES)
+            domain = rng.choices(domains, cum_weights=domain_weights)[0]
+            users.append(
+                {
+                    "id": user_id,
+                    "password": password_hash,
+                    "last_login": None,
+                    "email": f"{first_name}.{last_name}{i}@{domain}".lower(),
+                    "first_name": first_name,
+                    "email_domain": domain,
+                    "is_active": rng.random() < ACTIVE_RATE,
+                    "is_admin": False,
+                }
+            )
+            if rng.random() < PROFILE_RATE:
+                profiles.append(
+                    {
+                        "id": make_uuid(rng),
+                        "user_id": user_id,
+                        "middle_name": rng.choice(FIRST_NAMES),
+                        "last_name": last_name,
+                        "dob": OLDEST_DOB
+                        + timedelta(days=rng.randrange(DOB_RANGE_DAYS)),
+                        "nationality": rng.choices(
+                            nationalities, cum_weights=nationality_weights
+                        )[0],
+                        "phone_number": f"+2547{i:08d}",
+                        "version": 1,
+                    }
+                )
+            for _ in range(
+                rng.choices(ADDRESS_COUNTS, cum_weights=address_weights)[0]
+            ):
+                country, city, state = rng.choice(CITIES)
+                addresses.append(
+                    {
+                        "id": make_uuid(rng),
+                        "user_id": user_id,
+                        "country": country,
+                        "city": city,
+                        "state": state,
+                        "zip": f"{rng.randrange(100000):05d}",
+                        "version": 1,
+                    }
+                )
+        yield users, profiles, addresses
+
+
+def copy_rows(model, rows, using):
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # Columns added since the generator was written get their default.
+        writer.writerow(
+            [
+                row[field.attname]
+                if field.attname in row
+                else field.get_default()
+                for field in fields
+            ]
+        )
+    buffer.seek(0)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {qn(model._meta.db_table)} ({columns}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def bulk_create_rows(model, rows, using):
+    model.objects.using(using).bulk_create(
+        [model(**row) for row in rows], batch_size=1000
+    )
+
+
+def load(batches, using, copy=None):
+    """
+    Write each batch from ``generate`` in its own transaction, yielding
+    the number of users written so far. ``copy`` defaults to whether the
+    database is Postgres.
+    """
+    if copy is None:
+        copy = connections[using].vendor == "postgresql"
+    write = copy_rows if copy else bulk_create_rows
+    written = 0
+    for users, profiles, addresses in batches:
+        with transaction.atomic(using=using):
+            write(User, users, using)
+            write(Profile, profiles, using)
+            write(ResidentialAddress, addresses, using)
+        written += len(users)
+        yield written
+
+
+def load_range(count, password_hash, seed, start, batch_size, using, copy):
+    """Generate and load one range of users, for a worker process."""
+    # Connections inherited over fork must not be shared with the parent.
+    connections.close_all()
+    written = 0
+    batches = generate(count, password_hash, seed, start, batch_size)
+    for written in load(batches, using, copy=copy):
+        pass
+    connections.close_all()
+    return written
@@ -1,23 +1,92 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
+
+from asgiref.sync import async_to_sync, sync_to_async
+from benchmarks.scenarios import (
+    QUERY_BUDGETS,
+    SCENARIOS,
+    Context,
+    build,
+    count_queries,
+    send,
+)
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.password_validation import (
+    get_default_password_validators,
+)
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 # Create your tests here.
 
-from django.urls import reverse
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.urls import clear_url_caches, get_resolver, reverse
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
-from users.models import User
+from rest_framework.test import APITestCase, APITransactionTestCase
+from users import hashing, sharding, synthetic
+from users.audit import audit_log
+from users.authentication import TokenCache, token_cache
+from users.export import CSV_HEADER
+from users.instrumentation import ServerTimingMiddleware, registry
+from users.payload_cache import payload_cache
+from users.routers import (
+    PrimaryReplicaRouter,
+    ReplicaPinMiddleware,
+    RoutingState,
+    _state,
+    identify,
+    pin_key,
+)
+from users.utils import normalize_phone
+from users.throttling import LocalCounters, local_counters
+from users.password_validation import (
+    BreachedPasswordIndex,
+    password_record,
+)
+from users.models import (
+    AuditEvent,
+    AuthToken,
+    EmailOutbox,
+    Profile,
+    ResidentialAddress,
+    ShardDirectory,
+    Tombstone,
+    User,
+)
+from users.serializers import SignUpSerializer
+from users.views import UserExportView, UserLookupView
+from users.warmup import STEPS, warm_up
+from user_management import settings_api
 
 
-def create_user():
+def create_user(email="dann@gail.com"):
     user = User.objects.create_user(
-        email="dann@gail.com",
+        email=email,
         first_name="dann",
         password="rtsgbdkue",
     )
     user.is_active = True
     user.save()
-    token, _ = Token.objects.get_or_create(user=user)
+    token, _ = AuthToken.objects.get_or_create(user=user)
     return user, token
 
 
@@ -70,3 +139,1847 @@ class UserTests(APITestCase):
         response = self.client.put(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertNotEqual(response.data.get("country"), None)
+
+
+class EmailOutboxTests(APITestCase):
+    def test_signup_queues_mail_instead_of_sending(self):
+        url = reverse("signup")
+        data = {
+            "email": "dan2@gmail.com",
+            "first_name": "dan2",
+            "password": "mylenana",
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailOutbox.objects.get()
+        self.assertEqual(queued.recipients, ["dan2@gmail.com"])
+        self.assertEqual(queued.status, EmailOutbox.PENDING)
+
+    def test_worker_drains_outbox(self):
+        create_user()
+        self.client.post(
+            reverse("forgot-password"), {"email": "dann@gail.com"}
+        )
+        call_command("send_queued_mail", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["dann@gail.com"])
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.SENT)
+
+
+class PasswordResetTests(APITestCase):
+    def setUp(self):
+        self.user, self.token = create_user()
+        self.password_hash = self.user.password
+
+    def request_reset(self):
+        with mock.patch("users.hashing.set_password") as set_password:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    reverse("forgot-password"), {"email": "dann@gail.com"}
+                )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(set_password.called)
+        self.assertEqual(
+            count_queries(queries), QUERY_BUDGETS["forgot-password"]
+        )
+        body = EmailOutbox.objects.latest("id").body
+        return "/" + body.split("/", 3)[3]
+
+    def test_request_only_queues_a_signed_link(self):
+        path = self.request_reset()
+        self.assertTrue(path.startswith("/reset-password/"))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, self.password_hash)
+
+    def test_link_sets_password_once_and_revokes_tokens(self):
+        path = self.request_reset()
+        data = {"password1": "Vk3-new-pass", "password2": "Vk3-new-pass"}
+        response = self.client.post(path, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("Vk3-new-pass"))
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+
+        response = self.client.post(path, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forged_link_is_rejected(self):
+        path = self.request_reset()[:-2] + "xx"
+        data = {"password1": "Vk3-new-pass", "password2": "Vk3-new-pass"}
+        response = self.client.post(path, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, self.password_hash)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user, self.token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_one_db_hit_across_requests(self):
+        url = reverse("user")
+        with self.assertNumQueries(1):
+            for _ in range(10):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_change_password_invalidates_token(self):
+        self.assertEqual(
+            self.client.get(reverse("user")).status_code, status.HTTP_200_OK
+        )
+        self.client.post(
+            reverse("change-password"),
+            {"password1": "newpass123", "password2": "newpass123"},
+            format="json",
+        )
+        response = self.client.get(reverse("user"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_token(self):
+        self.assertEqual(
+            self.client.get(reverse("user")).status_code, status.HTTP_200_OK
+        )
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("user"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AuthTokenTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user, self.token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_expired_token_is_rejected_even_when_cached(self):
+        self.assertEqual(
+            self.client.get(reverse("user")).status_code, status.HTTP_200_OK
+        )
+        AuthToken.objects.filter(key=self.token.key).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        token_cache.get(self.token.key)[1].expires_at = timezone.now()
+        response = self.client.get(reverse("user"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_revocation_reaches_other_workers_within_the_ttl(self):
+        config = dict(settings.TOKEN_AUTH_CACHE, SHARED_CACHE="default")
+        workers = [TokenCache(), TokenCache()]
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with override_settings(TOKEN_AUTH_CACHE=config):
+            for worker in workers:
+                worker.set(self.token.key, (self.user, self.token))
+                self.assertIsNotNone(worker.get(self.token.key))
+            workers[0].invalidate(self.token.key)
+            self.assertIsNone(workers[0].get(self.token.key))
+            self.assertIsNone(
+                cache.get(TokenCache.key_prefix + self.token.key)
+            )
+            # The other worker's local copy lives out its TTL.
+            self.assertIsNotNone(workers[1].get(self.token.key))
+            later = time.monotonic() + config["TTL"] + 1
+            with mock.patch("users.authentication.time") as clock:
+                clock.monotonic.return_value = later
+                self.assertIsNone(workers[1].get(self.token.key))
+
+    def test_last_used_is_written_once_per_interval(self):
+        stale = timezone.now() - timedelta(hours=1)
+        AuthToken.objects.filter(key=self.token.key).update(last_used=stale)
+        with self.assertNumQueries(2):
+            for _ in range(5):
+                self.client.get(reverse("user"))
+        last_used = AuthToken.objects.get(key=self.token.key).last_used
+        self.assertGreater(last_used, stale)
+
+    def test_each_login_issues_a_token(self):
+        data = {"email": "dann@gail.com", "password": "rtsgbdkue"}
+        keys = {
+            self.client.post(reverse("login"), data, format="json").data[
+                "token"
+            ]
+            for _ in range(2)
+        }
+        self.assertEqual(len(keys), 2)
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 3)
+
+    def test_sweeper_deletes_expired_tokens_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        AuthToken.objects.bulk_create(
+            AuthToken(user=self.user, expires_at=past) for _ in range(5)
+        )
+        out = StringIO()
+        call_command("sweep_expired_tokens", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 5 expired token(s)", out.getvalue())
+        self.assertEqual(
+            list(AuthToken.objects.values_list("key", flat=True)),
+            [self.token.key],
+        )
+
+
+@override_settings(
+    AUDIT_LOG=dict(settings.AUDIT_LOG, FLUSH_SIZE=3, FLUSH_INTERVAL=60)
+)
+class AuditLogTests(APITestCase):
+    def setUp(self):
+        audit_log.flush()
+        AuditEvent.objects.all().delete()
+        self.user, _ = create_user()
+
+    def login(self):
+        return self.client.post(
+            reverse("login"),
+            {"email": "dann@gail.com", "password": "rtsgbdkue"},
+            format="json",
+        )
+
+    def test_emit_is_buffered_until_flush(self):
+        self.login()
+        self.assertFalse(AuditEvent.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(audit_log.flush(), 1)
+        self.assertEqual(len(queries), 1)
+        event = AuditEvent.objects.get()
+        self.assertEqual(
+            (event.event, event.user_id, event.ip),
+            (AuditEvent.LOGIN, self.user.id, "127.0.0.1"),
+        )
+
+    def test_flushes_in_one_insert_when_the_buffer_fills(self):
+        for _ in range(3):
+            self.login()
+        self.assertEqual(
+            list(
+                AuditEvent.objects.filter(user_id=self.user.id)
+                .order_by("created_at")
+                .values_list("event", flat=True)
+            ),
+            [AuditEvent.LOGIN] * 3,
+        )
+        self.assertEqual(audit_log.buffer, [])
+
+    @override_settings(AUDIT_LOG=dict(settings.AUDIT_LOG, FLUSH_TIMER=True))
+    def test_timer_flushes_a_quiet_worker(self):
+        with mock.patch("users.audit.threading.Timer") as timer:
+            audit_log.emit(AuditEvent.SIGNUP, self.user.id)
+            audit_log.emit(AuditEvent.ACTIVATE, self.user.id)
+        timer.assert_called_once_with(
+            settings.AUDIT_LOG["FLUSH_INTERVAL"], audit_log.flush_on_timer
+        )
+        self.assertFalse(AuditEvent.objects.exists())
+        # Closing connections would end the test's transaction.
+        with mock.patch("users.audit.connections"):
+            audit_log.flush_on_timer()
+        self.assertEqual(AuditEvent.objects.count(), 2)
+        self.assertIsNone(audit_log.timer)
+
+    @override_settings(
+        AUDIT_LOG=dict(settings.AUDIT_LOG, FLUSH_SIZE=100, MAX_BUFFER=2)
+    )
+    def test_oldest_events_are_dropped_past_the_limit(self):
+        for event in (AuditEvent.SIGNUP, AuditEvent.ACTIVATE, "login"):
+            audit_log.emit(event, self.user.id)
+        self.assertIn(
+            'users_audit_events_total{result="dropped"}', registry.render()
+        )
+        audit_log.flush()
+        self.assertEqual(
+            set(AuditEvent.objects.values_list("event", flat=True)),
+            {AuditEvent.ACTIVATE, AuditEvent.LOGIN},
+        )
+
+    @override_settings(
+        AUDIT_LOG=dict(settings.AUDIT_LOG, FLUSH_SIZE=100, FLUSH_INTERVAL=60)
+    )
+    def test_owned_writes_record_the_changed_fields(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.user.auth_tokens.get().key}"
+        )
+        self.client.post(
+            reverse("profile"),
+            SingleStatementWriteTests.profile,
+            format="json",
+        )
+        self.client.put(
+            reverse("profile"), {"last_name": "kakai"}, format="json"
+        )
+        self.client.delete(reverse("profile"))
+        audit_log.flush()
+        self.assertEqual(
+            list(
+                AuditEvent.objects.order_by("created_at").values_list(
+                    "event", "data"
+                )
+            ),
+            [
+                (AuditEvent.PROFILE_CREATE, {}),
+                (AuditEvent.PROFILE_UPDATE, {"fields": ["last_name"]}),
+                (AuditEvent.PROFILE_DELETE, {}),
+            ],
+        )
+
+    def test_partitions_command_needs_postgres(self):
+        out = StringIO()
+        call_command("audit_partitions", stdout=out)
+        self.assertIn("Postgres", out.getvalue())
+
+
+class HashingPoolTests(TestCase):
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_pool_hashes_match_inline_verification(self):
+        encoded = hashing.make_password("rtsgbdkue")
+        self.assertTrue(check_password("rtsgbdkue", encoded))
+        self.assertTrue(hashing.check_password("rtsgbdkue", encoded))
+        self.assertFalse(hashing.check_password("wrong", encoded))
+
+
+class AsyncViewTests(TestCase):
+    async def test_signup(self):
+        response = await self.async_client.post(
+            reverse("async-signup"),
+            {
+                "email": "dan2@gmail.com",
+                "first_name": "dan2",
+                "password": "mylenana",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        count = await sync_to_async(EmailOutbox.objects.count)()
+        self.assertEqual(count, 1)
+
+    async def test_login_and_profile(self):
+        await sync_to_async(create_user)()
+        response = await self.async_client.post(
+            reverse("async-login"),
+            {"email": "dann@gail.com", "password": "rtsgbdkue"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        key = response.json()["token"]
+
+        # Django 4.0's AsyncClient takes extra headers by their raw name.
+        auth = {"AUTHORIZATION": f"Token {key}"}
+        response = await self.async_client.get(reverse("async-user"), **auth)
+        self.assertEqual(response.json()["email"], "dann@gail.com")
+        response = await self.async_client.post(
+            reverse("async-profile"),
+            {
+                "middle_name": "names",
+                "last_name": "last names",
+                "dob": "2022-11-11",
+                "nationality": "kenya",
+                "phone_number": "+254729446777",
+            },
+            content_type="application/json",
+            **auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(
+            reverse("async-profile"), **auth
+        )
+        self.assertEqual(response.json()["middle_name"], "names")
+
+    async def test_etags_and_if_match(self):
+        user, token = await sync_to_async(create_user)()
+        await sync_to_async(create_profile)(user)
+        auth = {"AUTHORIZATION": f"Token {token.key}"}
+        url = reverse("async-profile")
+        response = await self.async_client.get(url, **auth)
+        etag = response["ETag"]
+        response = await self.async_client.get(url, IF_NONE_MATCH=etag, **auth)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.put(
+            url,
+            {"nationality": "uganda"},
+            content_type="application/json",
+            IF_MATCH=etag,
+            **auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        response = await self.async_client.put(
+            url,
+            {"nationality": "tanzania"},
+            content_type="application/json",
+            IF_MATCH=etag,
+            **auth,
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        profile = await sync_to_async(Profile.objects.get)()
+        self.assertEqual(profile.nationality, "uganda")
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse("async-user"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+def create_profile(user, phone_number="+254729446777"):
+    return Profile.objects.create(
+        user=user,
+        middle_name="names",
+        last_name="last names",
+        dob="2022-11-11",
+        nationality="kenya",
+        phone_number=phone_number,
+    )
+
+
+def create_address(user, city="kanairo"):
+    return ResidentialAddress.objects.create(
+        user=user, country="kenya", city=city, state="kanairo", zip="99988"
+    )
+
+
+class MeViewTests(APITestCase):
+    def setUp(self):
+        self.user, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        # Warm the token cache so only the view's own queries are counted.
+        self.client.get(reverse("user"))
+
+    def test_returns_user_profile_and_addresses(self):
+        create_profile(self.user)
+        create_address(self.user, city="kanairo")
+        create_address(self.user, city="mombasa")
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("me"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["email"], "dann@gail.com")
+        self.assertEqual(response.data["profile"]["middle_name"], "names")
+        self.assertEqual(
+            sorted(a["city"] for a in response.data["addresses"]),
+            ["kanairo", "mombasa"],
+        )
+
+    def test_sparse_fields(self):
+        create_profile(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("me"), {"fields": "user.email,profile.phone_number"}
+            )
+        self.assertEqual(
+            response.data,
+            {
+                "user": {"email": "dann@gail.com"},
+                "profile": {"phone_number": "+254729446777"},
+            },
+        )
+
+    def test_missing_profile(self):
+        response = self.client.get(reverse("me"), {"fields": "profile"})
+        self.assertEqual(response.data, {"profile": None})
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.user, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.client.get(reverse("user"))
+
+    @override_settings(PAYLOAD_CACHE=dict(settings.PAYLOAD_CACHE, TTL=0))
+    def test_if_none_match_returns_304_from_version_only(self):
+        create_profile(self.user)
+        response = self.client.get(reverse("profile"))
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("profile"), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_after_put(self):
+        create_address(self.user)
+        etag = self.client.get(reverse("address"))["ETag"]
+        response = self.client.put(
+            reverse("address"),
+            {"city": "mombasa"},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        response = self.client.get(reverse("address"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["city"], "mombasa")
+
+    def test_stale_if_match_is_rejected(self):
+        create_profile(self.user)
+        etag = self.client.get(reverse("profile"))["ETag"]
+        self.client.put(
+            reverse("profile"), {"nationality": "uganda"}, format="json"
+        )
+        response = self.client.put(
+            reverse("profile"),
+            {"nationality": "tanzania"},
+            format="json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertEqual(Profile.objects.get().nationality, "uganda")
+
+
+PAYLOAD_CACHE_ON = {**settings.PAYLOAD_CACHE, "TTL": 300}
+
+
+@override_settings(PAYLOAD_CACHE=PAYLOAD_CACHE_ON)
+class PayloadCacheTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        self.user, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.client.get(reverse("user"))
+
+    def test_repeat_reads_and_revalidation_skip_the_database(self):
+        create_profile(self.user)
+        with self.assertNumQueries(1):
+            etag = self.client.get(reverse("profile"))["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("profile"))
+            self.assertEqual(response.data["nationality"], "kenya")
+            response = self.client.get(
+                reverse("profile"), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        counters = registry.render()
+        self.assertIn(
+            'users_payload_cache_total{kind="profile",result="hit"} 2',
+            counters,
+        )
+        self.assertIn(
+            'users_payload_cache_total{kind="profile",result="miss"} 1',
+            counters,
+        )
+
+    def test_missing_row_is_cached_as_404(self):
+        self.client.get(reverse("address"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("address"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_invalidate(self):
+        create_address(self.user)
+        self.client.get(reverse("address"))
+        self.client.put(reverse("address"), {"city": "mombasa"}, format="json")
+        self.assertEqual(
+            self.client.get(reverse("address")).data["city"], "mombasa"
+        )
+
+        self.client.put(
+            reverse("address-list"),
+            [
+                {
+                    "country": "kenya",
+                    "city": "thika",
+                    "state": "kiambu",
+                    "zip": "01000",
+                }
+            ],
+            format="json",
+        )
+        self.assertEqual(
+            self.client.get(reverse("address")).data["city"], "thika"
+        )
+
+        self.client.delete(reverse("address"))
+        response = self.client.get(reverse("address"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_model_saves_invalidate(self):
+        profile = create_profile(self.user)
+        self.client.get(reverse("profile"))
+        self.client.get(reverse("user"))
+        profile.nationality = "uganda"
+        profile.save()
+        self.user.first_name = "Achieng"
+        self.user.save()
+        self.assertEqual(
+            self.client.get(reverse("profile")).data["nationality"], "uganda"
+        )
+        self.assertEqual(
+            self.client.get(reverse("user")).data["first_name"], "Achieng"
+        )
+
+
+@override_settings(PAYLOAD_CACHE=PAYLOAD_CACHE_ON)
+class PayloadCacheLoadTests(TestCase):
+    def setUp(self):
+        self.user_id = uuid.uuid4()
+
+    def test_concurrent_misses_load_once(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.1)
+            return {"city": "kisumu"}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    payload_cache.get_or_load("profile", self.user_id, load)
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(results, [{"city": "kisumu"}] * 8)
+
+    def test_load_racing_a_write_is_not_cached(self):
+        def load():
+            payload_cache.invalidate(self.user_id, "profile")
+            return {"city": "stale"}
+
+        payload_cache.get_or_load("profile", self.user_id, load)
+        value = payload_cache.get_or_load(
+            "profile", self.user_id, lambda: {"city": "fresh"}
+        )
+        self.assertEqual(value, {"city": "fresh"})
+
+
+class SingleStatementWriteTests(APITestCase):
+    profile = {
+        "middle_name": "names",
+        "last_name": "last names",
+        "dob": "2022-11-11",
+        "nationality": "kenya",
+        "phone_number": "+254729446777",
+    }
+
+    def setUp(self):
+        self.user, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.client.get(reverse("user"))
+
+    @contextmanager
+    def assertStatements(self, expected):
+        # The savepoint around each write only exists inside the test case's
+        # transaction, so it is not counted.
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        self.assertEqual(count_queries(queries), expected)
+
+    def test_full_put_upserts_in_one_statement(self):
+        for version in (1, 2):
+            with self.assertStatements(1):
+                response = self.client.put(
+                    reverse("profile"), self.profile, format="json"
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["user_id"], str(self.user.id))
+        profile = Profile.objects.get()
+        self.assertEqual(profile.version, 2)
+        self.assertEqual(str(profile.dob), "2022-11-11")
+
+    def test_post_on_existing_profile_replaces_it(self):
+        create_profile(self.user)
+        data = dict(self.profile, nationality="uganda")
+        response = self.client.post(reverse("profile"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Profile.objects.get().nationality, "uganda")
+
+    def test_partial_put_writes_only_given_columns(self):
+        create_profile(self.user)
+        with self.assertStatements(1) as queries:
+            response = self.client.put(
+                reverse("profile"), {"last_name": "new"}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["middle_name"], "names")
+        [update] = [q["sql"] for q in queries if "UPDATE" in q["sql"]]
+        self.assertIn('"last_name" =', update)
+        self.assertNotIn('"middle_name" =', update)
+
+    def test_partial_put_without_row_is_404(self):
+        response = self.client.put(
+            reverse("profile"), {"last_name": "new"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_duplicate_phone_number_is_400(self):
+        other, _ = create_user(email="other@gail.com")
+        create_profile(other)
+        response = self.client.put(
+            reverse("profile"), self.profile, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("phone_number", response.data)
+
+    def test_if_match_is_checked_by_the_update(self):
+        create_profile(self.user)
+        etag = self.client.get(reverse("profile"))["ETag"]
+        with self.assertStatements(1):
+            response = self.client.put(
+                reverse("profile"),
+                {"nationality": "uganda"},
+                format="json",
+                HTTP_IF_MATCH=etag,
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_address_put_keeps_a_single_row(self):
+        create_address(self.user)
+        data = {
+            "country": "kenya",
+            "city": "mombasa",
+            "state": "coast",
+            "zip": "80100",
+        }
+        with self.assertStatements(1):
+            response = self.client.put(reverse("address"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(ResidentialAddress.objects.get().city, "mombasa")
+
+    def test_delete_is_one_statement_and_a_tombstone(self):
+        create_profile(self.user)
+        with self.assertStatements(2):
+            response = self.client.delete(reverse("profile"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.delete(reverse("profile"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AddressBookTests(APITestCase):
+    def setUp(self):
+        self.user, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.client.get(reverse("user"))
+
+    def address(self, city):
+        return {"country": "kenya", "city": city, "state": "x", "zip": "1"}
+
+    def test_list_is_paginated(self):
+        for i in range(25):
+            create_address(self.user, city=f"city{i}")
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("address-list"))
+        self.assertEqual(len(response.data["results"]), 20)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertIsNone(response.data["next"])
+
+    def test_singular_endpoint_with_several_addresses(self):
+        create_address(self.user, city="a")
+        create_address(self.user, city="b")
+        response = self.client.get(reverse("address"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_create(self):
+        data = [self.address(f"city{i}") for i in range(10)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("address-list"), data, format="json"
+            )
+        self.assertEqual(count_queries(queries), 1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(self.user.residentialaddress_set.count(), 10)
+
+    def test_replace_applies_a_diff(self):
+        kept = create_address(self.user, city="kanairo")
+        unchanged = create_address(self.user, city="kisumu")
+        create_address(self.user, city="mombasa")
+        data = [
+            dict(self.address("nakuru"), id=str(kept.id)),
+            dict(
+                self.address("kisumu"),
+                id=str(unchanged.id),
+                state=unchanged.state,
+                zip=unchanged.zip,
+            ),
+            self.address("eldoret"),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                reverse("address-list"), data, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Locked SELECT, DELETE, tombstone INSERT, UPDATE, INSERT.
+        self.assertEqual(count_queries(queries), 5)
+        addresses = {
+            a.city: a
+            for a in ResidentialAddress.objects.filter(user=self.user)
+        }
+        self.assertEqual(set(addresses), {"nakuru", "kisumu", "eldoret"})
+        self.assertEqual(addresses["nakuru"].id, kept.id)
+        self.assertEqual(addresses["nakuru"].version, 2)
+        self.assertEqual(addresses["kisumu"].version, 1)
+
+    def test_replace_rejects_other_users_addresses(self):
+        other, _ = create_user(email="other@gail.com")
+        theirs = create_address(other)
+        mine = create_address(self.user)
+        data = [dict(self.address("nakuru"), id=str(theirs.id))]
+        response = self.client.put(
+            reverse("address-list"), data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ResidentialAddress.objects.filter(id=mine.id).exists())
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.city, "kanairo")
+
+
+@override_settings(CHANGE_FEED=dict(settings.CHANGE_FEED, LAG=0))
+class ChangeFeedTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token = AuthToken.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.user, _ = create_user()
+
+    def poll(self, kind, cursor=None, **params):
+        if cursor:
+            params["cursor"] = cursor
+        response = self.client.get(reverse("change-feed", args=[kind]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_pages_through_changes_in_order(self):
+        addresses = [create_address(self.user, city=f"c{i}") for i in range(3)]
+        first = self.poll("addresses", limit=2)
+        self.assertTrue(first["has_more"])
+        second = self.poll("addresses", first["cursor"], limit=2)
+        self.assertFalse(second["has_more"])
+        self.assertEqual(
+            [entry["id"] for entry in first["results"] + second["results"]],
+            [address.id for address in addresses],
+        )
+        idle = self.poll("addresses", second["cursor"])
+        self.assertEqual(
+            (idle["results"], idle["cursor"]), ([], second["cursor"])
+        )
+
+        addresses[0].city = "nakuru"
+        addresses[0].save()
+        [entry] = self.poll("addresses", second["cursor"])["results"]
+        self.assertEqual(entry["data"]["city"], "nakuru")
+
+    def test_single_statement_writes_move_rows_forward(self):
+        create_profile(self.user)
+        cursor = self.poll("profiles")["cursor"]
+        Profile.objects.update_for_user(self.user.id, {"last_name": "kakai"})
+        [entry] = self.poll("profiles", cursor)["results"]
+        self.assertEqual(entry["data"]["last_name"], "kakai")
+        self.assertEqual(entry["user_id"], self.user.id)
+
+    def test_deletes_leave_tombstones(self):
+        create_profile(self.user)
+        kept, dropped = create_address(self.user), create_address(self.user)
+        cursors = {
+            kind: self.poll(kind)["cursor"]
+            for kind in ("users", "profiles", "addresses")
+        }
+        user_id = self.user.id
+        Profile.objects.delete_for_user(user_id)
+        self.user.delete()
+        [entry] = self.poll("profiles", cursors["profiles"])["results"]
+        self.assertEqual((entry["deleted"], entry["data"]), (True, None))
+        self.assertEqual(
+            {
+                entry["id"]
+                for entry in self.poll("addresses", cursors["addresses"])[
+                    "results"
+                ]
+            },
+            {kept.id, dropped.id},
+        )
+        [entry] = self.poll("users", cursors["users"])["results"]
+        self.assertEqual(entry["id"], user_id)
+
+    def test_poll_is_one_range_scan_per_table(self):
+        self.poll("users")
+        with self.assertNumQueries(2):
+            self.poll("users", limit=1)
+
+    @override_settings(CHANGE_FEED=dict(settings.CHANGE_FEED, LAG=60))
+    def test_recent_writes_are_held_back(self):
+        self.assertEqual(self.poll("users")["results"], [])
+
+    def test_password_rehash_is_not_a_change(self):
+        cursor = self.poll("users")["cursor"]
+        self.user.set_password("rtsgbdkue")
+        self.user.save(update_fields=["password"])
+        self.assertEqual(self.poll("users", cursor)["results"], [])
+
+    def test_rejects_bad_cursor_and_unknown_kind(self):
+        response = self.client.get(
+            reverse("change-feed", args=["users"]), {"cursor": "nope"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("change-feed", args=["tokens"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_sweeper_deletes_old_tombstones(self):
+        Tombstone.objects.record(User, self.user.id, [self.user.id])
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        out = StringIO()
+        call_command("sweep_tombstones", stdout=out)
+        self.assertIn("Deleted 1 tombstone(s)", out.getvalue())
+
+
+@contextmanager
+def shard_databases(*aliases):
+    """Shard user data over fresh in-memory SQLite databases."""
+    for alias in aliases:
+        connections.settings[alias] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": ":memory:",
+        }
+        connections.ensure_defaults(alias)
+        connections.prepare_test_settings(alias)
+        with connections[alias].schema_editor() as editor:
+            for model in (User, Profile, ResidentialAddress, AuthToken):
+                editor.create_model(model)
+    try:
+        with override_settings(DATABASE_SHARDS=list(aliases)):
+            yield
+    finally:
+        for alias in aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+
+class ShardingTests(APITestCase):
+    shards = ("shard_a", "shard_b")
+    password = "Nairobi-pass-42"
+
+    def setUp(self):
+        token_cache.clear()
+        context = shard_databases(*self.shards)
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+
+    def signup(self, email):
+        return self.client.post(
+            reverse("signup"),
+            {"email": email, "first_name": "dan", "password": self.password},
+            format="json",
+        )
+
+    def test_ring_only_moves_users_to_a_new_shard(self):
+        ids = [uuid.UUID(int=i * 7919 << 64 | i) for i in range(2000)]
+        before = sharding.HashRing(["a", "b"], 128)
+        after = sharding.HashRing(["a", "b", "c"], 128)
+        moved = [i for i in ids if before.shard_for(i) != after.shard_for(i)]
+        self.assertTrue(all(after.shard_for(i) == "c" for i in moved))
+        self.assertLess(abs(len(moved) / len(ids) - 1 / 3), 0.1)
+
+    def test_user_data_lives_on_one_shard(self):
+        response = self.signup("dann@gail.com")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user_id = uuid.UUID(response.data["user"]["id"])
+        shard = sharding.placement(user_id)
+        self.assertEqual(ShardDirectory.objects.get().shard, shard)
+        self.assertFalse(User.objects.using("default").exists())
+        User.objects.using(shard).filter(pk=user_id).update(is_active=True)
+
+        response = self.client.post(
+            reverse("login"),
+            {"email": "dann@gail.com", "password": self.password},
+            format="json",
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {response.data['token']}"
+        )
+        response = self.client.put(
+            reverse("profile"),
+            SingleStatementWriteTests.profile,
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Profile.objects.using(shard).get().user_id, user_id)
+        response = self.client.get(reverse("me"))
+        self.assertEqual(response.data["profile"]["last_name"], "last names")
+
+    def test_address_book_is_replaced_on_the_users_shard(self):
+        user = User(id=uuid.UUID(int=1), email="dann@gail.com", is_active=True)
+        user.save()
+        shard = user._state.db
+        token = AuthToken.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        with sharding.using_shard(shard):
+            kept = create_address(user, city="kisumu")
+            removed = create_address(user, city="mombasa")
+        address = {"country": "kenya", "state": "x", "zip": "1"}
+        data = [
+            dict(address, id=str(kept.id), city="nakuru"),
+            dict(address, city="eldoret"),
+        ]
+
+        # A failure half way leaves the address book as it was.
+        with mock.patch.object(
+            ResidentialAddress.objects, "bulk_create", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.put(reverse("address-list"), data, format="json")
+        addresses = ResidentialAddress.objects.using(shard)
+        self.assertEqual(
+            set(addresses.values_list("city", flat=True)),
+            {"kisumu", "mombasa"},
+        )
+        self.assertFalse(Tombstone.objects.exists())
+
+        response = self.client.put(
+            reverse("address-list"), data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(addresses.values_list("city", flat=True)),
+            {"nakuru", "eldoret"},
+        )
+        self.assertEqual(
+            list(Tombstone.objects.values_list("object_id", flat=True)),
+            [removed.id],
+        )
+
+    def test_email_is_unique_across_shards(self):
+        self.signup("dann@gail.com")
+        response = self.signup("dann@gail.com")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+
+    def test_signup_race_leaves_no_user_on_a_shard(self):
+        self.signup("dann@gail.com")
+        # Both requests passed validation before either wrote.
+        with mock.patch.object(
+            SignUpSerializer, "validate_email", side_effect=lambda v: v
+        ):
+            response = self.signup("dann@gail.com")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = async_to_sync(self.async_client.post)(
+                reverse("async-signup"),
+                {
+                    "email": "dann@gail.com",
+                    "first_name": "dan",
+                    "password": self.password,
+                },
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sum(User.objects.using(shard).count() for shard in self.shards),
+            1,
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_middleware_with_async_get_response(self):
+        bound = []
+
+        async def get_response(request):
+            state = sharding._state.get()
+            bound.append(state.shard)
+            state.shard = "shard_b"
+            return HttpResponse()
+
+        middleware = sharding.ShardMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        for _ in range(2):
+            async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertEqual(bound, [None, None])
+        self.assertIsNone(sharding._state.get())
+
+    def test_lookup_reads_each_users_shard(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token = AuthToken.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        users = []
+        for i in range(8):
+            # Fixed ids, so the ring spreads them the same way every run.
+            user = User(id=uuid.UUID(int=i + 1), email=f"user{i}@gail.com")
+            user.save()
+            users.append(user)
+        self.assertEqual({user._state.db for user in users}, set(self.shards))
+        response = self.client.post(
+            reverse("user-lookup"),
+            {"ids": [str(user.pk) for user in users]},
+            format="json",
+        )
+        self.assertEqual(
+            {
+                pk: result["user"]["email"]
+                for pk, result in response.data["results"].items()
+            },
+            {str(user.pk): user.email for user in users},
+        )
+
+    @override_settings(CHANGE_FEED=dict(settings.CHANGE_FEED, LAG=0))
+    def test_admin_reads_cover_every_shard(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token = AuthToken.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        users = []
+        for i in range(8):
+            user = User(id=uuid.UUID(int=i + 1), email=f"user{i}@gail.com")
+            user.save()
+            users.append(user)
+        self.assertEqual({user._state.db for user in users}, set(self.shards))
+        expected = sorted(str(user.pk) for user in users + [admin])
+
+        listed = []
+        response = self.client.get(reverse("user-list"), {"page_size": 4})
+        while True:
+            listed += [user["id"] for user in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(listed, expected)
+
+        response = self.client.get(reverse("user-search"), {"q": "gail.com"})
+        self.assertEqual(
+            [user["id"] for user in response.data["results"]],
+            [pk for pk in expected if pk != str(admin.pk)],
+        )
+
+        response = self.client.get(reverse("user-export"))
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(
+            sorted(json.loads(line)["id"] for line in lines), expected
+        )
+
+        response = self.client.get(reverse("change-feed", args=["users"]))
+        self.assertEqual(
+            sorted(entry["id"] for entry in response.data["results"]),
+            [uuid.UUID(pk) for pk in expected],
+        )
+
+    def test_rebalance_moves_users_with_their_rows(self):
+        with override_settings(
+            DATABASE_SHARDS=["shard_a"]
+        ), sharding.using_shard("shard_a"):
+            for i in range(20):
+                user = User(email=f"user{i}@gail.com", first_name="dan")
+                user.save()
+                create_profile(user, phone_number=f"+2547000000{i:02d}")
+                create_address(user)
+        out = StringIO()
+        call_command("rebalance_shards", "--batch-size", "7", stdout=out)
+        moved = User.objects.using("shard_b").count()
+        self.assertIn(f"Moved {moved} user(s)", out.getvalue())
+        self.assertGreater(moved, 0)
+        for shard in self.shards:
+            users = User.objects.using(shard)
+            self.assertTrue(
+                all(sharding.placement(user.pk) == shard for user in users)
+            )
+            self.assertEqual(
+                Profile.objects.using(shard).count(), users.count()
+            )
+            self.assertEqual(
+                ResidentialAddress.objects.using(shard).count(), users.count()
+            )
+        self.assertEqual(
+            ShardDirectory.objects.filter(shard="shard_b").count(), moved
+        )
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class AdminUserListTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token, _ = AuthToken.objects.get_or_create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        for i in range(5):
+            user = User.objects.create_user(
+                first_name=f"user{i}",
+                email=f"user{i}@{'corp.com' if i % 2 else 'mail.com'}",
+                password="rtsgbdkue",
+            )
+            create_profile(user, phone_number=f"+25470000000{i}")
+        self.client.get(reverse("user"))
+
+    def test_requires_admin(self):
+        _, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_walks_all_pages_in_id_order(self):
+        seen = []
+        url = reverse("user-list") + "?page_size=2"
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen.extend(user["id"] for user in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_filters_and_embedded_profile(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("user-list"),
+                {
+                    "email_domain": "CORP.com",
+                    "is_admin": "false",
+                    "embed": "profile",
+                },
+            )
+        results = response.data["results"]
+        self.assertEqual(
+            sorted(user["email"] for user in results),
+            ["user1@corp.com", "user3@corp.com"],
+        )
+        self.assertEqual(results[0]["profile"]["middle_name"], "names")
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token, _ = AuthToken.objects.get_or_create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.user, _ = create_user()
+        create_profile(self.user)
+        other, _ = create_user(email="wanjiru@mail.com")
+        other.first_name = "Achieng"
+        other.save()
+        Profile.objects.create(
+            user=other,
+            middle_name="m",
+            last_name="Kamau",
+            dob="1990-01-01",
+            nationality="kenya",
+            phone_number="+254711000000",
+        )
+        self.client.get(reverse("user"))
+
+    def search(self, q):
+        return self.client.get(reverse("user-search"), {"q": q})
+
+    def emails(self, response):
+        return [user["email"] for user in response.data["results"]]
+
+    def test_partial_email_and_names(self):
+        self.assertEqual(
+            self.emails(self.search("anjir")), ["wanjiru@mail.com"]
+        )
+        self.assertEqual(self.emails(self.search("DANN")), ["dann@gail.com"])
+        self.assertEqual(
+            self.emails(self.search("achie")), ["wanjiru@mail.com"]
+        )
+        self.assertEqual(
+            self.emails(self.search("kamau")), ["wanjiru@mail.com"]
+        )
+        self.assertEqual(self.emails(self.search("@gail")), ["dann@gail.com"])
+
+    def test_phone_number_in_any_format_uses_one_query(self):
+        for q in ("0711 000 000", "+254 711-000-000", "00254711000000"):
+            with self.assertNumQueries(1):
+                response = self.search(q)
+            self.assertEqual(self.emails(response), ["wanjiru@mail.com"])
+
+    def test_short_query_is_rejected(self):
+        response = self.search("da")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_profile_writes(self):
+        self.assertEqual(self.emails(self.search("otieno")), [])
+        Profile.objects.update_for_user(self.user.id, {"last_name": "Otieno"})
+        self.assertEqual(self.emails(self.search("otieno")), ["dann@gail.com"])
+
+    def test_requires_admin(self):
+        token = AuthToken.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.search("dann")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("0729 446 777"), "+254729446777")
+        self.assertEqual(
+            normalize_phone("(0729) 446-777", country_code="255"),
+            "+255729446777",
+        )
+        self.assertEqual(normalize_phone("254729446777"), "+254729446777")
+        self.assertIsNone(normalize_phone("729446777"))
+        self.assertIsNone(normalize_phone("not a number"))
+        self.assertIsNone(normalize_phone("+0123"))
+
+    def test_profile_phone_numbers_are_stored_normalized(self):
+        token = AuthToken.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.put(
+            reverse("profile"), {"phone_number": "0722 000 111"}, format="json"
+        )
+        self.assertEqual(response.data["phone_number"], "+254722000111")
+        response = self.client.put(
+            reverse("profile"), {"phone_number": "call me"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserLookupTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token = AuthToken.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.user, _ = create_user()
+        create_profile(self.user)
+        self.other, _ = create_user(email="wanjiru@mail.com")
+        self.client.get(reverse("user"))
+
+    def lookup(self, ids):
+        return self.client.post(
+            reverse("user-lookup"), {"ids": ids}, format="json"
+        )
+
+    def test_returns_users_profiles_and_missing_markers(self):
+        missing = uuid.uuid4()
+        ids = [self.user.id, str(self.other.id).upper(), missing]
+        response = self.lookup([str(pk) for pk in ids] + [str(self.user.id)])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 3)
+        found = results[str(self.user.id)]
+        self.assertEqual(found["user"]["email"], "dann@gail.com")
+        self.assertEqual(found["profile"]["phone_number"], "+254729446777")
+        self.assertIsNone(results[str(self.other.id)]["profile"])
+        self.assertIsNone(results[str(missing)])
+
+    def test_runs_one_query_per_chunk(self):
+        ids = [str(self.user.id), str(self.other.id)] + [
+            str(uuid.uuid4()) for _ in range(3)
+        ]
+        with mock.patch.object(UserLookupView, "chunk_size", 2):
+            with self.assertNumQueries(3):
+                response = self.lookup(ids)
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_rejects_bad_and_too_many_ids(self):
+        response = self.lookup(["nope"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with mock.patch.object(UserLookupView, "max_ids", 1):
+            response = self.lookup([str(uuid.uuid4())] * 2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserExportTests(APITestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin@corp.com", "adminpass")
+        token, _ = AuthToken.objects.get_or_create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.user, _ = create_user()
+        create_profile(self.user)
+        create_address(self.user, city="kanairo")
+        create_address(self.user, city="mombasa")
+        for i in range(3):
+            create_user(email=f"user{i}@mail.com")
+        self.client.get(reverse("user"))
+
+    def export(self, **params):
+        response = self.client.get(reverse("user-export"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_in_one_query_per_chunk(self):
+        # 5 users in chunks of 2: the user/profile cursor plus 3 address
+        # queries.
+        with mock.patch.object(UserExportView, "chunk_size", 2):
+            with self.assertNumQueries(4):
+                content = self.export()
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 5)
+        record = next(r for r in records if r["email"] == "dann@gail.com")
+        self.assertEqual(record["profile"]["phone_number"], "+254729446777")
+        self.assertEqual(
+            sorted(a["city"] for a in record["addresses"]),
+            ["kanairo", "mombasa"],
+        )
+        self.assertNotIn("password", record)
+        other = next(r for r in records if r["email"] == "user0@mail.com")
+        self.assertIsNone(other["profile"])
+        self.assertEqual(other["addresses"], [])
+
+    def test_csv_has_a_row_per_address(self):
+        rows = list(csv.reader(io.StringIO(self.export(type="csv").decode())))
+        self.assertEqual(rows[0], list(CSV_HEADER))
+        self.assertEqual(len(rows), 1 + 6)
+
+    def test_gzip(self):
+        content = gzip.decompress(self.export(type="csv", gzip="1"))
+        self.assertTrue(content.startswith(b"id,email,"))
+
+    def test_unknown_type(self):
+        response = self.client.get(reverse("user-export"), {"type": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.ndjson.gz")
+            call_command("export_users", "--gzip", "--output", path)
+            with open(path, "rb") as f:
+                lines = gzip.decompress(f.read()).splitlines()
+        self.assertEqual(len(lines), 5)
+
+
+class GenerateUsersTests(TestCase):
+    def test_loads_users_profiles_and_addresses(self):
+        out = StringIO()
+        call_command("generate_users", "30", "--batch-size", "7", stdout=out)
+        self.assertIn("Generated 30 user(s)", out.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertGreater(Profile.objects.count(), 0)
+        self.assertGreater(ResidentialAddress.objects.count(), 0)
+        # One shared hash, and it is a working password.
+        self.assertEqual(User.objects.values("password").distinct().count(), 1)
+        self.assertTrue(
+            User.objects.first().check_password("Synthetic-pass-42")
+        )
+        for phone_number in Profile.objects.values_list(
+            "phone_number", flat=True
+        ):
+            self.assertEqual(normalize_phone(phone_number), phone_number)
+
+    def test_output_depends_only_on_seed_and_batches(self):
+        def rows(*ranges, seed=3):
+            return [
+                row
+                for start, count in ranges
+                for batch in synthetic.generate(
+                    count, "hash", seed=seed, start=start, batch_size=5
+                )
+                for table in batch
+                for row in table
+            ]
+
+        # What parallel workers do: split the range on batch boundaries.
+        self.assertEqual(rows((0, 20)), rows((0, 10), (10, 10)))
+        self.assertNotEqual(rows((0, 20)), rows((0, 20), seed=4))
+
+    def test_workers_need_postgres(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_users", "10", "--workers", "2")
+
+
+class QueryBudgetTests(APITestCase):
+    def test_every_endpoint_stays_within_budget(self):
+        ctx = Context()
+        for name in SCENARIOS:
+            with self.subTest(endpoint=name):
+                send(self.client, build(ctx, name, 0))
+                request = build(ctx, name, 1)
+                with CaptureQueriesContext(connection) as queries:
+                    response = send(self.client, request)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    count_queries(queries), QUERY_BUDGETS[name]
+                )
+
+
+@override_settings(
+    MIDDLEWARE=settings_api.MIDDLEWARE,
+    REST_FRAMEWORK=settings_api.REST_FRAMEWORK,
+)
+class ApiProfileTests(APITestCase):
+    def test_every_endpoint_works_without_browser_middleware(self):
+        ctx = Context()
+        for name in SCENARIOS:
+            with self.subTest(endpoint=name):
+                response = send(self.client, build(ctx, name, 0))
+                self.assertLess(response.status_code, 400)
+
+    def test_browser_apps_are_left_out(self):
+        self.assertNotIn("django.contrib.admin", settings_api.INSTALLED_APPS)
+        self.assertNotIn(
+            "django.middleware.csrf.CsrfViewMiddleware",
+            settings_api.MIDDLEWARE,
+        )
+
+    def test_warm_up_preloads_lazy_state_without_queries(self):
+        clear_url_caches()
+        get_default_password_validators.cache_clear()
+        with self.assertNumQueries(0):
+            elapsed = warm_up()
+        self.assertEqual(set(elapsed), set(STEPS))
+        self.assertTrue(get_resolver()._populated)
+        self.assertEqual(
+            get_default_password_validators.cache_info().currsize, 1
+        )
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+
+    def test_header_and_metrics(self):
+        user, token = create_user()
+        create_profile(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        response = self.client.get(reverse("profile"))
+        timing = response["Server-Timing"]
+        for phase in ("db;dur=", "hash;dur=", "serialize;dur=", "total;dur="):
+            self.assertIn(phase, timing)
+        self.assertIn('queries;desc="2"', timing)
+
+        response = self.client.post(
+            reverse("login"),
+            {"email": "dann@gail.com", "password": "rtsgbdkue"},
+            format="json",
+        )
+        hash_ms = float(
+            response["Server-Timing"].split("hash;dur=")[1].split(",")[0]
+        )
+        self.assertGreater(hash_ms, 0)
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn(
+            'users_request_phase_seconds_count{view="profile",phase="db"} 1',
+            body,
+        )
+        self.assertIn('users_request_queries_count{view="login"} 1', body)
+
+    def test_async_get_response(self):
+        async def get_response(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        middleware = ServerTimingMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn('queries;desc="1"', response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_no_header_when_sampling_is_off(self):
+        response = self.client.post(reverse("login"), {}, format="json")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_metrics_are_internal_only(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BreachedPasswordTests(APITestCase):
+    breached = ["correcthorse", "hunter22hunter", "Bench-pass-42"]
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        dump = os.path.join(workdir.name, "dump.txt")
+        self.index_path = os.path.join(workdir.name, "breached.idx")
+        with open(dump, "w") as f:
+            for i, password in enumerate(self.breached):
+                digest = hashlib.sha1(password.encode()).hexdigest().upper()
+                f.write(f"{digest}:{i + 1}\n")
+        call_command(
+            "build_breached_password_index",
+            dump,
+            self.index_path,
+            chunk_size=2,
+            stdout=StringIO(),
+        )
+
+    def test_index_lookup(self):
+        index = BreachedPasswordIndex(self.index_path)
+        self.assertEqual(len(index), 3)
+        for password in self.breached:
+            self.assertIn(password_record(password), index)
+        self.assertNotIn(password_record("not-breached-1"), index)
+
+    def test_change_password_runs_validators(self):
+        _, token = create_user()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        validators = [
+            {
+                "NAME": "users.password_validation.BreachedPasswordValidator",
+                "OPTIONS": {"index_path": self.index_path},
+            }
+        ]
+        with override_settings(AUTH_PASSWORD_VALIDATORS=validators):
+            response = self.client.post(
+                reverse("change-password"),
+                {"password1": "correcthorse", "password2": "correcthorse"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["error"],
+            ["This password has appeared in a data breach."],
+        )
+
+
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        local_counters.clear()
+        self.addCleanup(local_counters.clear)
+        # Pin the clock mid-window so a test never straddles two windows.
+        patcher = mock.patch("users.throttling.time")
+        patcher.start().time.return_value = 90.0
+        self.addCleanup(patcher.stop)
+        create_user()
+
+    def login(self, email, ip):
+        return self.client.post(
+            reverse("login"),
+            {"email": email, "password": "wrong"},
+            format="json",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_email_throttle_rejects_before_any_query(self):
+        for i in range(10):
+            self.assertEqual(
+                self.login("dann@gail.com", f"10.0.0.{i}").status_code,
+                status.HTTP_404_NOT_FOUND,
+            )
+        with self.assertNumQueries(0):
+            response = self.login("DANN@gail.com", "10.0.1.1")
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertIn("Retry-After", response)
+
+    def test_ip_throttle(self):
+        for i in range(30):
+            self.login(f"user{i}@gail.com", "10.0.0.1")
+        response = self.login("someone@gail.com", "10.0.0.1")
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response = self.login("someone@gail.com", "10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ip_throttle_ignores_spoofed_forwarded_for(self):
+        for i in range(31):
+            response = self.client.post(
+                reverse("login"),
+                {"email": f"user{i}@gail.com", "password": "wrong"},
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"192.0.2.{i}",
+            )
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_forgot_password_throttle(self):
+        for _ in range(5):
+            self.client.post(
+                reverse("forgot-password"), {"email": "dann@gail.com"}
+            )
+        response = self.client.post(
+            reverse("forgot-password"), {"email": "dann@gail.com"}
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(EmailOutbox.objects.count(), 5)
+
+    def test_local_counters_evict_least_recently_hit_keys(self):
+        counters = LocalCounters(shards=1, max_keys_per_shard=3)
+        for key in ("a", "b", "c"):
+            self.assertTrue(counters.hit(key, 1, 60, 10.0))
+        self.assertFalse(counters.hit("a", 1, 60, 10.0))
+        self.assertTrue(counters.hit("d", 1, 60, 10.0))
+        table, _ = counters.shards[0]
+        self.assertEqual(list(table), ["c", "a", "d"])
+        # "b" was evicted and starts over.
+        self.assertTrue(counters.hit("b", 1, 60, 10.0))
+
+    def test_sliding_window_carries_previous_window(self):
+        counters = LocalCounters(shards=2)
+        # 10 hits at the end of window 0 ...
+        for _ in range(10):
+            self.assertTrue(counters.hit("k", 10, 60, 59.0))
+        self.assertFalse(counters.hit("k", 10, 60, 59.5))
+        # ... still weigh 75% a quarter into window 1: 7.5 + 3 > 10.
+        for _ in range(3):
+            self.assertTrue(counters.hit("k", 10, 60, 75.0))
+        self.assertFalse(counters.hit("k", 10, 60, 75.0))
+
+
+@contextmanager
+def replica_databases(*aliases):
+    """Read replicas that are test mirrors of ``default``."""
+    for alias in aliases:
+        connections.settings[alias] = dict(
+            connections["default"].settings_dict, TEST={"MIRROR": "default"}
+        )
+        connections.ensure_defaults(alias)
+        connections.prepare_test_settings(alias)
+    try:
+        with override_settings(DATABASE_REPLICAS=list(aliases)):
+            yield
+    finally:
+        for alias in aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+
+class ReplicaRouterTests(APITransactionTestCase):
+    # Not a TestCase: inside its transaction every read uses the primary.
+    replicas = ("replica_0", "replica_1")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        context = replica_databases(*self.replicas)
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
+        self.router = PrimaryReplicaRouter()
+        self.user, self.token = create_user()
+        self.profile = create_profile(self.user)
+
+    @contextmanager
+    def queries(self):
+        with ExitStack() as stack:
+            yield {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in ("default", *self.replicas)
+            }
+
+    def aliases(self, queries, table):
+        """The aliases that ran queries on ``table``."""
+        return {
+            alias
+            for alias, context in queries.items()
+            if any(table in query["sql"] for query in context)
+        }
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_reads_use_a_replica_and_writes_the_primary(self):
+        with self.queries() as queries:
+            Profile.objects.get(user=self.user)
+        (alias,) = self.aliases(queries, "users_profile")
+        self.assertIn(alias, self.replicas)
+
+        with self.queries() as queries:
+            AuthToken.objects.get(pk=self.token.pk)
+            Profile.objects.filter(pk=self.profile.pk).update(
+                middle_name="new"
+            )
+        self.assertEqual(self.aliases(queries, "users_authtoken"), {"default"})
+        self.assertEqual(self.aliases(queries, "users_profile"), {"default"})
+
+    def test_write_pins_later_reads_of_the_request(self):
+        token = _state.set(RoutingState())
+        try:
+            with self.queries() as queries:
+                Profile.objects.filter(pk=self.profile.pk).update(
+                    middle_name="new"
+                )
+                profile = Profile.objects.get(pk=self.profile.pk)
+        finally:
+            _state.reset(token)
+        self.assertEqual(profile.middle_name, "new")
+        self.assertEqual(self.aliases(queries, "users_profile"), {"default"})
+
+    def test_audit_event_writes_do_not_pin(self):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            with self.queries() as queries:
+                AuditEvent.objects.create(
+                    event=AuditEvent.LOGIN, user_id=self.user.pk
+                )
+                Profile.objects.get(pk=self.profile.pk)
+        finally:
+            _state.reset(token)
+        self.assertFalse(state.wrote)
+        self.assertEqual(
+            self.aliases(queries, "users_auditevent"), {"default"}
+        )
+        (alias,) = self.aliases(queries, "users_profile")
+        self.assertIn(alias, self.replicas)
+
+    def test_touching_last_used_does_not_pin(self):
+        stale = timezone.now() - timedelta(
+            seconds=settings.AUTH_TOKEN_LAST_USED_INTERVAL + 1
+        )
+        AuthToken.objects.filter(pk=self.token.pk).update(last_used=stale)
+        self.authenticate(self.token)
+        with self.queries() as queries:
+            self.client.get(reverse("profile"))
+        self.assertEqual(self.aliases(queries, "users_authtoken"), {"default"})
+        (alias,) = self.aliases(queries, "users_profile")
+        self.assertIn(alias, self.replicas)
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.last_used, stale)
+        self.assertIsNone(cache.get(pin_key(self.user.pk)))
+
+    def test_async_get_response(self):
+        pinned = []
+
+        async def get_response(request):
+            await sync_to_async(identify)(self.user)
+            pinned.append(_state.get().pinned)
+            self.router.db_for_write(Profile)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get("/"))
+        async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertEqual(pinned, [False, True])
+
+    def test_pin_follows_the_user_across_tokens(self):
+        other = AuthToken.objects.create(user=self.user)
+        self.authenticate(self.token)
+        response = self.client.put(
+            reverse("profile"), {"middle_name": "new"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.authenticate(other)
+        with self.queries() as queries:
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.data["middle_name"], "new")
+        self.assertEqual(self.aliases(queries, "users_profile"), {"default"})
+
+    @override_settings(PAYLOAD_CACHE=PAYLOAD_CACHE_ON)
+    def test_payload_cache_loads_from_the_primary(self):
+        self.authenticate(self.token)
+        with self.queries() as queries:
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.aliases(queries, "users_profile"), {"default"})
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.router.db_for_read(Profile), "default")
+
+    def test_put_then_get_reads_from_the_primary(self):
+        self.authenticate(self.token)
+        with self.queries() as queries:
+            self.client.get(reverse("profile"))
+        (alias,) = self.aliases(queries, "users_profile")
+        self.assertIn(alias, self.replicas)
+
+        response = self.client.put(
+            reverse("profile"), {"middle_name": "new"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.queries() as queries:
+            response = self.client.get(reverse("profile"))
+        self.assertEqual(response.data["middle_name"], "new")
+        self.assertEqual(self.aliases(queries, "users_profile"), {"default"})
+
+        # Other clients, and this one once the window passes, are back on
+        # the replicas.
+        cache.clear()
+        with self.queries() as queries:
+            self.client.get(reverse("profile"))
+        (alias,) = self.aliases(queries, "users_profile")
+        self.assertIn(alias, self.replicas)
@@ -0,0 +1,169 @@
+"""
+Sliding-window brute-force throttles for the unauthenticated auth endpoints.
+
+Each throttle keeps a fixed-window counter for the current and previous
+window and estimates the sliding count as
+``previous * (1 - elapsed fraction) + current``. Counters live in a sharded
+in-process table by default, or in the Django cache named by
+``THROTTLE_CACHE`` so every worker shares them. DRF runs throttles in
+``APIView.initial``, so a rejected request never reaches the view body:
+no password hashing and no database access.
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def sliding_count(previous, current, now, duration):
+    elapsed = (now % duration) / duration
+    return previous * (1 - elapsed) + current
+
+
+class LocalCounters:
+    """
+    In-process window counters split over ``shards`` independently locked
+    dicts, so concurrent request threads rarely contend on the same lock.
+    Each shard keeps at most ``max_keys_per_shard`` keys and evicts the
+    least recently hit one beyond that.
+    """
+
+    def __init__(self, shards=64, max_keys_per_shard=10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self.shards = [
+            (OrderedDict(), threading.Lock()) for _ in range(shards)
+        ]
+
+    def hit(self, key, limit, duration, now):
+        counters, lock = self.shards[
+            zlib.crc32(key.encode()) % len(self.shards)
+        ]
+        window = int(now // duration)
+        with lock:
+            entry = counters.get(key)
+            if entry is None or entry[0] < window - 1:
+                entry = [window, 0, 0]
+            elif entry[0] == window - 1:
+                entry = [window, 0, entry[1]]
+            counters[key] = entry
+            counters.move_to_end(key)
+            if len(counters) > self.max_keys_per_shard:
+                counters.popitem(last=False)
+            _, current, previous = entry
+            if sliding_count(previous, current, now, duration) >= limit:
+                return False
+            entry[1] += 1
+            return True
+
+    def clear(self):
+        for counters, lock in self.shards:
+            with lock:
+                counters.clear()
+
+
+class CacheCounters:
+    """Window counters kept in a shared Django cache."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def hit(self, key, limit, duration, now):
+        cache = caches[self.alias]
+        window = int(now // duration)
+        current_key = f"throttle:{key}:{window}"
+        previous_key = f"throttle:{key}:{window - 1}"
+        counts = cache.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+        if sliding_count(previous, current, now, duration) >= limit:
+            return False
+        if not cache.add(current_key, 1, duration * 2):
+            cache.incr(current_key)
+        return True
+
+
+local_counters = LocalCounters()
+
+
+def get_counters():
+    alias = settings.THROTTLE_CACHE
+    return CacheCounters(alias) if alias else local_counters
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    def get_rate(self):
+        # Read the rates on every instantiation rather than once at import
+        # like SimpleRateThrottle.THROTTLE_RATES, so settings overrides apply.
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f"No default throttle rate set for '{self.scope}' scope"
+            )
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.now = time.time()
+        return get_counters().hit(
+            f"{self.scope}:{key}", self.num_requests, self.duration, self.now
+        )
+
+    def wait(self):
+        return self.duration - self.now % self.duration
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """
+    Keyed by client address. ``get_ident`` only reads ``X-Forwarded-For``
+    as far as ``NUM_PROXIES`` trusted proxies go, so a client can't dodge
+    the limit by sending the header itself.
+    """
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    def get_cache_key(self, request, view):
+        try:
+            data = request.data
+        except ParseError:
+            return None
+        email = data.get("email") if hasattr(data, "get") else None
+        if not isinstance(email, str) or not email:
+            return None
+        return email.strip().lower()
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = "login_ip"
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = "login_email"
+
+
+class ForgotPasswordIPThrottle(IPThrottle):
+    scope = "forgot_password_ip"
+
+
+class ForgotPasswordEmailThrottle(EmailThrottle):
+    scope = "forgot_password_email"
+
+
+LOGIN_THROTTLES = (LoginIPThrottle, LoginEmailThrottle)
+FORGOT_PASSWORD_THROTTLES = (
+    ForgotPasswordIPThrottle,
+    ForgotPasswordEmailThrottle,
+)
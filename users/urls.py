@@ -1,25 +1,51 @@
 from django.urls import path
 
+from users.instrumentation import metrics
 from users.views import (
     UserView,
     login,
     signup,
     activate_user,
     forgot_password,
+    reset_password,
     change_password,
     ProfileView,
     ResidentialAddressView,
+    ResidentialAddressListView,
+    MeView,
+    AdminUserListView,
+    UserSearchView,
+    UserLookupView,
+    UserExportView,
+    ChangeFeedView,
 )
 
 urlpatterns = [
     path("user", UserView.as_view(), name="user"),
+    path("me", MeView.as_view(), name="me"),
+    path("users", AdminUserListView.as_view(), name="user-list"),
+    path("users/search", UserSearchView.as_view(), name="user-search"),
+    path("users/lookup", UserLookupView.as_view(), name="user-lookup"),
+    path("users/export", UserExportView.as_view(), name="user-export"),
+    path("changes/<str:kind>", ChangeFeedView.as_view(), name="change-feed"),
     path("profile", ProfileView.as_view(), name="profile"),
     path("address", ResidentialAddressView.as_view(), name="address"),
+    path(
+        "addresses",
+        ResidentialAddressListView.as_view(),
+        name="address-list",
+    ),
     path("signup", signup, name="signup"),
     path(
         "activate/<str:uid>/<str:token>", activate_user, name="activate-user"
     ),
     path("login", login, name="login"),
     path("forgot-password", forgot_password, name="forgot-password"),
+    path(
+        "reset-password/<str:uid>/<str:token>",
+        reset_password,
+        name="reset-password",
+    ),
     path("change-password", change_password, name="change-password"),
+    path("metrics", metrics, name="metrics"),
 ]
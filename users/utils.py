@@ -1,27 +1,59 @@
-import threading
-from django.core.mail import send_mail
+import re
+
+from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.contrib.sites.shortcuts import get_current_site
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 import six
 
+from users.instrumentation import timed
+from users.models import EmailOutbox
+
 
-class EmailThread(threading.Thread):
-    def __init__(self, subject, content, sender, recipient_list):
-        self.subject = subject
-        self.recipient_list = recipient_list
-        self.content = content
-        self.sender = sender
-        threading.Thread.__init__(self)
-
-    def run(self):
-        send_mail(
-            self.subject,
-            self.content,
-            self.sender,
-            self.recipient_list,
-            fail_silently=False,
+def queue_mail(subject, content, sender, recipient_list):
+    """
+    Persist an email to the outbox instead of talking to SMTP inline.
+    Call it inside the same transaction as the write that triggers the
+    mail so both commit or roll back together; the ``send_queued_mail``
+    worker delivers it.
+    """
+    with timed("mail"):
+        return EmailOutbox.objects.create(
+            subject=subject,
+            body=content,
+            sender=sender,
+            recipients=list(recipient_list),
         )
 
 
+E164 = re.compile(r"^\+[1-9]\d{6,14}$")
+PHONE_PUNCTUATION = re.compile(r"[\s().\-/]")
+
+
+def normalize_phone(value, country_code=None):
+    """
+    Return ``value`` as an E.164 number (``+254729446777``), or ``None``
+    when it isn't a phone number. Spacing and punctuation are dropped, a
+    ``00`` prefix becomes ``+`` and a national number with a trunk ``0``
+    gets ``PHONE_DEFAULT_COUNTRY_CODE``. Without any prefix the number has
+    to start with that country code: ``729446777`` is rejected rather than
+    read as ``+7...``.
+    """
+    if country_code is None:
+        country_code = settings.PHONE_DEFAULT_COUNTRY_CODE
+    number = PHONE_PUNCTUATION.sub("", value or "")
+    if number.startswith("00"):
+        number = "+" + number[2:]
+    elif number.startswith("0"):
+        number = f"+{country_code}{number[1:]}"
+    elif not number.startswith("+"):
+        if not number.startswith(country_code):
+            return None
+        number = "+" + number
+    return number if E164.match(number) else None
+
+
 class TokenGenerator(PasswordResetTokenGenerator):
     def _make_hash_value(self, user, timestamp):
         return (
@@ -32,3 +64,30 @@ class TokenGenerator(PasswordResetTokenGenerator):
 
 
 account_activation_token = TokenGenerator()
+# Hashes the password and last login, so a reset link stops working once
+# it has been used.
+password_reset_token = PasswordResetTokenGenerator()
+
+
+def queue_activation_mail(request, user):
+    current_site = get_current_site(request)
+    activation_link = f"http://{current_site.domain}/activate/{urlsafe_base64_encode(force_bytes(user.id))}/{account_activation_token.make_token(user)}"
+    return queue_mail(
+        "New user",
+        f"Activation link: \n{activation_link}",
+        "Test <no-reply@test.com>",
+        [user.email],
+    )
+
+
+def queue_password_reset_mail(request, user):
+    current_site = get_current_site(request)
+    uid = urlsafe_base64_encode(force_bytes(user.id))
+    token = password_reset_token.make_token(user)
+    return queue_mail(
+        "Reset password",
+        "Reset your password by posting the new one to: \n"
+        f"http://{current_site.domain}/reset-password/{uid}/{token}",
+        "Test <no-reply@test.com>",
+        [user.email],
+    )
@@ -1,43 +1,71 @@
-import base64
-import datetime
+import uuid
 
+from django.conf import settings
 from django.contrib.auth import authenticate, logout
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import send_mail
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from django.core.exceptions import ObjectDoesNotExist
-
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+import django.contrib.auth.password_validation as validators
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, router, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework import exceptions
+from rest_framework.decorators import (
+    api_view,
+    permission_classes,
+    throttle_classes,
+)
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_400_BAD_REQUEST,
     HTTP_201_CREATED,
     HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
     HTTP_404_NOT_FOUND,
+    HTTP_412_PRECONDITION_FAILED,
 )
 from rest_framework.views import APIView
 
-from users.models import User, Profile, ResidentialAddress
+from users import changes, export, hashing, sharding
+from users.audit import audit_log
+from users.conditional import ANY, ConditionalMixin, PreconditionFailed
+from users.models import (
+    AuditEvent,
+    AuthToken,
+    User,
+    Profile,
+    ResidentialAddress,
+    Tombstone,
+)
+from users.payload_cache import payload_cache
+from users.search import search_users
 from users.serializers import (
+    AdminUserSerializer,
     SignUpSerializer,
     UserSerializer,
     ProfileSerializer,
     ResidentialAddressSerializer,
+    ResidentialAddressItemSerializer,
+    required_fields,
+)
+from users.throttling import FORGOT_PASSWORD_THROTTLES, LOGIN_THROTTLES
+from users.utils import (
+    account_activation_token,
+    password_reset_token,
+    queue_activation_mail,
+    queue_password_reset_mail,
 )
-from users.utils import account_activation_token
 
 
 @csrf_exempt
 @api_view(["POST"])
 @permission_classes((AllowAny,))
+@throttle_classes(LOGIN_THROTTLES)
 def login(request):
     """
     Sample request
@@ -59,8 +87,12 @@ def login(request):
             {"error": "Invalid Credentials or Inactive"},
             status=HTTP_404_NOT_FOUND,
         )
-    token, _ = Token.objects.get_or_create(user=user)
-    return Response({"token": token.key}, status=HTTP_200_OK)
+    token = AuthToken.objects.create(user=user)
+    audit_log.emit(AuditEvent.LOGIN, user.pk, request)
+    return Response(
+        {"token": token.key, "expires_at": token.expires_at},
+        status=HTTP_200_OK,
+    )
 
 
 @csrf_exempt
@@ -76,24 +108,18 @@ def signup(request):
     }
     """
     serializer = SignUpSerializer(data=request.data)
+    # The serializer's unique validator already rejects existing emails.
     if serializer.is_valid(raise_exception=True):
-        if User.objects.filter(
-            email=serializer.validated_data["email"]
-        ).exists():
-            return Response(
-                {"error": "User already exists"}, status=HTTP_400_BAD_REQUEST
-            )
-        user = serializer.save()
+        user_id = uuid.uuid4()
+        try:
+            with sharding.atomic(user_id):
+                user = serializer.save(id=user_id)
+                queue_activation_mail(request, user)
+        except IntegrityError:
+            # Lost a race for the email with a concurrent signup.
+            raise exceptions.ValidationError(serializer.conflict_errors)
+        audit_log.emit(AuditEvent.SIGNUP, user.pk, request)
         serializer = UserSerializer(user)
-        current_site = get_current_site(request)
-        activation_link = f"http://{current_site.domain}/activate/{urlsafe_base64_encode(force_bytes(user.id))}/{account_activation_token.make_token(user)}"
-        send_mail(
-            "New user",
-            f"Activation link: \n{activation_link}",
-            "Test <no-reply@test.com>",
-            [user.email],
-            fail_silently=False,
-        )
         return Response(
             {
                 "user": serializer.data,
@@ -104,15 +130,26 @@ def signup(request):
     return Response({"error": serializer.errors}, status=HTTP_400_BAD_REQUEST)
 
 
-def activate_user(request, uid, token):
+def user_from_uid(uid):
     try:
         uid = force_str(urlsafe_base64_decode(uid))
-        user = User.objects.get(id=uid)
-    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-        user = None
+        return sharding.get_user(uid)
+    except (
+        TypeError,
+        ValueError,
+        OverflowError,
+        ValidationError,
+        User.DoesNotExist,
+    ):
+        return None
+
+
+def activate_user(request, uid, token):
+    user = user_from_uid(uid)
     if user is not None and account_activation_token.check_token(user, token):
         user.is_active = True
         user.save()
+        audit_log.emit(AuditEvent.ACTIVATE, user.pk, request)
         return HttpResponse(
             "Thank you for your email confirmation. Now you can login your account."
         )
@@ -123,8 +160,12 @@ def activate_user(request, uid, token):
 @csrf_exempt
 @api_view(["POST"])
 @permission_classes((AllowAny,))
+@throttle_classes(FORGOT_PASSWORD_THROTTLES)
 def forgot_password(request):
     """
+    Mails a signed password reset link; nothing is hashed or written to
+    the user until the link is used, see ``reset_password``.
+
     sample request
     {"email":"user@gmail.com"}
     """
@@ -133,51 +174,78 @@ def forgot_password(request):
         return Response(
             {"error": "Email required"}, status=HTTP_400_BAD_REQUEST
         )
-    code = str(datetime.datetime.now())[-4:] + email
-    new_pass = (
-        base64.b64encode(code.encode(), altchars=None).decode().lower()[:8]
-    )
-    user = get_object_or_404(User, email=email)
-    user.set_password(new_pass)
-    user.save()
-    send_mail(
-        "New password",
-        "New password: \n{}".format(new_pass),
-        "Test <no-reply@test.com>",
-        [email],
-        fail_silently=False,
-    )
+    try:
+        user = sharding.get_user_by_email(email)
+    except User.DoesNotExist:
+        raise Http404
+    queue_password_reset_mail(request, user)
+    audit_log.emit(AuditEvent.PASSWORD_RESET_REQUEST, user.pk, request)
     return Response(
-        {"message": "New password sent to your email"}, status=HTTP_200_OK
+        {"message": "Password reset link sent to your email"},
+        status=HTTP_200_OK,
     )
 
 
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes((AllowAny,))
+def reset_password(request, uid, token):
+    """
+    The token is only valid until the password changes (or
+    ``PASSWORD_RESET_TIMEOUT`` passes), so each link works once.
+
+    sample request
+    {"password1":"new password","password2":"new password"}
+    """
+    user = user_from_uid(uid)
+    if user is None or not password_reset_token.check_token(user, token):
+        return Response(
+            {"error": "Reset link is invalid or has expired"},
+            status=HTTP_400_BAD_REQUEST,
+        )
+    return update_password(request, user, AuditEvent.PASSWORD_RESET)
+
+
 @csrf_exempt
 @api_view(["POST"])
 @login_required
 def change_password(request):
-    user = request.user
+    return update_password(request, request.user, AuditEvent.PASSWORD_CHANGE)
+
+
+def update_password(request, user, event):
+    """
+    Set ``password1`` as the user's password if it matches ``password2``
+    and passes validation, revoking every token of the user. ``event`` is
+    the audit event to record.
+    """
     password1 = request.data.get("password1")
     password2 = request.data.get("password2")
+    if not password1:
+        return Response(
+            {"error": "Password required"}, status=HTTP_400_BAD_REQUEST
+        )
     if password1 == password2:
-        if len(password1) >= 6:
-            user.set_password(password1)
-            user.save()
-            logout(request)
-            Token.objects.get(user=user).delete()
+        try:
+            validators.validate_password(password=password1, user=user)
+        except ValidationError as e:
             return Response(
-                {"message": "Password changed"}, status=HTTP_200_OK
+                {"error": list(e.messages)}, status=HTTP_400_BAD_REQUEST
             )
-        return Response(
-            {"error": "Minimun password length is 6"},
-            status=HTTP_400_BAD_REQUEST,
-        )
+        hashing.set_password(user, password1)
+        user.save()
+        # Session-less under the API-only settings.
+        if hasattr(request, "session"):
+            logout(request)
+        AuthToken.objects.filter(user=user).delete()
+        audit_log.emit(event, user.pk, request)
+        return Response({"message": "Password changed"}, status=HTTP_200_OK)
     return Response(
         {"error": "Passwords don't match"}, status=HTTP_400_BAD_REQUEST
     )
 
 
-class UserView(LoginRequiredMixin, APIView):
+class UserView(APIView):
     """
     API endpoint that allows users to be viewed.
     """
@@ -185,81 +253,567 @@ class UserView(LoginRequiredMixin, APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data, status=HTTP_200_OK)
+        user = request.user
+        data = payload_cache.get_or_load(
+            "user", user.pk, lambda: dict(UserSerializer(user).data)
+        )
+        return Response(data, status=HTTP_200_OK)
+
 
+class UserOwnedView(ConditionalMixin, APIView):
+    """
+    get/post/put/delete for the user's ``Profile`` or (first)
+    ``ResidentialAddress``. Every write is a single statement through
+    ``UserOwnedManager``: POST inserts (upserting the profile), a PUT with
+    every field replaces or creates the row, and a PUT with some fields
+    updates only those columns. ``If-Match`` turns the version check into
+    part of the UPDATE's WHERE clause instead of a locked SELECT.
+    """
 
-class ProfileView(APIView):
     permission_classes = (IsAuthenticated,)
+    serializer_class = None
+    # prefix of the audit events, e.g. "profile" for "profile_update"
+    audit_name = None
+
+    def validated_values(self, request, partial):
+        serializer = self.serializer_class(data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        return serializer, dict(serializer.validated_data)
+
+    def write(self, method, *args):
+        try:
+            return method(*args)
+        except IntegrityError:
+            raise exceptions.ValidationError(
+                self.serializer_class.conflict_errors
+            )
+
+    def audit(self, request, action, **data):
+        audit_log.emit(
+            f"{self.audit_name}_{action}", request.user.id, request, **data
+        )
+
+    def respond(self, instance):
+        return Response(
+            self.serializer_class(instance).data,
+            status=HTTP_200_OK,
+            headers=self.etag_headers(instance),
+        )
+
+    def not_modified(self, request):
+        etag = self.unmodified_etag(request)
+        if etag is None:
+            return None
+        return Response(status=HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    def precondition_failed(self, request):
+        etag = self.current_etag(request.user)
+        return Response(
+            self.precondition_failed_data,
+            status=HTTP_412_PRECONDITION_FAILED,
+            headers={"ETag": etag} if etag else {},
+        )
+
+    @property
+    def kind(self):
+        return self.model._meta.model_name
+
+    def load_payload(self, user_id):
+        manager = self.model.objects
+        if payload_cache.enabled:
+            # Cached for the TTL, so read from the primary rather than a
+            # replica that may not have the write that invalidated it yet.
+            manager = manager.db_manager(
+                sharding.current() or DEFAULT_DB_ALIAS
+            )
+        instance = manager.for_user(user_id).first()
+        if instance is None:
+            return None, None
+        data = dict(self.serializer_class(instance).data)
+        return data, self.make_etag(instance.id, instance.version)
 
     def get(self, request):
-        user = request.user
-        profile = get_object_or_404(Profile, user_id=user.id)
-        serializer = ProfileSerializer(profile)
-        return Response(serializer.data, status=HTTP_200_OK)
+        if not payload_cache.enabled:
+            response = self.not_modified(request)
+            if response is not None:
+                return response
+        user_id = request.user.id
+        data, etag = payload_cache.get_or_load(
+            self.kind, user_id, lambda: self.load_payload(user_id)
+        )
+        if data is None:
+            raise Http404
+        header = request.META.get("HTTP_IF_NONE_MATCH")
+        if header and self.etag_matches(header, etag):
+            return Response(
+                status=HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+        return Response(data, status=HTTP_200_OK, headers={"ETag": etag})
 
     def post(self, request):
-        user = request.user
-        data = request.data
-        data["user_id"] = user.id
-        serializer = ProfileSerializer(data=data)
-        if serializer.is_valid(raise_exception=True):
-            _saved_instance = serializer.save()
-        return Response(serializer.data, status=HTTP_200_OK)
+        _, values = self.validated_values(request, partial=False)
+        instance = self.write(
+            self.model.objects.insert_for_user, request.user.id, values
+        )
+        self.audit(request, "create")
+        return self.respond(instance)
 
     def put(self, request):
         user = request.user
-        data = request.data
-        data["user_id"] = user.id
-        profile = get_object_or_404(Profile, user_id=user.id)
-        serializer = ProfileSerializer(
-            data=data, instance=profile, partial=True
-        )
-        if serializer.is_valid(raise_exception=True):
-            _saved_instance = serializer.save()
-        return Response(serializer.data, status=HTTP_200_OK)
+        serializer, values = self.validated_values(request, partial=True)
+        try:
+            expected = self.expected_version(request)
+        except PreconditionFailed:
+            return self.precondition_failed(request)
+        if expected is not None:
+            instance = self.write(
+                self.model.objects.update_for_user,
+                user.id,
+                values,
+                None if expected is ANY else expected,
+            )
+            if instance is None:
+                return self.precondition_failed(request)
+        elif required_fields(serializer) <= set(values):
+            instance = self.write(
+                self.model.objects.upsert_for_user, user.id, values
+            )
+        elif values:
+            instance = self.write(
+                self.model.objects.update_for_user, user.id, values
+            )
+        else:
+            instance = self.model.objects.for_user(user.id).first()
+        if instance is None:
+            raise Http404
+        if values:
+            self.audit(request, "update", fields=sorted(values))
+        return self.respond(instance)
 
     def delete(self, request):
-        user = request.user
-        profile = Profile.objects.filter(user__id=user.id).first()
-        profile.delete()
-        return Response({"message": "Profile ID deleted"}, status=HTTP_200_OK)
+        deleted = self.model.objects.delete_for_user(request.user.id)
+        if deleted is None:
+            raise Http404
+        # Deletes send no signal, see users.signals.
+        payload_cache.invalidate(request.user.id, self.kind)
+        self.audit(request, "delete")
+        return Response(
+            {"message": f"{self.model.__name__} ID deleted"},
+            status=HTTP_200_OK,
+        )
+
 
+class ProfileView(UserOwnedView):
+    model = Profile
+    serializer_class = ProfileSerializer
+    audit_name = "profile"
+
+
+class ResidentialAddressView(UserOwnedView):
+    model = ResidentialAddress
+    serializer_class = ResidentialAddressSerializer
+    audit_name = "address"
+
+
+def parse_sparse_fields(value, sections):
+    """
+    Parse ``?fields=user,profile.phone_number,addresses.city`` into
+    ``{"user": None, "profile": {"phone_number"}, "addresses": {"city"}}``
+    where ``None`` means every field of that section.
+    """
+    if not value:
+        return {section: None for section in sections}
+    selected = {}
+    for item in value.split(","):
+        section, _, field = item.strip().partition(".")
+        if section not in sections:
+            continue
+        if not field:
+            selected[section] = None
+        elif section not in selected or selected[section] is not None:
+            selected.setdefault(section, set()).add(field)
+    return selected
+
+
+class MeView(APIView):
+    """
+    The current user, their profile and all their addresses in one
+    response, shaped like the ``user``, ``profile`` and ``address``
+    endpoints. Trim the payload with ``?fields=``, see
+    ``parse_sparse_fields``.
+    """
 
-class ResidentialAddressView(APIView):
     permission_classes = (IsAuthenticated,)
+    sections = ("user", "profile", "addresses")
 
     def get(self, request):
+        fields = parse_sparse_fields(
+            request.query_params.get("fields"), self.sections
+        )
         user = request.user
-        address = get_object_or_404(ResidentialAddress, user_id=user.id)
-        serializer = ResidentialAddressSerializer(address)
-        return Response(serializer.data, status=HTTP_200_OK)
+        if "profile" in fields or "addresses" in fields:
+            queryset = User.objects.all()
+            if "profile" in fields:
+                queryset = queryset.select_related("profile")
+            if "addresses" in fields:
+                queryset = queryset.prefetch_related("residentialaddress_set")
+            user = queryset.get(pk=user.pk)
 
-    def post(self, request):
-        user = request.user
+        data = {}
+        if "user" in fields:
+            data["user"] = UserSerializer(user, fields=fields["user"]).data
+        if "profile" in fields:
+            try:
+                profile = user.profile
+            except Profile.DoesNotExist:
+                data["profile"] = None
+            else:
+                data["profile"] = ProfileSerializer(
+                    profile, fields=fields["profile"]
+                ).data
+        if "addresses" in fields:
+            data["addresses"] = ResidentialAddressSerializer(
+                user.residentialaddress_set.all(),
+                many=True,
+                fields=fields["addresses"],
+            ).data
+        return Response(data, status=HTTP_200_OK)
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: every page is an index range
+    scan ``WHERE id > <cursor> ORDER BY id LIMIT n``, so deep pages cost the
+    same as the first one.
+    """
+
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class AddressCursorPagination(UserCursorPagination):
+    page_size = 20
+    max_page_size = 100
+
+
+class ResidentialAddressListView(APIView):
+    """
+    The user's whole address book.
+
+    GET lists it page by page. POST with a list of addresses adds them all
+    with one ``bulk_create``. PUT with a list replaces the address book:
+    entries with an ``id`` update that address, entries without one are
+    created and every address not in the list is deleted, all in one
+    transaction.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    pagination_class = AddressCursorPagination
+    serializer_class = ResidentialAddressItemSerializer
+    max_items = 500
+    update_fields = (
+        "country",
+        "city",
+        "state",
+        "zip",
+        "version",
+        "updated_at",
+    )
+
+    def get(self, request):
+        queryset = ResidentialAddress.objects.filter(user_id=request.user.id)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def validated_items(self, request):
         data = request.data
-        data["user_id"] = user.id
-        serializer = ResidentialAddressSerializer(data=data)
-        if serializer.is_valid(raise_exception=True):
-            _saved_instance = serializer.save()
-        return Response(serializer.data, status=HTTP_200_OK)
+        if isinstance(data, list) and len(data) > self.max_items:
+            raise exceptions.ValidationError(
+                {"error": f"At most {self.max_items} addresses per request"}
+            )
+        serializer = self.serializer_class(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def post(self, request):
+        items = self.validated_items(request)
+        if any("id" in item for item in items):
+            raise exceptions.ValidationError(
+                {"id": ["Only allowed when replacing the address book."]}
+            )
+        addresses = ResidentialAddress.objects.bulk_create(
+            [
+                ResidentialAddress(user_id=request.user.id, **item)
+                for item in items
+            ]
+        )
+        # Bulk writes send no signals.
+        payload_cache.invalidate(request.user.id, "residentialaddress")
+        audit_log.emit(
+            AuditEvent.ADDRESS_CREATE,
+            request.user.id,
+            request,
+            count=len(addresses),
+        )
+        return Response(
+            self.serializer_class(addresses, many=True).data,
+            status=HTTP_201_CREATED,
+        )
 
     def put(self, request):
         user = request.user
-        data = request.data
-        data["user_id"] = user.id
-        address = get_object_or_404(ResidentialAddress, user_id=user.id)
-        serializer = ResidentialAddressSerializer(
-            data=request.data, instance=address, partial=True
+        items = self.validated_items(request)
+        ids = [item["id"] for item in items if "id" in item]
+        if len(ids) != len(set(ids)):
+            raise exceptions.ValidationError({"id": ["Duplicate id."]})
+
+        # The addresses live on the user's shard and their tombstones on
+        # ``default``: lock and replace them in a transaction on both.
+        db = router.db_for_write(ResidentialAddress)
+        with transaction.atomic(), transaction.atomic(
+            using=db, savepoint=False
+        ):
+            # The whole address book, to know which addresses to delete.
+            existing = (
+                ResidentialAddress.objects.select_for_update()
+                .filter(user_id=user.id)
+                .in_bulk()
+            )
+            unknown = [str(pk) for pk in ids if pk not in existing]
+            if unknown:
+                raise exceptions.ValidationError(
+                    {"id": [f"Unknown address {pk}." for pk in unknown]}
+                )
+            removed = set(existing) - set(ids)
+            if removed:
+                ResidentialAddress.objects.filter(id__in=removed).delete()
+                Tombstone.objects.record(ResidentialAddress, user.id, removed)
+
+            addresses, changed, created = [], [], []
+            for item in items:
+                if "id" not in item:
+                    address = ResidentialAddress(user_id=user.id, **item)
+                    created.append(address)
+                else:
+                    address = existing[item["id"]]
+                    if any(
+                        getattr(address, name) != value
+                        for name, value in item.items()
+                    ):
+                        for name, value in item.items():
+                            setattr(address, name, value)
+                        address.version += 1
+                        address.updated_at = timezone.now()
+                        changed.append(address)
+                addresses.append(address)
+            if changed:
+                ResidentialAddress.objects.bulk_update(
+                    changed, self.update_fields
+                )
+            if created:
+                ResidentialAddress.objects.bulk_create(created)
+        payload_cache.invalidate(user.id, "residentialaddress")
+        audit_log.emit(
+            AuditEvent.ADDRESS_BOOK_REPLACE,
+            user.id,
+            request,
+            count=len(addresses),
         )
-        if serializer.is_valid(raise_exception=True):
-            _saved_instance = serializer.save()
-        return Response(serializer.data, status=HTTP_200_OK)
 
-    def delete(self, request):
-        user = request.user
-        address = ResidentialAddress.objects.filter(user__id=user.id).first()
-        address.delete()
         return Response(
-            {"message": "ResidentialAddress ID deleted"}, status=HTTP_200_OK
+            self.serializer_class(addresses, many=True).data,
+            status=HTTP_200_OK,
+        )
+
+
+class AdminUserListView(APIView):
+    """
+    Admin-only listing of users.
+
+    Filters: ``is_active``, ``is_admin`` (true/false) and ``email_domain``.
+    Pass ``embed=profile`` to include each user's profile.
+    """
+
+    permission_classes = (IsAdminUser,)
+    pagination_class = UserCursorPagination
+    boolean_filters = ("is_active", "is_admin")
+
+    def get(self, request):
+        params = request.query_params
+        queryset = User.objects.all()
+        for name in self.boolean_filters:
+            value = params.get(name)
+            if value is not None:
+                queryset = queryset.filter(
+                    **{name: value.lower() in ("1", "true", "yes")}
+                )
+        domain = params.get("email_domain")
+        if domain:
+            queryset = queryset.filter(email_domain=domain.lower())
+
+        fields = list(AdminUserSerializer.Meta.fields)
+        if "profile" in params.get("embed", "").split(","):
+            queryset = queryset.select_related("profile")
+        else:
+            fields.remove("profile")
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            sharding.fan_out(queryset), request, view=self
+        )
+        serializer = AdminUserSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class UserSearchView(APIView):
+    """
+    Admin-only user search for support tooling.
+
+    ``q`` matches part of the email, first name or last name, or a phone
+    number in any common format. ``limit`` defaults to 20, at most 100.
+    """
+
+    permission_classes = (IsAdminUser,)
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = min(max(limit, 1), self.max_limit)
+        try:
+            users = search_users(request.query_params.get("q", ""), limit)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
+        serializer = AdminUserSerializer(users, many=True)
+        return Response({"results": serializer.data}, status=HTTP_200_OK)
+
+
+class UserLookupView(APIView):
+    """
+    Admin-only batch lookup for internal services.
+
+    POST ``{"ids": [...]}`` with up to ``max_ids`` user ids and get back
+    ``{"results": {id: {"user": ..., "profile": ...}}}``, shaped like the
+    ``user`` and ``profile`` endpoints, with ``null`` for ids that don't
+    exist. Duplicate ids are looked up once. Users are loaded with their
+    profiles ``chunk_size`` ids at a time, so a batch runs at most
+    ``ceil(len(ids) / chunk_size)`` queries (per shard, plus one directory
+    query per chunk when sharded).
+    """
+
+    permission_classes = (IsAdminUser,)
+    max_ids = 5000
+    chunk_size = 500
+
+    def post(self, request):
+        ids = (
+            request.data.get("ids") if isinstance(request.data, dict) else None
+        )
+        if not isinstance(ids, list):
+            raise exceptions.ValidationError({"ids": ["A list of user ids."]})
+        if len(ids) > self.max_ids:
+            raise exceptions.ValidationError(
+                {"ids": [f"At most {self.max_ids} ids per request."]}
+            )
+        parsed, invalid = [], []
+        for value in ids:
+            try:
+                parsed.append(uuid.UUID(str(value)))
+            except ValueError:
+                invalid.append(str(value))
+        if invalid:
+            raise exceptions.ValidationError(
+                {"ids": [f"Invalid id {value}." for value in invalid]}
+            )
+        # Duplicates (in any spelling of the UUID) are looked up once.
+        parsed = list(dict.fromkeys(parsed))
+
+        results = dict.fromkeys(map(str, parsed))
+        for start in range(0, len(parsed), self.chunk_size):
+            chunk = parsed[start : start + self.chunk_size]
+            for using, shard_ids in sharding.by_shard(chunk).items():
+                users = list(
+                    User.objects.using(using)
+                    .select_related("profile")
+                    .filter(pk__in=shard_ids)
+                )
+                for user, data in zip(
+                    users, UserSerializer(users, many=True).data
+                ):
+                    try:
+                        profile = ProfileSerializer(user.profile).data
+                    except Profile.DoesNotExist:
+                        profile = None
+                    results[str(user.pk)] = {"user": data, "profile": profile}
+        return Response({"results": results}, status=HTTP_200_OK)
+
+
+class UserExportView(APIView):
+    """
+    Admin-only streaming export of all users with profiles and addresses.
+
+    ``type`` is ``ndjson`` (default) or ``csv``; ``gzip=1`` compresses the
+    stream. See ``users.export``; ``manage.py export_users`` writes the
+    same output to a file.
+    """
+
+    permission_classes = (IsAdminUser,)
+    chunk_size = 2000
+
+    def get(self, request):
+        fmt = request.query_params.get("type", "ndjson")
+        if fmt not in export.FORMATS:
+            return Response(
+                {"error": f"type must be one of {', '.join(export.FORMATS)}"},
+                status=HTTP_400_BAD_REQUEST,
+            )
+        gzip = request.query_params.get("gzip") in ("1", "true", "yes")
+        filename = f"users.{fmt}" + (".gz" if gzip else "")
+        response = StreamingHttpResponse(
+            export.export_users(fmt, gzip=gzip, chunk_size=self.chunk_size),
+            content_type=(
+                "application/gzip" if gzip else export.CONTENT_TYPES[fmt]
+            ),
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ChangeFeedView(APIView):
+    """
+    Admin-only change feed for downstream sync, see ``users.changes``.
+
+    ``kind`` is ``users``, ``profiles`` or ``addresses``. Poll without a
+    ``cursor`` to start from the beginning, then with the ``cursor`` of
+    the previous response. ``limit`` defaults to 100.
+    """
+
+    permission_classes = (IsAdminUser,)
+    default_limit = 100
+
+    def get(self, request, kind):
+        if kind not in changes.FEEDS:
+            raise Http404
+        params = request.query_params
+        try:
+            limit = int(params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = min(max(limit, 1), settings.CHANGE_FEED["MAX_LIMIT"])
+        try:
+            results, cursor, has_more = changes.read(
+                kind, params.get("cursor"), limit
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
+        return Response(
+            {"results": results, "cursor": cursor, "has_more": has_more},
+            status=HTTP_200_OK,
         )
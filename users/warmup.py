@@ -0,0 +1,72 @@
+"""
+Start-up warm-up for fresh workers.
+
+Django and DRF defer a fair amount of work to the first request that needs
+it: importing the URLconf (and with it every view, serializer and DRF
+module), compiling the URL patterns, loading the password validators
+(``CommonPasswordValidator`` reads a 20k entry list), the hashers, the
+translation catalogs and the time zone. ``warm_up`` does all of that up
+front. It is called by ``user_management.wsgi`` and ``.asgi`` when
+``WARMUP_ON_STARTUP`` is set, and doesn't touch the database, so it is
+safe before a pre-forking server forks.
+"""
+import inspect
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.contrib.auth.password_validation import (
+    get_default_password_validators,
+)
+from django.urls import get_resolver
+from django.utils import timezone, translation
+from rest_framework.serializers import BaseSerializer
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Populating the reverse map imports every urlconf and compiles every
+    # pattern.
+    resolver.reverse_dict
+
+
+def warm_validators():
+    get_default_password_validators()
+    get_hashers()
+
+
+def warm_serializers():
+    from users import serializers
+
+    for _, serializer_class in inspect.getmembers(
+        serializers, inspect.isclass
+    ):
+        if (
+            issubclass(serializer_class, BaseSerializer)
+            and serializer_class.__module__ == serializers.__name__
+        ):
+            serializer_class().fields
+
+
+def warm_locale():
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext("Invalid token.")
+    timezone.get_default_timezone()
+
+
+STEPS = {
+    "urls": warm_urls,
+    "validators": warm_validators,
+    "serializers": warm_serializers,
+    "locale": warm_locale,
+}
+
+
+def warm_up():
+    """Run every warm-up step, returning the seconds each one took."""
+    elapsed = {}
+    for name, step in STEPS.items():
+        start = time.perf_counter()
+        step()
+        elapsed[name] = time.perf_counter() - start
+    return elapsed